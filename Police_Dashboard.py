@@ -2,84 +2,405 @@ import streamlit as st
 import pandas as pd
 import pymysql
 import datetime
+import os
+import time
 import plotly.express as px
 
+from insight_builder import (ADDITIVE_MEASURES, DIMENSIONS, INSIGHT_SPECS, MEASURES, InsightSpec,
+                             answer_specs, compile_spec, plan_shared_scans)
+from insight_queries import COUNT_COLUMNS, GENERATED_COLUMN_QUERIES, INSIGHT_QUERIES, KEY_METRIC_QUERIES
+from insight_report import (QUERY_TIMEOUT_SECONDS, REPORT_WORKERS, InsightRun, format_report,
+                            summarize_run)
+from ledger_analytics import (ANALYTICS_ERRORS, DuckDBEngine, analytics_available, duckdb_catalog,
+                              refresh_snapshot, snapshot_info)
+from ledger_charts import bin_periods, downsample_series, limit_categories
+from ledger_db import PoolTimeout, get_pool, ledger_version
+from ledger_fetch import (FETCH_MEMORY_CEILING, MemoryCeilingExceeded, compact_ledger_frame, fetch_frame,
+                          memory_per_row)
+from ledger_live import (LEDGER_WATERMARK_QUERY, ROLLUP_WATERMARK_QUERY, LedgerDeltaPoller,
+                         LiveKeyMetrics)
+from ledger_pagination import (PAGE_SIZES, SORTABLE_COLUMNS, build_count_query,
+                               build_page_query, page_cursor)
+from ledger_partitions import ledger_partitions, scan_size
+from ledger_profiling import Profiler
+from ledger_rollups import ROLLUP_QUERIES, refresh_rollups, rollups_ready
+from ledger_schema import GENERATED_COLUMNS_MIGRATION, PARTITIONS_MIGRATION, explain_query, migration_applied
+from ledger_watchlist import Alert, WatchlistEngine
+from query_cache import ResultCache
+from stop_logging_api import InvalidStop, StopLogger
+
 # -------------------------------
 # 1. Set Streamlit page config (ONLY ONCE!)
 # -------------------------------
 st.set_page_config(page_title="SECURECHECK POLICE DASHBOARD", layout="wide")
 
 # -------------------------------
-# 2. Database connection
+# 2. Database connection (pooled)
 # -------------------------------
+@st.cache_resource
 def creating_connection():
+    # One pool per server process, shared by every session and rerun
+    return get_pool()
+
+@st.cache_resource
+def getting_profiler():
+    # Stage timings for the hidden DIAGNOSTICS page (see ledger_profiling.py)
+    return Profiler()
+
+# -------------------------------
+# 3. Fetch data helper
+# -------------------------------
+
+def running_query(query, params=None, streaming=False, name="ad-hoc query"):
+    # Raises on database errors; fetching_of_data is the forgiving wrapper.
+    # streaming=True reads through a server-side cursor into typed columns chunk
+    # by chunk (ledger_fetch.py) instead of buffering every row as a tuple first.
+    # Each stage is timed under ``name`` for the DIAGNOSTICS page.
+    profiler = getting_profiler()
+    started = time.perf_counter()
+    with creating_connection().connection() as myconnection:
+        profiler.record("connection", name, time.perf_counter() - started)
+        query_started = time.perf_counter()
+        if streaming:
+            # Execution and fetch overlap on a server-side cursor, so they are timed together
+            with profiler.timer("fetch", name) as counts:
+                frame = fetch_frame(myconnection, query, params, max_bytes=FETCH_MEMORY_CEILING,
+                                    interrupt=creating_connection().kill_query)
+                counts["rows"] = len(frame)
+        else:
+            with myconnection.cursor() as cursor:
+                with profiler.timer("query", name):
+                    cursor.execute(query, params)
+                with profiler.timer("fetch", name) as counts:
+                    RESULT = cursor.fetchall()
+                    counts["rows"] = len(RESULT)
+                columns = [desc[0] for desc in cursor.description]
+            with profiler.timer("dataframe", name) as counts:
+                frame = pd.DataFrame(RESULT, columns=columns)
+                counts["rows"] = len(frame)
+        seconds = time.perf_counter() - query_started
+        if profiler.is_slow(seconds):
+            profiler.log_slow_query(name, seconds, len(frame), query, params,
+                                    explain=lambda: explain_query(myconnection, query, params))
+    profiler.record("result", name, seconds, len(frame), int(frame.memory_usage(deep=True).sum()))
+    return frame
+
+def fetching_of_data(query, params=None, streaming=False, name="ad-hoc query"):
     try:
-        myconnection = pymysql.connect(
-            host="127.0.0.1",
-            user="root",
-            password="Mirthi@26",   # ⚠️ move to secrets.toml for safety
-            database='Traffic_Stops',
-        )
-        return myconnection
-    except Exception as e:
+        return running_query(query, params, streaming, name)
+    except (pymysql.MySQLError, PoolTimeout) as e:
         st.error(f"DATABASE CONNECTION ERROR: {e}")
+    except MemoryCeilingExceeded as e:
+        st.error(f"RESULT TOO LARGE: {e}")
+    return pd.DataFrame()
+
+# -------------------------------
+# 3b. Result cache for insight queries
+# -------------------------------
+def reading_ledger_version():
+    try:
+        with creating_connection().connection() as myconnection:
+            return ledger_version(myconnection)
+    except (pymysql.MySQLError, PoolTimeout):
         return None
 
+@st.cache_resource
+def getting_result_cache():
+    return ResultCache(version_probe=reading_ledger_version)
+
+def fetching_cached_data(name, query, params=None, label=None):
+    # ``label`` names the query on the DIAGNOSTICS page when ``name`` is not readable
+    try:
+        return getting_result_cache().get_or_compute(
+            name, params, lambda: running_query(query, params, streaming=True, name=label or name))
+    except (pymysql.MySQLError, PoolTimeout) as e:
+        st.error(f"DATABASE CONNECTION ERROR: {e}")
+    except MemoryCeilingExceeded as e:
+        st.error(f"RESULT TOO LARGE: {e}")
+    return pd.DataFrame()
+
 # -------------------------------
-# 3. Fetch data helper
+# 4. Per-page data loaders (lazy, cached across reruns and sessions)
 # -------------------------------
-def fetching_of_data(query):
-    myconnection = creating_connection()
-    if myconnection:
-        try:
-            cursor = myconnection.cursor()
-            cursor.execute(query)
-            RESULT = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description] 
-            Traffic_Stops = pd.DataFrame(RESULT, columns=columns)
-            return Traffic_Stops
-        finally:
-            myconnection.close()
-    else:
+LEDGER_CACHE_TTL = 600
+DISTINCT_VALUES_TTL = 3600
+
+# Filter choices (countries, violations, outcomes) almost never change, and the ledger
+# version changes on every logged stop, so these are refreshed by TTL only; the
+# distinct scans would otherwise rerun after each insert.
+# The query raises on database errors so that a failed load is never cached.
+@st.cache_data(ttl=DISTINCT_VALUES_TTL)
+def querying_distinct_values(column):
+    values = running_query(
+        f"select distinct {column} from Traffic_Stops.digital_ledger "
+        f"where {column} is not null order by {column}", name=f"distinct {column}")
+    return values[column].tolist()
+
+def loading_distinct_values(column):
+    try:
+        return querying_distinct_values(column)
+    except (pymysql.MySQLError, PoolTimeout) as e:
+        st.error(f"DATABASE CONNECTION ERROR: {e}")
+        return []
+
+# -------------------------------
+# 4b. Query variants: rollup tables (ledger_rollups.py), generated columns (ledger_schema.py)
+# -------------------------------
+# Runs once per ledger version: folds any new stops into the rollups, then
+# reports whether insights can be answered from them.
+@st.cache_data(ttl=LEDGER_CACHE_TTL, show_spinner=False)
+def querying_rollup_status(version):
+    with creating_connection().connection() as myconnection:
+        if not rollups_ready(myconnection):
+            return False
+        refresh_rollups(myconnection)
+        return True
+
+def using_rollups():
+    try:
+        return querying_rollup_status(reading_ledger_version())
+    except (pymysql.MySQLError, PoolTimeout):
+        return False
+
+@st.cache_data(ttl=LEDGER_CACHE_TTL, show_spinner=False)
+def querying_generated_columns_status():
+    with creating_connection().connection() as myconnection:
+        return migration_applied(myconnection, GENERATED_COLUMNS_MIGRATION)
+
+def using_generated_columns():
+    try:
+        return querying_generated_columns_status()
+    except (pymysql.MySQLError, PoolTimeout):
+        return False
+
+@st.cache_data(ttl=LEDGER_CACHE_TTL, show_spinner=False)
+def querying_partitions_status():
+    with creating_connection().connection() as myconnection:
+        return migration_applied(myconnection, PARTITIONS_MIGRATION)
+
+def using_partitions():
+    try:
+        return querying_partitions_status()
+    except (pymysql.MySQLError, PoolTimeout):
+        return False
+
+def insight_query(name, query):
+    # Prefer the rollup version of an insight when the rollups are built, then
+    # the rewrite over the indexed generated columns once migration 0004 ran
+    if name in ROLLUP_QUERIES and using_rollups():
+        return ROLLUP_QUERIES[name]
+    if name in GENERATED_COLUMN_QUERIES and using_generated_columns():
+        return GENERATED_COLUMN_QUERIES[name]
+    return query
+
+# -------------------------------
+# 4b2. Date partitions (ledger_partitions.py): layout and scan sizes
+# -------------------------------
+@st.cache_data(ttl=LEDGER_CACHE_TTL, show_spinner=False)
+def querying_partition_layout(version):
+    with creating_connection().connection() as myconnection:
+        return ledger_partitions(myconnection)
+
+@st.cache_data(ttl=LEDGER_CACHE_TTL, show_spinner=False)
+def querying_scan_size(query, params, version):
+    with creating_connection().connection() as myconnection:
+        return scan_size(myconnection, query, params)
+
+def rendering_scan_size(query, params):
+    # How much of the partitioned ledger a date-scoped query reads, from EXPLAIN
+    if not using_partitions():
+        return
+    try:
+        version = reading_ledger_version()
+        total = len(querying_partition_layout(version))
+        scan = querying_scan_size(query, params, version)
+    except (pymysql.MySQLError, PoolTimeout):
+        return
+    st.caption(f"Scans {len(scan['partitions'])} of {total} date partitions, "
+               f"~{scan['rows']:,} rows estimated by EXPLAIN")
+
+# -------------------------------
+# 4c. Stop logging (group-committed writes, see stop_logging_api.py)
+# -------------------------------
+@st.cache_resource
+def getting_stop_logger():
+    return StopLogger(pool=creating_connection())
+
+# -------------------------------
+# 4c2. Columnar analytics engine (optional, see ledger_analytics.py)
+# -------------------------------
+@st.cache_resource(show_spinner="Opening the columnar snapshot...")
+def getting_analytics_engine():
+    return DuckDBEngine()
+
+def fetching_columnar_data(name):
+    try:
+        return getting_analytics_engine().run(duckdb_catalog()[name])
+    except ANALYTICS_ERRORS as e:
+        st.error(f"ANALYTICS ENGINE ERROR: {e}")
         return pd.DataFrame()
 
+def refreshing_columnar_snapshot():
+    try:
+        with creating_connection().connection() as myconnection:
+            appended = refresh_snapshot(myconnection, log=lambda message: None)
+        getting_analytics_engine().reload()
+        return appended
+    except (pymysql.MySQLError, PoolTimeout) as e:
+        st.error(f"DATABASE CONNECTION ERROR: {e}")
+    except ANALYTICS_ERRORS as e:
+        st.error(f"ANALYTICS ENGINE ERROR: {e}")
+    return None
+
+# -------------------------------
+# 4c3. Chart and ADVANCED INSIGHTS rendering (catalog, builder and reports)
+# -------------------------------
+def rendering_chart(name, rows, building_figure, source_rows=None):
+    # Times building the figure and sending it; bytes is the JSON payload shipped to the browser
+    with getting_profiler().timer("render", name) as counts:
+        fig = building_figure()
+        counts["rows"] = rows
+        counts["bytes"] = len(fig.to_json())
+        st.plotly_chart(fig, use_container_width=True)
+    if source_rows is not None and source_rows > rows:
+        st.caption(f"Chart reduced to {rows:,} points from {source_rows:,} result rows.")
+
+def rendering_bar_chart(output, name, value, title, additive=False):
+    # Largest bars only; the rest go into an "Other" bar only for counts (additive measures)
+    bars = output
+    if pd.api.types.is_numeric_dtype(output[value]):
+        bars = limit_categories(output, output.columns[0], value, other=additive)
+    rendering_chart(name, len(bars), lambda: px.bar(bars, x=bars.columns[0], y=value, title=title, text_auto=True),
+                    source_rows=len(output))
+
+def rendering_insight(output, name):
+    if output.empty:
+        st.warning("NO RESULTS FOUND 🔍")
+        return
+    st.write(output)
+    # Basic visualization if columns fit
+    if {"STOP_YEAR", "STOP_MONTH", "STOP_HOUR", "total_stops"} <= set(output.columns):
+        # Pre-binned on the server: month (or coarser) x hour of the day
+        binned, granularity = bin_periods(output, "STOP_YEAR", "STOP_MONTH", "STOP_HOUR", "total_stops")
+        grid = binned.pivot_table(index="STOP_HOUR", columns="period", values="total_stops", aggfunc="sum")
+        rendering_chart(name, grid.size, lambda: px.imshow(grid, color_continuous_scale="Blues", aspect="auto",
+                                                           labels={"x": granularity, "y": "hour of the day"},
+                                                           title=f"Stops per {granularity} and hour of the day"),
+                        source_rows=len(output))
+    elif "count" in output.columns or "tot_count" in output.columns or "Counts" in output.columns:
+        numeric_col = [c for c in output.columns if c.lower() in ["count", "tot_count", "counts"]][0]
+        rendering_bar_chart(output, name, numeric_col, f"Visualization of {name}", additive=True)
+    elif "arrest_rate" in output.columns:
+        rendering_bar_chart(output, name, "arrest_rate", f"Arrest Rate - {name}")
+    elif output.shape[1] > 1:
+        value = output.columns[1]
+        rendering_bar_chart(output, name, value, f"Visualization of {name}",
+                            additive=value in COUNT_COLUMNS or value in ADDITIVE_MEASURES)
+
+# -------------------------------
+# 4d. KEY METRICES rendering (shared by the static and live modes)
 # -------------------------------
-# 4. Load initial dataset
-# -------------------------------
-query = "select * from Traffic_Stops.digital_ledger"
-data = fetching_of_data(query)
-
-# Format stop_time if present
-if 'stop_time' in data.columns:
-    def format_stop_time(x):
-        if pd.isnull(x):
-            return None
-        elif isinstance(x, datetime.time):
-            return x.strftime('%H:%M:%S')
-        elif isinstance(x, datetime.timedelta):
-            total_seconds = int(x.total_seconds())
-            hours = total_seconds // 3600
-            minutes = (total_seconds % 3600) // 60
-            seconds = total_seconds % 60
-            return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-        elif isinstance(x, str):
-            return x[:8]  
+def rendering_key_metrics(key_metrics):
+    totals = key_metrics["KEY METRICES: totals"]
+    if not totals.empty:
+        totals = totals.iloc[0].fillna(0).astype(int)
+        col1, col2, col3, col4 = st.columns(4)
+
+        with col1:
+            st.metric("TOTAL POLICE STOPS", totals['total_stops'])
+
+        with col2:
+            st.metric("TOTAL ARREST", totals['arrests'])
+
+        with col3:
+            st.metric("TOTAL WARNINGS", totals['warnings'])
+
+        with col4:
+            st.metric("DRUG RELATED STOPS", totals['drug_related'])
+
+    # 🔥 Visualization: distribution of stop outcomes
+    outcome_counts = key_metrics["KEY METRICES: outcomes"]
+    if not outcome_counts.empty:
+        rendering_chart("KEY METRICES: outcomes", len(outcome_counts),
+                        lambda: px.bar(outcome_counts, x="stop_outcome", y="count", color="stop_outcome",
+                                       title="Distribution of Stop Outcomes", text_auto=True))
+
+    # 🔥 Pie chart for gender distribution
+    gender_counts = key_metrics["KEY METRICES: genders"]
+    if not gender_counts.empty:
+        rendering_chart("KEY METRICES: genders", len(gender_counts),
+                        lambda: px.pie(gender_counts, values="Count", names="Gender",
+                                       title="Driver Gender Distribution", hole=0.3,
+                                       color_discrete_sequence=px.colors.sequential.RdBu))
+
+    # 🔥 Time series of traffic stops
+    stops_per_month = key_metrics["KEY METRICES: stops per month"]
+    if not stops_per_month.empty:
+        trend = downsample_series(stops_per_month, "stop_date", "Counts")
+        rendering_chart("KEY METRICES: stops per month", len(trend),
+                        lambda: px.line(trend, x="stop_date", y="Counts",
+                                        title="Traffic Stops Over Time", markers=True),
+                        source_rows=len(stops_per_month))
+
+    # 🔥 Heatmap for day vs hour stops
+    day_hour_counts = key_metrics["KEY METRICES: day and hour"]
+    if not day_hour_counts.empty:
+        pivot = day_hour_counts.pivot_table(index="stop_day", columns="stop_hour", values="stops", aggfunc="sum")
+        rendering_chart("KEY METRICES: day and hour", len(day_hour_counts),
+                        lambda: px.imshow(pivot, text_auto=True, color_continuous_scale="Blues",
+                                          title="Heatmap of Stops by Hour and Day"))
+
+# One poller per server process: every live session shares the same counters,
+# and the watchlist engine checks each new stop exactly once
+@st.cache_resource(show_spinner="Seeding live metrics and watchlist...")
+def getting_delta_poller():
+    rollups = using_rollups()
+    seed_queries = {name: ROLLUP_QUERIES[name] if rollups else insight_query(name, query)
+                    for name, query in KEY_METRIC_QUERIES.items()}
+    poller = LedgerDeltaPoller()
+    live_metrics = LiveKeyMetrics(seed_queries)
+    watchlist = WatchlistEngine()
+    poller.subscribe(live_metrics)
+    poller.subscribe(watchlist)
+    with creating_connection().connection() as myconnection:
+        if rollups:
+            poller.seed(myconnection, ROLLUP_WATERMARK_QUERY, trailing_ids=0)
         else:
-            return str(x)[:8]  
+            poller.seed(myconnection, LEDGER_WATERMARK_QUERY)
+    return poller, live_metrics, watchlist
 
-    data['stop_time'] = data['stop_time'].apply(format_stop_time)
+def loading_delta_poller():
+    # Seeding fails on a database outage or a ledger without the ``id`` key (python ledger_schema.py)
+    try:
+        return getting_delta_poller()
+    except (pymysql.MySQLError, PoolTimeout) as e:
+        st.error(f"DATABASE CONNECTION ERROR: {e}")
+        return None
+
+def polling_new_stops(poller):
+    try:
+        with creating_connection().connection() as myconnection:
+            return poller.poll(myconnection)
+    except (pymysql.MySQLError, PoolTimeout) as e:
+        st.error(f"DATABASE CONNECTION ERROR: {e}")
+        return 0
 
 # -------------------------------
 # 5. Sidebar Navigation
 # -------------------------------
 st.sidebar.title("Navigation")
-page = st.sidebar.radio("Go to", [
+pages = [
     "INTRODUCTION OF THE PROJECT",
     "FULL TABLE",
     "KEY METRICES",
     "ADVANCED INSIGHTS",
-    "PREDICT OUTCOME AND VIOLATION"
-])
+    "PREDICT OUTCOME AND VIOLATION",
+    "WATCHLIST ALERTS",
+]
+# Hidden from everyday users: open the app with ?diagnostics=1 or set LEDGER_DIAGNOSTICS=1
+if st.query_params.get("diagnostics") == "1" or os.environ.get("LEDGER_DIAGNOSTICS") == "1":
+    pages.append("DIAGNOSTICS")
+page = st.sidebar.radio("Go to", pages)
 
 # -------------------------------
 # Page 1 - INTRODUCTION
@@ -104,63 +425,99 @@ if page == "INTRODUCTION OF THE PROJECT":
 # -------------------------------
 elif page == 'FULL TABLE':
     st.header("🧾 OVERVIEW OF THE POLICE LOGS")
-    st.dataframe(data, use_container_width=True)
+
+    with st.expander("🔎 FILTERS AND SORT", expanded=False):
+        col1, col2 = st.columns(2)
+        with col1:
+            use_dates = st.checkbox("Filter by stop date")
+            date_range = st.date_input("STOP DATE RANGE", value=(datetime.date.today() - datetime.timedelta(days=30),
+                                                                  datetime.date.today()),
+                                       disabled=not use_dates)
+            vehicle_filter = st.text_input("VEHICLE NUMBER (starts with)")
+            sort_label = st.selectbox("SORT BY", list(SORTABLE_COLUMNS))
+            descending = st.checkbox("Descending")
+        with col2:
+            country_filter = st.multiselect("COUNTRY", loading_distinct_values("country_name"))
+            violation_filter = st.multiselect("VIOLATION", loading_distinct_values("violation"))
+            outcome_filter = st.multiselect("STOP OUTCOME", loading_distinct_values("stop_outcome"))
+            page_size = st.selectbox("ROWS PER PAGE", PAGE_SIZES, index=1)
+
+    table_filters = {
+        "country_name": country_filter,
+        "violation": violation_filter,
+        "stop_outcome": outcome_filter,
+        "vehicle_number": vehicle_filter,
+    }
+    if use_dates and len(date_range) == 2:
+        table_filters["date_from"], table_filters["date_to"] = date_range
+    sort_column = SORTABLE_COLUMNS[sort_label]
+
+    # Any change of filter/sort/page size starts again from the first page
+    table_state = repr((sorted(table_filters.items()), sort_column, descending, page_size))
+    if st.session_state.get("table_state") != table_state:
+        st.session_state.table_state = table_state
+        st.session_state.table_cursors = [None]   # cursor of every page visited so far
+
+    cursors = st.session_state.table_cursors
+    page_query, page_params = build_page_query(table_filters, sort_column, descending,
+                                               after=cursors[-1], page_size=page_size,
+                                               pruning=using_partitions())
+    page_rows = fetching_of_data(page_query, page_params, name="FULL TABLE: page")
+    has_next = len(page_rows) > page_size
+    page_rows = page_rows.head(page_size)
+    next_cursor = page_cursor(page_rows, sort_column) if has_next else None
+    # Typed, compact copy for display: categoricals, flags, small ints, one stop_datetime
+    compact_rows = compact_ledger_frame(page_rows)
+
+    st.dataframe(compact_rows, use_container_width=True, hide_index=True)
+
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 3])
+    if col1.button("⏮ First", disabled=len(cursors) == 1):
+        st.session_state.table_cursors = [None]
+        st.rerun()
+    if col2.button("◀ Previous", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    if col3.button("Next ▶", disabled=not has_next):
+        cursors.append(next_cursor)
+        st.rerun()
+    col4.caption(f"Page {len(cursors)} · {len(page_rows)} rows on this page · "
+                 f"{memory_per_row(compact_rows):,.0f} bytes/row in memory "
+                 f"(vs {memory_per_row(page_rows):,.0f} untyped)")
+
+    if st.checkbox("Count matching rows (scans the filtered ledger)"):
+        count_query, count_params = build_count_query(table_filters, pruning=using_partitions())
+        counted = fetching_of_data(count_query, count_params, name="FULL TABLE: count")
+        if not counted.empty:
+            st.caption(f"{int(counted.iloc[0, 0]):,} matching stops")
+        rendering_scan_size(count_query, count_params)
 
 # -------------------------------
 # Page 3 - KEY METRICS (with charts)
 # -------------------------------
 elif page == 'KEY METRICES':
     st.header("📊 KEY METRICS")
-    col1, col2, col3, col4 = st.columns(4)
-
-    with col1:
-        total_stops = data.shape[0]
-        st.metric("TOTAL POLICE STOPS", total_stops)
-
-    with col2:
-        arrests = data[data['stop_outcome'].str.contains("arrest", case=False, na=False)].shape[0]
-        st.metric("TOTAL ARREST", arrests)
-
-    with col3:
-        warnings = data[data['stop_outcome'].str.contains("warning", case=False, na=False)].shape[0]
-        st.metric("TOTAL WARNINGS", warnings)
-
-    with col4:
-        drug_related = data[data['drugs_related_stop'] == 1].shape[0]
-        st.metric("DRUG RELATED STOPS", drug_related)
-
-    # 🔥 Visualization: distribution of stop outcomes
-    if "stop_outcome" in data.columns:
-        fig1 = px.histogram(data, x="stop_outcome", color="stop_outcome",
-                           title="Distribution of Stop Outcomes", text_auto=True)
-        st.plotly_chart(fig1, use_container_width=True)
-
-    # 🔥 Pie chart for gender distribution
-    if "driver_gender" in data.columns:
-        gender_counts = data['driver_gender'].value_counts().reset_index()
-        gender_counts.columns = ["Gender", "Count"]
-        fig2 = px.pie(gender_counts, values="Count", names="Gender",
-                     title="Driver Gender Distribution", hole=0.3,
-                     color_discrete_sequence=px.colors.sequential.RdBu)
-        st.plotly_chart(fig2, use_container_width=True)
-
-    # 🔥 Time series of traffic stops
-    if "stop_date" in data.columns:
-        data['stop_date'] = pd.to_datetime(data['stop_date'], errors='coerce')
-        stops_per_month = data.groupby(data['stop_date'].dt.to_period("M")).size().reset_index(name="Counts")
-        stops_per_month['stop_date'] = stops_per_month['stop_date'].astype(str)
-        fig3 = px.line(stops_per_month, x="stop_date", y="Counts",
-                      title="Traffic Stops Over Time", markers=True)
-        st.plotly_chart(fig3, use_container_width=True)
-
-    # 🔥 Heatmap for day vs hour stops
-    if "stop_date" in data.columns and "stop_time" in data.columns:
-        data['stop_hour'] = pd.to_datetime(data['stop_time'], errors='coerce').dt.hour
-        data['stop_day'] = pd.to_datetime(data['stop_date'], errors='coerce').dt.day_name()
-        pivot = data.pivot_table(index="stop_day", columns="stop_hour", values="vehicle_number", aggfunc="count")
-        fig4 = px.imshow(pivot, text_auto=True, color_continuous_scale="Blues",
-                        title="Heatmap of Stops by Hour and Day")
-        st.plotly_chart(fig4, use_container_width=True)
+    live_mode = st.checkbox("🔴 LIVE REFRESH (folds in new stops only)")
+
+    if live_mode:
+        refresh_seconds = st.select_slider("REFRESH EVERY (seconds)", [2, 5, 10, 30, 60], value=5)
+
+        @st.fragment(run_every=refresh_seconds)
+        def rendering_live_key_metrics():
+            delta_poller = loading_delta_poller()
+            if delta_poller is None:
+                return
+            poller, live_metrics, _ = delta_poller
+            new_stops = polling_new_stops(poller)
+            rendering_key_metrics(live_metrics.frames())
+            st.caption(f"Live · {new_stops} new stops this refresh · watermark id {poller.watermark} · "
+                       f"updated {datetime.datetime.now():%H:%M:%S}")
+
+        rendering_live_key_metrics()
+    else:
+        key_metrics = {name: fetching_cached_data(name, insight_query(name, query))
+                       for name, query in KEY_METRIC_QUERIES.items()}
+        rendering_key_metrics(key_metrics)
 
 # -------------------------------
 # Page 4 - ADVANCED INSIGHTS (with visualizations)
@@ -168,303 +525,143 @@ elif page == 'KEY METRICES':
 elif page == 'ADVANCED INSIGHTS':
     st.header("🔥 ADVANCED INSIGHTS")
 
-    selecting_the_query = st.selectbox("Select the query to run", [
-        "Top 10 vehicle number related to drug related stop",
-        "Frequently searched vehicle",
-        "Driver age group having high arrest rate",
-        "Gender distribution of driver stopped in each country",
-        "Gender and race combination having highest arrest rate",
-        "Time of the day having most traffic stop",
-        "Average stop duration for different violation",
-        "Are the stops during the night are more likely to lead to arrests",
-        "Violation most associated with search or arrest",
-        "Violation most common among young driver (i.e) less than 25",
-        "Violation that rarely result in search or arrest",
-        "Country reporting the highest rate of drug related stops",
-        "Arrest rate by country and violation",
-        "Country having most stop with search conducted",
-        "Top 5 violation with highest arrest rate",
-        "Driver demographic[Age,Gender,Race] by country",
-        "Violation with high search and arrest rate",
-        "Number of stops by year,month,hour of the day",
-        "Driver violation trend based on race & age",
-        "Yearly breakdown of stops and arrests by country"
-    ])
-
-    # Mapping (kept same as original)
-    # ... keep all queries here (unchanged from original)
-    maping_of_query = {
-    "Top 10 vehicle number related to drug related stop": """
-        select vehicle_number,
-               count(*) as count 
-        from Traffic_Stops.digital_ledger 
-        where drugs_related_stop=TRUE 
-        group by vehicle_number 
-        order by count desc 
-        limit 10
-    """,
-
-    "Frequently searched vehicle": """
-        select vehicle_number,
-               count(*) as most_frequent_search_count 
-        from Traffic_Stops.digital_ledger 
-        where search_conducted=TRUE 
-        group by vehicle_number 
-        order by most_frequent_search_count desc 
-        limit 15
-    """,
-
-    "Driver age group having high arrest rate": """
-        select case
-                   when driver_age between 18 and 25 then '18-25'
-                   when driver_age between 26 and 35 then '26-35'
-                   when driver_age between 36 and 45 then '36-45'
-                   when driver_age between 46 and 60 then '46-60'
-                   else '60+'
-               end as age_group,
-               count(*) as total_stops,
-               count(case when is_arrested=TRUE then 1 end) as arrests,
-               round(count(case when is_arrested=TRUE then 1 end)/count(*)*100.0,2) as arrest_rate
-        from Traffic_Stops.digital_ledger 
-        group by age_group 
-        order by arrest_rate desc 
-        limit 1
-    """,
-
-    "Gender distribution of driver stopped in each country": """
-        select country_name,
-               count(case when driver_gender='M' then 1 end) as MALE,
-               count(case when driver_gender='F' then 1 end) as FEMALE 
-        from Traffic_Stops.digital_ledger 
-        group by country_name
-    """,
-
-    "Gender and race combination having highest arrest rate": """
-        select driver_race,
-               driver_gender,
-               round(count(case when search_conducted=TRUE then 1 end)/count(*)*100.0, 2) as search_rate
-        from Traffic_Stops.digital_ledger 
-        group by driver_race, driver_gender 
-        order by search_rate DESC 
-        limit 1
-    """,
-
-    "Time of the day having most traffic stop": """
-        select hour(str_to_date(stop_time,'%H:%i')) as hour_of_the_day,
-               count(*) as stop_count 
-        from Traffic_Stops.digital_ledger 
-        group by hour_of_the_day 
-        order by stop_count DESC 
-        limit 1
-    """,
-
-    "Average stop duration for different violation": """
-        select violation,
-               avg(case
-                       when stop_duration='0-15 Min' then 7.5
-                       when stop_duration='16-30 Min' then 23
-                       when stop_duration='30+ Min' then 35
-                   end) as average_stop_duration
-        from Traffic_Stops.digital_ledger 
-        group by violation
-    """,
-
-    "Are the stops during the night are more likely to lead to arrests": """
-        select case
-                   when hour(str_to_date(stop_time,'%H:%i'))>=18 or hour(str_to_date(stop_time,'%H:%i'))<6 
-                   then 'NIGHT' 
-                   else 'DAY' 
-               end as stop_period,
-               count(*) as total_stops,
-               count(case when is_arrested=TRUE then 1 end) as arrests,
-               round(count(case when is_arrested=TRUE then 1 end)/count(*)*100.0,2) as arrest_rate_percent
-        from Traffic_Stops.digital_ledger 
-        group by stop_period
-    """,
-
-    "Violation most associated with search or arrest": """
-        select violation,
-               count(case when search_conducted=TRUE then 1 end) as count_of_the_search,
-               count(case when is_arrested=TRUE then 1 end) as count_of_the_arrest,
-               round(count(case when search_conducted=TRUE then 1 end)/count(*)*100.0,2) as search_rate,
-               round(count(case when is_arrested=TRUE then 1 end)/count(*)*100.0,2) as arrest_rate,
-               greatest(
-                   round(count(case when search_conducted=TRUE then 1 end)/count(*)*100.0,2),
-                   round(count(case when is_arrested=TRUE then 1 end)/count(*)*100.0,2)
-               ) as maximum_arrest_or_search_rate
-        from Traffic_Stops.digital_ledger 
-        group by violation 
-        order by maximum_arrest_or_search_rate desc 
-        limit 1
-    """,
-
-    "Violation most common among young driver (i.e) less than 25": """
-        select violation,
-               count(*) as counts_of_driver 
-        from Traffic_Stops.digital_ledger 
-        where driver_age<25 
-        group by violation 
-        order by counts_of_driver desc 
-        limit 1
-    """,
-
-    "Violation that rarely result in search or arrest": """
-        select violation,
-               count(case when search_conducted=TRUE then 1 end) as count_of_the_search,
-               count(case when is_arrested=TRUE then 1 end) as count_of_the_arrest,
-               round(count(case when search_conducted=TRUE then 1 end)/count(*)*100.0,2) as search_rate,
-               round(count(case when is_arrested=TRUE then 1 end)/count(*)*100.0,2) as arrest_rate,
-               least(
-                   round(count(case when search_conducted=TRUE then 1 end)/count(*)*100.0,2),
-                   round(count(case when is_arrested=TRUE then 1 end)/count(*)*100.0,2)
-               ) as rarely_arrest_or_search_rate
-        from Traffic_Stops.digital_ledger 
-        group by violation 
-        order by rarely_arrest_or_search_rate asc 
-        limit 1
-    """,
-
-    "Country reporting the highest rate of drug related stops": """
-        select country_name,
-               count(*) as tot_counts,
-               round(count(case when drugs_related_stop=TRUE then 1 end)/count(*)*100.0,2) as drugs_related_stop_rates
-        from Traffic_Stops.digital_ledger 
-        group by country_name 
-        order by drugs_related_stop_rates desc 
-        limit 1
-    """,
-
-    "Arrest rate by country and violation": """
-        select country_name,
-               violation,
-               count(*) as tot_count,
-               round(count(case when is_arrested=TRUE then 1 end)/count(*)*100.0,2) as arrest_rate
-        from Traffic_Stops.digital_ledger 
-        group by country_name, violation
-    """,
-
-    "Country having most stop with search conducted": """
-        select country_name,
-               count(case when search_conducted=TRUE then 1 end) as no_of_counts 
-        from Traffic_Stops.digital_ledger 
-        group by country_name 
-        order by no_of_counts desc 
-        limit 1
-    """,
-
-    "Top 5 violation with highest arrest rate": """
-        select violation,
-               count(*) as total,
-               round(count(case when is_arrested=TRUE then 1 end)/count(*)*100,2) as arrest_rate
-        from Traffic_Stops.digital_ledger 
-        group by violation 
-        order by arrest_rate desc 
-        limit 5
-    """,
-
-    "Driver demographic[Age,Gender,Race] by country": """
-        select country_name,
-               count(*) as tot_driver,
-               count(case when driver_gender='M' then 1 end) as Male_driver,
-               count(case when driver_gender='F' then 1 end) as Female_driver,
-               count(case when driver_race='Asian' then 1 end) as Asian_driver,
-               count(case when driver_race='Black' then 1 end) as Black_driver,
-               count(case when driver_race='Hispanic' then 1 end) as Hispanic_driver,
-               count(case when driver_race='Other' then 1 end) as Other_people,
-               count(case when driver_race='White' then 1 end) as White_driver,
-               count(case when driver_age<30 then 1 end) as less_than_thirty,
-               count(case when driver_age between 30 and 50 then 1 end) as between_thirty_and_fifty,
-               count(case when driver_age>50 then 1 end) as greater_than_fifty
-        from Traffic_Stops.digital_ledger 
-        group by country_name
-    """,
-
-    "Violation with high search and arrest rate": """
-        select * 
-        from (
-            select distinct violation,
-                   count(*) over(partition by violation) as total_stops,
-                   sum(case when search_conducted=TRUE then 1 else 0 end) over(partition by violation) as total_searches,
-                   sum(case when is_arrested=TRUE then 1 else 0 end) over(partition by violation) as total_arrests,
-                   round(avg(case when search_conducted=TRUE then 1 else 0 end) over(partition by violation)*100,2) as search_rate_percent,
-                   round(avg(case when is_arrested=TRUE then 1 else 0 end) over(partition by violation)*100,2) as arrest_rate_percent
-            from Traffic_Stops.digital_ledger
-        ) as sub 
-        where search_rate_percent>20 or arrest_rate_percent>20 
-        order by search_rate_percent desc, arrest_rate_percent desc
-    """,
-
-    "Number of stops by year,month,hour of the day": """
-        select year(str_to_date(stop_date,'%Y-%m-%d')) as STOP_YEAR,
-               month(str_to_date(stop_date,'%Y-%m-%d')) as STOP_MONTH,
-               hour(str_to_date(stop_time,'%H:%i')) as STOP_HOUR,
-               count(*) as total_stops 
-        from Traffic_Stops.digital_ledger 
-        group by STOP_YEAR, STOP_MONTH, STOP_HOUR 
-        order by STOP_YEAR, STOP_MONTH, STOP_HOUR
-    """,
-
-    "Driver violation trend based on race & age": """
-        select age_info.age_group,
-               r.driver_race,
-               count(*) as total_violations 
-        from Traffic_Stops.digital_ledger r 
-        join (
-            select distinct driver_age,
-                   case
-                       when driver_age between 16 and 25 then '16-25'
-                       when driver_age between 26 and 35 then '26-35'
-                       when driver_age between 36 and 50 then '36-50'
-                       when driver_age>50 then '51+'
-                       else 'Unknown'
-                   end as age_group
-            from Traffic_Stops.digital_ledger
-        ) as age_info 
-        on r.driver_age=age_info.driver_age 
-        group by age_info.age_group, r.driver_race 
-        order by age_info.age_group, r.driver_race
-    """,
-
-    "Yearly breakdown of stops and arrests by country": """
-        select stats.stop_year,
-               stats.country_name,
-               stats.total_stops,
-               stats.total_arrests,
-               round(total_arrests/NULLIF(total_stops,0)*100.0, 2) as arrest_rate_percent,
-               sum(total_arrests) over(partition by country_name order by stop_year) as cumulative_arrests
-        from (
-            select year(str_to_date(stop_date,'%Y-%m-%d')) as stop_year,
-                   country_name,
-                   count(*) as total_stops,
-                   count(if(is_arrested,1,NULL)) as total_arrests
-            from Traffic_Stops.digital_ledger 
-            group by stop_year, country_name
-        ) as stats 
-        order by stats.country_name, stats.stop_year
-    """
-}
+    selecting_the_query = st.selectbox("Select the query to run", list(INSIGHT_QUERIES))
+
+    maping_of_query = INSIGHT_QUERIES
+
+    backends = ["MySQL"]
+    if analytics_available():
+        backends.append("DuckDB (columnar snapshot)")
+    selecting_the_backend = st.radio("Run on", backends, horizontal=True)
+    using_duckdb = selecting_the_backend != "MySQL"
 
+    if using_duckdb:
+        snapshot = snapshot_info()
+        left, right = st.columns([3, 1])
+        left.caption(f"Snapshot: {snapshot['rows']:,} stops up to id {snapshot['last_id']}, "
+                     f"{snapshot['bytes_on_disk'] / 1024 ** 2:.1f} MB of Parquet")
+        if right.button("Refresh snapshot"):
+            with st.spinner("Appending new stops to the snapshot..."):
+                appended = refreshing_columnar_snapshot()
+            if appended is not None:
+                st.success(f"Appended {appended:,} new stops")
+        comparing_backends = st.checkbox("Also time the query on MySQL")
 
     if st.button("Run the query 🛩️"):
-        output = fetching_of_data(maping_of_query[selecting_the_query])
-        if not output.empty:
-            st.write(output)
-            # Basic visualization if columns fit
-            if "count" in output.columns or "tot_count" in output.columns or "Counts" in output.columns:
-                numeric_col = [c for c in output.columns if c.lower() in ["count", "tot_count", "counts"]][0]
-                fig = px.bar(output, x=output.columns[0], y=numeric_col,
-                             title=f"Visualization of {selecting_the_query}", text_auto=True)
-                st.plotly_chart(fig, use_container_width=True)
-            elif "arrest_rate" in output.columns:
-                fig = px.bar(output, x=output.columns[0], y="arrest_rate",
-                             title=f"Arrest Rate - {selecting_the_query}", text_auto=True)
-                st.plotly_chart(fig, use_container_width=True)
-            elif output.shape[1] > 1:
-                fig = px.bar(output, x=output.columns[0], y=output.columns[1],
-                             title=f"Visualization of {selecting_the_query}", text_auto=True)
-                st.plotly_chart(fig, use_container_width=True)
+        if using_duckdb:
+            started = time.perf_counter()
+            output = fetching_columnar_data(selecting_the_query)
+            duckdb_seconds = time.perf_counter() - started
+            if comparing_backends:
+                # Straight to MySQL, bypassing the result cache, so both timings are cold
+                started = time.perf_counter()
+                fetching_of_data(insight_query(selecting_the_query, maping_of_query[selecting_the_query]),
+                                 streaming=True, name=selecting_the_query)
+                mysql_seconds = time.perf_counter() - started
+                st.dataframe(pd.DataFrame([
+                    {"backend": "MySQL", "ms": round(mysql_seconds * 1000, 1)},
+                    {"backend": "DuckDB", "ms": round(duckdb_seconds * 1000, 1)},
+                ]), hide_index=True)
+            else:
+                st.caption(f"DuckDB answered in {duckdb_seconds * 1000:.1f} ms")
         else:
-            st.warning("NO RESULTS FOUND 🔍")
+            output = fetching_cached_data(selecting_the_query,
+                                          insight_query(selecting_the_query, maping_of_query[selecting_the_query]))
+        rendering_insight(output, selecting_the_query)
+
+    with st.expander("📋 RUN ALL / SELECTED INSIGHTS (daily briefing)"):
+        report_names = st.multiselect("Insights in the report", list(INSIGHT_QUERIES), default=list(INSIGHT_QUERIES))
+        col1, col2 = st.columns(2)
+        # Leave connections free for the rest of the dashboard and for cancelling
+        most_workers = max(2, creating_connection().size - 2)
+        report_workers = col1.slider("RUN AT ONCE", 1, most_workers, min(REPORT_WORKERS, most_workers))
+        report_timeout = col2.number_input("TIMEOUT PER INSIGHT (s)", min_value=1, value=QUERY_TIMEOUT_SECONDS)
+        st.caption("Press Stop, or change any setting, to cancel the insights still running.")
+        if st.button("Run the report 🚓") and report_names:
+            report_run = InsightRun({name: insight_query(name, INSIGHT_QUERIES[name]) for name in report_names},
+                                    pool=creating_connection(), workers=report_workers,
+                                    timeout=report_timeout, cache=getting_result_cache(),
+                                    profiler=getting_profiler())
+            progress = st.progress(0.0, text="Running insights...")
+            report_results = []
+            for result in report_run.results():
+                report_results.append(result)
+                progress.progress(len(report_results) / len(report_names),
+                                  text=f"{len(report_results)} of {len(report_names)} insights done")
+                with st.expander(f"{result.name} · {result.error or f'{result.seconds:.2f}s'}"):
+                    if result.error is None:
+                        rendering_insight(result.frame, result.name)
+                    else:
+                        st.error(result.error)
+            report_results.sort(key=lambda result: report_names.index(result.name))
+            report_summary = summarize_run(report_run, report_results)
+            st.session_state.insight_report = format_report(report_results, report_summary)
+            st.success(f"{report_summary['insights']} insights in {report_summary['wall_seconds']}s, "
+                       f"against {report_summary['serial_seconds']}s one after another "
+                       f"({report_summary['speedup']}x); {report_summary['failed']} failed")
+        if st.session_state.get("insight_report"):
+            st.download_button("Download the report (HTML)", st.session_state.insight_report,
+                               file_name=f"briefing_{datetime.date.today()}.html", mime="text/html")
+
+    with st.expander("🧱 BUILD YOUR OWN INSIGHT"):
+        col1, col2 = st.columns(2)
+        with col1:
+            chosen_dimensions = st.multiselect("GROUP BY", list(DIMENSIONS), default=["violation"])
+            chosen_measures = st.multiselect("MEASURES", list(MEASURES),
+                                             default=["stops", "search_rate", "arrest_rate"])
+            chosen_order = st.selectbox("ORDER BY", ["(none)"] + chosen_dimensions + chosen_measures)
+            chosen_descending = st.checkbox("Descending", value=True, key="builder_descending")
+            chosen_limit = st.number_input("TOP N ROWS (0 = all)", min_value=0, value=0, step=1)
+        with col2:
+            builder_dates = st.checkbox("Only stops between", key="builder_use_dates")
+            builder_range = st.date_input("STOP DATE RANGE", key="builder_dates",
+                                          value=(datetime.date.today() - datetime.timedelta(days=365),
+                                                 datetime.date.today()),
+                                          disabled=not builder_dates)
+            builder_filters = {
+                "country_name": st.multiselect("COUNTRY", loading_distinct_values("country_name"),
+                                               key="builder_country"),
+                "violation": st.multiselect("VIOLATION", loading_distinct_values("violation"),
+                                            key="builder_violation"),
+                "driver_gender": st.multiselect("DRIVER GENDER", ["M", "F"], key="builder_gender"),
+            }
+            if builder_dates and len(builder_range) == 2:
+                builder_filters["date_from"], builder_filters["date_to"] = builder_range
+
+        if st.button("Run the insight 🧮"):
+            try:
+                spec = InsightSpec(chosen_dimensions, chosen_measures, builder_filters,
+                                   order_by=None if chosen_order == "(none)" else chosen_order,
+                                   descending=chosen_descending, limit=chosen_limit or None)
+            except ValueError as e:
+                st.error(f"INVALID INSIGHT: {e}")
+            else:
+                builder_query, builder_params = compile_spec(spec, using_generated_columns(), using_partitions())
+                # Keyed by the SQL and its parameters, so each variation is cached on its own
+                rendering_insight(fetching_cached_data(builder_query, builder_query, builder_params,
+                                                       label="custom insight"),
+                                  "your insight")
+                rendering_scan_size(builder_query, builder_params)
+
+    with st.expander("🔗 ANSWER RELATED INSIGHTS TOGETHER"):
+        related_names = st.multiselect("Catalog insights", list(INSIGHT_SPECS),
+                                       default=["Top 5 violation with highest arrest rate",
+                                                "Average stop duration for different violation"])
+        if st.button("Run together") and related_names:
+            related_specs = {name: INSIGHT_SPECS[name] for name in related_names}
+            scans = plan_shared_scans(related_specs, using_generated_columns(), using_partitions())
+            answers = answer_specs(lambda query, params: fetching_cached_data(query, query, params, label="shared scan"),
+                                   related_specs, using_generated_columns(), using_partitions())
+            st.caption(f"{len(related_specs)} insights answered from {len(scans)} ledger scans")
+            for name, output in answers.items():
+                st.subheader(name)
+                rendering_insight(output, name)
+
+    cache_stats = getting_result_cache().stats()
+    st.caption(f"Result cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+               f"{cache_stats['seconds_saved']}s of query time saved")
+    if not using_duckdb and selecting_the_query in ROLLUP_QUERIES and using_rollups():
+        st.caption("Answered from the pre-aggregated rollup tables")
 
 # -------------------------------
 # Page 5 - PREDICTION FORM
@@ -487,8 +684,12 @@ elif page == 'PREDICT OUTCOME AND VIOLATION':
         violation = st.selectbox("VIOLATION", ["Seatbelt", "Speeding", "Signal", "DUI", "Other"])
         search_conducted = st.selectbox("SEARCH CONDUCTED", ["0", "1"])
         stop_outcome = st.selectbox("STOP OUTCOME", ["Ticket", "Arrest", "Warning"])
-        stop_duration = st.selectbox("STOP DURATION", data['stop_duration'].dropna().unique())
+        stop_duration = st.selectbox("STOP DURATION", loading_distinct_values("stop_duration"))
         drugs_related_stop = st.selectbox("DRUG RELATED", ["0", "1"])
+        country_name = st.selectbox("COUNTRY", loading_distinct_values("country_name"))
+        driver_race = st.selectbox("DRIVER RACE", loading_distinct_values("driver_race"))
+        vehicle_number = st.text_input("VEHICLE NUMBER")
+        save_stop = st.checkbox("SAVE THIS STOP TO THE LEDGER")
         timestamp = pd.Timestamp.now()
 
         submit = st.form_submit_button("PREDICT THE STOP OUTCOME AND VIOLATION 🌟")
@@ -503,3 +704,150 @@ elif page == 'PREDICT OUTCOME AND VIOLATION':
         {searching}, and {pronoun} received a **{stop_outcome}**.  
         The stop lasted **{stop_duration}** and {drug_txt}.
         """)
+
+        if save_stop:
+            try:
+                getting_stop_logger().log_stops({
+                    "stop_date": stop_date,
+                    "stop_time": stop_time,
+                    "country_name": country_name,
+                    "driver_gender": driver_gender,
+                    "driver_age": driver_age,
+                    "driver_race": driver_race,
+                    "violation": violation,
+                    "search_conducted": search_conducted,
+                    "stop_outcome": stop_outcome,
+                    "stop_duration": stop_duration,
+                    "drugs_related_stop": drugs_related_stop,
+                    "vehicle_number": vehicle_number,
+                })
+            except InvalidStop as e:
+                st.error(f"STOP NOT SAVED: {e}")
+            except Exception as e:
+                st.error(f"DATABASE CONNECTION ERROR: {e}")
+            else:
+                st.success("STOP SAVED TO THE LEDGER 📝")
+
+# -------------------------------
+# Page 6 - WATCHLIST ALERTS
+# -------------------------------
+elif page == 'WATCHLIST ALERTS':
+    st.header("🚨 WATCHLIST ALERTS")
+    delta_poller = loading_delta_poller()
+    if delta_poller is None:
+        st.stop()
+    poller, _, watchlist = delta_poller
+
+    with st.form("watchlist_form", clear_on_submit=True):
+        col1, col2 = st.columns([2, 1])
+        new_vehicle = col1.text_input("FLAG A VEHICLE NUMBER")
+        flag_reason = col2.text_input("REASON", value="manual entry")
+        if st.form_submit_button("ADD TO WATCHLIST 🚩") and new_vehicle.strip():
+            watchlist.flag(new_vehicle, flag_reason or "manual entry")
+            st.success(f"{new_vehicle.strip()} added to the watchlist")
+
+    with st.expander("⚙️ ALERT RULES"):
+        for rule in watchlist.rules:
+            col1, col2 = st.columns(2)
+            rule.threshold = col1.number_input(f"{rule.name.upper()}: ALERT AT", min_value=1,
+                                               value=rule.threshold, key=f"{rule.name}_threshold")
+            rule.window_days = col2.number_input(f"{rule.name.upper()}: WITHIN DAYS", min_value=1,
+                                                 value=rule.window_days, key=f"{rule.name}_window")
+
+    @st.fragment(run_every=5)
+    def rendering_alerts():
+        new_stops = polling_new_stops(poller)
+        flagged = watchlist.flagged()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("FLAGGED VEHICLES", len(flagged))
+        col2.metric("STOPS CHECKED", watchlist.stops_checked)
+        col3.metric("ALERTS", len(watchlist.alerts))
+
+        alerts = watchlist.recent_alerts()
+        if alerts:
+            st.dataframe(pd.DataFrame(alerts, columns=Alert._fields), use_container_width=True, hide_index=True)
+        else:
+            st.info("No alerts yet. New stops are checked as they are ingested.")
+        st.caption(f"{new_stops} new stops checked this refresh · updated {datetime.datetime.now():%H:%M:%S}")
+
+    rendering_alerts()
+
+    with st.expander("🚩 FLAGGED VEHICLES"):
+        st.dataframe(pd.DataFrame(watchlist.flagged().items(), columns=["vehicle_number", "reason"]),
+                     use_container_width=True, hide_index=True)
+
+# -------------------------------
+# Page 7 - DIAGNOSTICS
+# -------------------------------
+elif page == 'DIAGNOSTICS':
+    st.header("🩺 DIAGNOSTICS")
+    st.subheader("Database connection pool")
+    pool_metrics = creating_connection().metrics()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("OPEN CONNECTIONS", f"{pool_metrics['open']} / {pool_metrics['size']}")
+    col2.metric("IN USE", pool_metrics['in_use'])
+    col3.metric("CHECKOUTS", pool_metrics['checkouts'])
+    col4.metric("AVG WAIT (ms)", pool_metrics['avg_wait_ms'])
+    st.table(pd.DataFrame(pool_metrics.items(), columns=["metric", "value"]).astype(str))
+
+    st.subheader("Insight result cache")
+    cache_stats = getting_result_cache().stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("HITS", cache_stats['hits'])
+    col2.metric("MISSES", cache_stats['misses'])
+    col3.metric("HIT RATE (%)", cache_stats['hit_rate'])
+    col4.metric("TIME SAVED (s)", cache_stats['seconds_saved'])
+    if st.button("Clear result cache"):
+        getting_result_cache().invalidate()
+
+    st.subheader("Stop logging")
+    st.table(pd.DataFrame(getting_stop_logger().metrics().items(), columns=["metric", "value"]).astype(str))
+
+    if using_partitions():
+        st.subheader("Date partitions")
+        try:
+            partitions = pd.DataFrame(querying_partition_layout(reading_ledger_version()))
+        except (pymysql.MySQLError, PoolTimeout) as e:
+            st.error(f"DATABASE CONNECTION ERROR: {e}")
+        else:
+            st.caption("Rows are InnoDB estimates; `python ledger_partitions.py maintain` adds upcoming "
+                       "partitions and archives old ones")
+            st.dataframe(partitions, use_container_width=True, hide_index=True)
+
+    st.subheader("Query and chart timings")
+    profiler = getting_profiler()
+    timings = pd.DataFrame(profiler.summary())
+    if timings.empty:
+        st.info("Nothing measured yet: open a few pages first.")
+    else:
+        stages = sorted(timings["stage"].unique())
+        stage_filter = st.multiselect("STAGES", stages, default=[s for s in ("result", "render") if s in stages])
+        shown = timings[timings["stage"].isin(stage_filter)] if stage_filter else timings
+        st.caption("result = the whole query per insight; connection/query/fetch/dataframe are its parts; "
+                   "render = building and sending a chart")
+        st.dataframe(shown.sort_values("p95_ms", ascending=False), use_container_width=True, hide_index=True)
+
+        series = st.selectbox("LATENCY HISTOGRAM", [f"{stage} · {name}" for stage, name
+                                                      in zip(timings["stage"], timings["name"])])
+        stage, name = series.split(" · ", 1)
+        histogram = pd.DataFrame(profiler.histogram(stage, name), columns=["latency", "calls"])
+        st.plotly_chart(px.bar(histogram, x="latency", y="calls", title=f"Latency of {series}"),
+                        use_container_width=True)
+
+    st.subheader("Slow query log")
+    col1, col2 = st.columns([1, 3])
+    logging_slow = col1.checkbox("Log slow queries", value=profiler.slow_query_seconds is not None)
+    threshold_ms = col2.number_input("SLOW QUERY THRESHOLD (ms)", min_value=1,
+                                     value=int((profiler.slow_query_seconds or 1.0) * 1000))
+    profiler.slow_query_seconds = threshold_ms / 1000 if logging_slow else None
+    for slow in profiler.slow_queries():
+        with st.expander(f"{slow.logged_at:%H:%M:%S} · {slow.name} · {slow.seconds * 1000:,.0f} ms · "
+                         f"{slow.rows:,} rows"):
+            st.code(slow.query, language="sql")
+            if slow.params:
+                st.caption(f"Parameters: {slow.params}")
+            if slow.plan:
+                st.dataframe(pd.DataFrame(slow.plan), use_container_width=True, hide_index=True)
+    if st.button("Reset timings and slow query log"):
+        profiler.reset()
+        st.rerun()
@@ -0,0 +1,204 @@
+"""Insights as parameterized specs instead of literal SQL strings.
+
+An ``InsightSpec`` names dimensions to group by, measures to compute, filters,
+an order and a limit; ``compile_spec`` turns it into SQL whose values are all
+passed as query parameters. Dimensions and measures come from fixed tables
+below, so user input never reaches the SQL text.
+
+Specs that group by the same dimensions under the same filters read the same
+rows, so ``answer_specs`` runs one query per such group with every measure
+the group needs and slices each spec's answer out of it.
+"""
+from collections import OrderedDict
+
+import pandas as pd
+
+from ledger_pagination import build_filters
+from ledger_schema import LEDGER_TABLE
+
+# Group-by expressions; the second entry is used once migration 0004 added the generated columns
+DIMENSIONS = {
+    "country_name": ("country_name", "country_name"),
+    "violation": ("violation", "violation"),
+    "driver_gender": ("driver_gender", "driver_gender"),
+    "driver_race": ("driver_race", "driver_race"),
+    "vehicle_number": ("vehicle_number", "vehicle_number"),
+    "stop_outcome": ("stop_outcome", "stop_outcome"),
+    "stop_duration": ("stop_duration", "stop_duration"),
+    "stop_year": ("year(stop_date)", "stop_year"),
+    "stop_month": ("month(stop_date)", "stop_month"),
+    "stop_hour": ("hour(stop_time)", "stop_hour"),
+    "stop_period": ("case when hour(stop_time)>=18 or hour(stop_time)<6 then 'NIGHT' else 'DAY' end",
+                    "case when stop_hour>=18 or stop_hour<6 then 'NIGHT' else 'DAY' end"),
+    "age_group": ("""case
+                         when driver_age between 16 and 25 then '16-25'
+                         when driver_age between 26 and 35 then '26-35'
+                         when driver_age between 36 and 50 then '36-50'
+                         when driver_age>50 then '51+'
+                         else 'Unknown'
+                     end""",) * 2,
+}
+
+_SEARCHES = "count(case when search_conducted=TRUE then 1 end)"
+_ARRESTS = "count(case when is_arrested=TRUE then 1 end)"
+_DRUG_STOPS = "count(case when drugs_related_stop=TRUE then 1 end)"
+
+MEASURES = {
+    "stops": "count(*)",
+    "searches": _SEARCHES,
+    "arrests": _ARRESTS,
+    "drug_stops": _DRUG_STOPS,
+    "male_drivers": "count(case when driver_gender='M' then 1 end)",
+    "female_drivers": "count(case when driver_gender='F' then 1 end)",
+    "search_rate": f"round({_SEARCHES}/count(*)*100.0,2)",
+    "arrest_rate": f"round({_ARRESTS}/count(*)*100.0,2)",
+    "drug_stop_rate": f"round({_DRUG_STOPS}/count(*)*100.0,2)",
+    "average_stop_minutes": """avg(case
+                                   when stop_duration='0-15 Min' then 7.5
+                                   when stop_duration='16-30 Min' then 23
+                                   when stop_duration='30+ Min' then 35
+                               end)""",
+}
+# Counts add up across groups (e.g. into an "Other" bar); rates and averages do not
+ADDITIVE_MEASURES = {"stops", "searches", "arrests", "drug_stops", "male_drivers", "female_drivers"}
+
+# Filters on top of ledger_pagination.build_filters (dates, country/violation/outcome lists, vehicle prefix)
+LIST_FILTERS = ["driver_gender", "driver_race", "stop_duration"]
+FLAG_FILTERS = ["search_conducted", "is_arrested", "drugs_related_stop"]
+
+
+class InsightSpec:
+    """One insight: ``measures`` per combination of ``dimensions`` over the filtered ledger."""
+
+    def __init__(self, dimensions, measures, filters=None, order_by=None, descending=True, limit=None):
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+        self.filters = dict(filters or {})
+        self.order_by = order_by
+        self.descending = descending
+        self.limit = limit
+        unknown = [d for d in self.dimensions if d not in DIMENSIONS]
+        unknown += [m for m in self.measures if m not in MEASURES]
+        if unknown:
+            raise ValueError(f"unknown dimension or measure: {', '.join(unknown)}")
+        if not self.measures:
+            raise ValueError("an insight needs at least one measure")
+        if order_by is not None and order_by not in self.dimensions + self.measures:
+            raise ValueError(f"cannot order by {order_by!r}: not one of the insight's columns")
+        if limit is not None and int(limit) < 1:
+            raise ValueError("limit must be a positive number of rows")
+
+    def scan_key(self):
+        """Specs with equal scan keys read the same groups of the same rows."""
+        return (tuple(self.dimensions), repr(sorted(self.filters.items())))
+
+
+def _where(filters, pruning=False):
+    clauses, params = build_filters(filters, pruning)
+    for column in LIST_FILTERS:
+        values = filters.get(column)
+        if values:
+            clauses.append(f"{column} in ({', '.join(['%s'] * len(values))})")
+            params.extend(values)
+    for column in FLAG_FILTERS:
+        if filters.get(column) is not None:
+            clauses.append(f"{column}=%s")
+            params.append(bool(filters[column]))
+    if filters.get("min_driver_age") is not None:
+        clauses.append("driver_age >= %s")
+        params.append(int(filters["min_driver_age"]))
+    if filters.get("max_driver_age") is not None:
+        clauses.append("driver_age <= %s")
+        params.append(int(filters["max_driver_age"]))
+    return (f"where {' and '.join(clauses)}" if clauses else ""), params
+
+
+def _compile(dimensions, measures, filters, order_by, descending, limit, generated_columns, pruning):
+    column = 1 if generated_columns else 0
+    select = [f"{DIMENSIONS[name][column]} as {name}" for name in dimensions]
+    select += [f"{MEASURES[name]} as {name}" for name in measures]
+    where, params = _where(filters, pruning)
+    query = f"select {', '.join(select)} from {LEDGER_TABLE} {where}"
+    if dimensions:
+        query += f" group by {', '.join(dimensions)}"
+    if order_by is not None:
+        query += f" order by {order_by} {'desc' if descending else 'asc'}"
+    if limit is not None:
+        query += " limit %s"
+        params.append(int(limit))
+    return query, params
+
+
+def compile_spec(spec, generated_columns=False, pruning=False):
+    """SQL and parameters answering ``spec`` on its own; ``pruning`` as in ``build_filters``."""
+    return _compile(spec.dimensions, spec.measures, spec.filters, spec.order_by,
+                    spec.descending, spec.limit, generated_columns, pruning)
+
+
+def plan_shared_scans(specs, generated_columns=False, pruning=False):
+    """Group ``specs`` (a name -> spec mapping) by scan; one query per group.
+
+    Returns a list of ``(query, params, names)``. Each query computes every
+    measure its specs need. Order and limit stay in SQL when every spec of
+    the group shares them (always so for a group of one); a merged group of
+    different orders or limits is read in full and sliced by ``slice_answer``.
+    """
+    groups = OrderedDict()
+    for name, spec in specs.items():
+        groups.setdefault(spec.scan_key(), []).append(name)
+    plans = []
+    for names in groups.values():
+        first = specs[names[0]]
+        measures = list(OrderedDict.fromkeys(m for name in names for m in specs[name].measures))
+        order, descending, limit = None, True, None
+        if len({(specs[name].order_by, specs[name].descending, specs[name].limit) for name in names}) == 1:
+            order, descending, limit = first.order_by, first.descending, first.limit
+        query, params = _compile(first.dimensions, measures, first.filters, order, descending, limit,
+                                 generated_columns, pruning)
+        plans.append((query, params, names))
+    return plans
+
+
+def slice_answer(spec, frame):
+    """``spec``'s answer out of a shared-scan result."""
+    answer = frame[spec.dimensions + spec.measures]
+    if spec.order_by is not None:
+        answer = answer.sort_values(spec.order_by, ascending=not spec.descending, kind="stable")
+    if spec.limit is not None:
+        answer = answer.head(int(spec.limit))
+    return answer.reset_index(drop=True)
+
+
+def answer_specs(run, specs, generated_columns=False, pruning=False):
+    """Answer every spec with as few scans as possible; ``run(query, params)`` returns a DataFrame."""
+    answers = {}
+    for query, params, names in plan_shared_scans(specs, generated_columns, pruning):
+        frame = run(query, params)
+        for name in names:
+            answers[name] = slice_answer(specs[name], frame) if not frame.empty else pd.DataFrame()
+    return answers
+
+
+# Catalog insights that fit the spec model, named as in INSIGHT_QUERIES
+INSIGHT_SPECS = {
+    "Top 10 vehicle number related to drug related stop":
+        InsightSpec(["vehicle_number"], ["stops"], {"drugs_related_stop": True}, order_by="stops", limit=10),
+    "Frequently searched vehicle":
+        InsightSpec(["vehicle_number"], ["stops"], {"search_conducted": True}, order_by="stops", limit=15),
+    "Gender distribution of driver stopped in each country":
+        InsightSpec(["country_name"], ["male_drivers", "female_drivers"]),
+    "Average stop duration for different violation":
+        InsightSpec(["violation"], ["average_stop_minutes"]),
+    "Are the stops during the night are more likely to lead to arrests":
+        InsightSpec(["stop_period"], ["stops", "arrests", "arrest_rate"]),
+    "Violation most common among young driver (i.e) less than 25":
+        InsightSpec(["violation"], ["stops"], {"max_driver_age": 24}, order_by="stops", limit=1),
+    "Country reporting the highest rate of drug related stops":
+        InsightSpec(["country_name"], ["stops", "drug_stop_rate"], order_by="drug_stop_rate", limit=1),
+    "Arrest rate by country and violation":
+        InsightSpec(["country_name", "violation"], ["stops", "arrest_rate"]),
+    "Country having most stop with search conducted":
+        InsightSpec(["country_name"], ["searches"], order_by="searches", limit=1),
+    "Top 5 violation with highest arrest rate":
+        InsightSpec(["violation"], ["stops", "arrest_rate"], order_by="arrest_rate", limit=5),
+}
@@ -0,0 +1,423 @@
+"""SQL behind the dashboard: the ADVANCED INSIGHTS catalog and the KEY METRICES summaries."""
+
+# The ADVANCED INSIGHTS catalog, in the order shown in the dashboard
+INSIGHT_QUERIES = {
+    "Top 10 vehicle number related to drug related stop": """
+        select vehicle_number,
+               count(*) as count 
+        from Traffic_Stops.digital_ledger 
+        where drugs_related_stop=TRUE 
+        group by vehicle_number 
+        order by count desc 
+        limit 10
+    """,
+
+    "Frequently searched vehicle": """
+        select vehicle_number,
+               count(*) as most_frequent_search_count 
+        from Traffic_Stops.digital_ledger 
+        where search_conducted=TRUE 
+        group by vehicle_number 
+        order by most_frequent_search_count desc 
+        limit 15
+    """,
+
+    "Driver age group having high arrest rate": """
+        select case
+                   when driver_age between 18 and 25 then '18-25'
+                   when driver_age between 26 and 35 then '26-35'
+                   when driver_age between 36 and 45 then '36-45'
+                   when driver_age between 46 and 60 then '46-60'
+                   else '60+'
+               end as age_group,
+               count(*) as total_stops,
+               count(case when is_arrested=TRUE then 1 end) as arrests,
+               round(count(case when is_arrested=TRUE then 1 end)/count(*)*100.0,2) as arrest_rate
+        from Traffic_Stops.digital_ledger 
+        group by age_group 
+        order by arrest_rate desc 
+        limit 1
+    """,
+
+    "Gender distribution of driver stopped in each country": """
+        select country_name,
+               count(case when driver_gender='M' then 1 end) as MALE,
+               count(case when driver_gender='F' then 1 end) as FEMALE 
+        from Traffic_Stops.digital_ledger 
+        group by country_name
+    """,
+
+    "Gender and race combination having highest arrest rate": """
+        select driver_race,
+               driver_gender,
+               round(count(case when search_conducted=TRUE then 1 end)/count(*)*100.0, 2) as search_rate
+        from Traffic_Stops.digital_ledger 
+        group by driver_race, driver_gender 
+        order by search_rate DESC 
+        limit 1
+    """,
+
+    "Time of the day having most traffic stop": """
+        select hour(str_to_date(stop_time,'%H:%i')) as hour_of_the_day,
+               count(*) as stop_count 
+        from Traffic_Stops.digital_ledger 
+        group by hour_of_the_day 
+        order by stop_count DESC 
+        limit 1
+    """,
+
+    "Average stop duration for different violation": """
+        select violation,
+               avg(case
+                       when stop_duration='0-15 Min' then 7.5
+                       when stop_duration='16-30 Min' then 23
+                       when stop_duration='30+ Min' then 35
+                   end) as average_stop_duration
+        from Traffic_Stops.digital_ledger 
+        group by violation
+    """,
+
+    "Are the stops during the night are more likely to lead to arrests": """
+        select case
+                   when hour(str_to_date(stop_time,'%H:%i'))>=18 or hour(str_to_date(stop_time,'%H:%i'))<6 
+                   then 'NIGHT' 
+                   else 'DAY' 
+               end as stop_period,
+               count(*) as total_stops,
+               count(case when is_arrested=TRUE then 1 end) as arrests,
+               round(count(case when is_arrested=TRUE then 1 end)/count(*)*100.0,2) as arrest_rate_percent
+        from Traffic_Stops.digital_ledger 
+        group by stop_period
+    """,
+
+    "Violation most associated with search or arrest": """
+        select violation,
+               count(case when search_conducted=TRUE then 1 end) as count_of_the_search,
+               count(case when is_arrested=TRUE then 1 end) as count_of_the_arrest,
+               round(count(case when search_conducted=TRUE then 1 end)/count(*)*100.0,2) as search_rate,
+               round(count(case when is_arrested=TRUE then 1 end)/count(*)*100.0,2) as arrest_rate,
+               greatest(
+                   round(count(case when search_conducted=TRUE then 1 end)/count(*)*100.0,2),
+                   round(count(case when is_arrested=TRUE then 1 end)/count(*)*100.0,2)
+               ) as maximum_arrest_or_search_rate
+        from Traffic_Stops.digital_ledger 
+        group by violation 
+        order by maximum_arrest_or_search_rate desc 
+        limit 1
+    """,
+
+    "Violation most common among young driver (i.e) less than 25": """
+        select violation,
+               count(*) as counts_of_driver 
+        from Traffic_Stops.digital_ledger 
+        where driver_age<25 
+        group by violation 
+        order by counts_of_driver desc 
+        limit 1
+    """,
+
+    "Violation that rarely result in search or arrest": """
+        select violation,
+               count(case when search_conducted=TRUE then 1 end) as count_of_the_search,
+               count(case when is_arrested=TRUE then 1 end) as count_of_the_arrest,
+               round(count(case when search_conducted=TRUE then 1 end)/count(*)*100.0,2) as search_rate,
+               round(count(case when is_arrested=TRUE then 1 end)/count(*)*100.0,2) as arrest_rate,
+               least(
+                   round(count(case when search_conducted=TRUE then 1 end)/count(*)*100.0,2),
+                   round(count(case when is_arrested=TRUE then 1 end)/count(*)*100.0,2)
+               ) as rarely_arrest_or_search_rate
+        from Traffic_Stops.digital_ledger 
+        group by violation 
+        order by rarely_arrest_or_search_rate asc 
+        limit 1
+    """,
+
+    "Country reporting the highest rate of drug related stops": """
+        select country_name,
+               count(*) as tot_counts,
+               round(count(case when drugs_related_stop=TRUE then 1 end)/count(*)*100.0,2) as drugs_related_stop_rates
+        from Traffic_Stops.digital_ledger 
+        group by country_name 
+        order by drugs_related_stop_rates desc 
+        limit 1
+    """,
+
+    "Arrest rate by country and violation": """
+        select country_name,
+               violation,
+               count(*) as tot_count,
+               round(count(case when is_arrested=TRUE then 1 end)/count(*)*100.0,2) as arrest_rate
+        from Traffic_Stops.digital_ledger 
+        group by country_name, violation
+    """,
+
+    "Country having most stop with search conducted": """
+        select country_name,
+               count(case when search_conducted=TRUE then 1 end) as no_of_counts 
+        from Traffic_Stops.digital_ledger 
+        group by country_name 
+        order by no_of_counts desc 
+        limit 1
+    """,
+
+    "Top 5 violation with highest arrest rate": """
+        select violation,
+               count(*) as total,
+               round(count(case when is_arrested=TRUE then 1 end)/count(*)*100,2) as arrest_rate
+        from Traffic_Stops.digital_ledger 
+        group by violation 
+        order by arrest_rate desc 
+        limit 5
+    """,
+
+    "Driver demographic[Age,Gender,Race] by country": """
+        select country_name,
+               count(*) as tot_driver,
+               count(case when driver_gender='M' then 1 end) as Male_driver,
+               count(case when driver_gender='F' then 1 end) as Female_driver,
+               count(case when driver_race='Asian' then 1 end) as Asian_driver,
+               count(case when driver_race='Black' then 1 end) as Black_driver,
+               count(case when driver_race='Hispanic' then 1 end) as Hispanic_driver,
+               count(case when driver_race='Other' then 1 end) as Other_people,
+               count(case when driver_race='White' then 1 end) as White_driver,
+               count(case when driver_age<30 then 1 end) as less_than_thirty,
+               count(case when driver_age between 30 and 50 then 1 end) as between_thirty_and_fifty,
+               count(case when driver_age>50 then 1 end) as greater_than_fifty
+        from Traffic_Stops.digital_ledger 
+        group by country_name
+    """,
+
+    "Violation with high search and arrest rate": """
+        select * 
+        from (
+            select distinct violation,
+                   count(*) over(partition by violation) as total_stops,
+                   sum(case when search_conducted=TRUE then 1 else 0 end) over(partition by violation) as total_searches,
+                   sum(case when is_arrested=TRUE then 1 else 0 end) over(partition by violation) as total_arrests,
+                   round(avg(case when search_conducted=TRUE then 1 else 0 end) over(partition by violation)*100,2) as search_rate_percent,
+                   round(avg(case when is_arrested=TRUE then 1 else 0 end) over(partition by violation)*100,2) as arrest_rate_percent
+            from Traffic_Stops.digital_ledger
+        ) as sub 
+        where search_rate_percent>20 or arrest_rate_percent>20 
+        order by search_rate_percent desc, arrest_rate_percent desc
+    """,
+
+    "Number of stops by year,month,hour of the day": """
+        select year(str_to_date(stop_date,'%Y-%m-%d')) as STOP_YEAR,
+               month(str_to_date(stop_date,'%Y-%m-%d')) as STOP_MONTH,
+               hour(str_to_date(stop_time,'%H:%i')) as STOP_HOUR,
+               count(*) as total_stops 
+        from Traffic_Stops.digital_ledger 
+        group by STOP_YEAR, STOP_MONTH, STOP_HOUR 
+        order by STOP_YEAR, STOP_MONTH, STOP_HOUR
+    """,
+
+    "Driver violation trend based on race & age": """
+        select age_info.age_group,
+               r.driver_race,
+               count(*) as total_violations 
+        from Traffic_Stops.digital_ledger r 
+        join (
+            select distinct driver_age,
+                   case
+                       when driver_age between 16 and 25 then '16-25'
+                       when driver_age between 26 and 35 then '26-35'
+                       when driver_age between 36 and 50 then '36-50'
+                       when driver_age>50 then '51+'
+                       else 'Unknown'
+                   end as age_group
+            from Traffic_Stops.digital_ledger
+        ) as age_info 
+        on r.driver_age=age_info.driver_age 
+        group by age_info.age_group, r.driver_race 
+        order by age_info.age_group, r.driver_race
+    """,
+
+    "Yearly breakdown of stops and arrests by country": """
+        select stats.stop_year,
+               stats.country_name,
+               stats.total_stops,
+               stats.total_arrests,
+               round(total_arrests/NULLIF(total_stops,0)*100.0, 2) as arrest_rate_percent,
+               sum(total_arrests) over(partition by country_name order by stop_year) as cumulative_arrests
+        from (
+            select year(str_to_date(stop_date,'%Y-%m-%d')) as stop_year,
+                   country_name,
+                   count(*) as total_stops,
+                   count(if(is_arrested,1,NULL)) as total_arrests
+            from Traffic_Stops.digital_ledger 
+            group by stop_year, country_name
+        ) as stats 
+        order by stats.country_name, stats.stop_year
+    """
+}
+
+
+# KEY METRICES page: every figure is aggregated by MySQL, only small summaries reach pandas
+KEY_METRIC_QUERIES = {
+    "KEY METRICES: totals": """
+        select count(*) as total_stops,
+               count(case when stop_outcome like '%arrest%' then 1 end) as arrests,
+               count(case when stop_outcome like '%warning%' then 1 end) as warnings,
+               count(case when drugs_related_stop=1 then 1 end) as drug_related
+        from Traffic_Stops.digital_ledger
+    """,
+    "KEY METRICES: outcomes": """
+        select stop_outcome,
+               count(*) as count
+        from Traffic_Stops.digital_ledger
+        where stop_outcome is not null
+        group by stop_outcome
+    """,
+    "KEY METRICES: genders": """
+        select driver_gender as Gender,
+               count(*) as Count
+        from Traffic_Stops.digital_ledger
+        where driver_gender is not null
+        group by driver_gender
+        order by Count desc
+    """,
+    "KEY METRICES: stops per month": """
+        select date_format(stop_date,'%Y-%m') as stop_date,
+               count(*) as Counts
+        from Traffic_Stops.digital_ledger
+        where stop_date is not null
+        group by date_format(stop_date,'%Y-%m')
+        order by stop_date
+    """,
+    "KEY METRICES: day and hour": """
+        select dayname(stop_date) as stop_day,
+               hour(stop_time) as stop_hour,
+               count(vehicle_number) as stops
+        from Traffic_Stops.digital_ledger
+        where stop_date is not null and stop_time is not null
+        group by stop_day, stop_hour
+    """,
+}
+
+
+# Rewrites that read the stored generated columns added by migration 0004
+# (stop_year, stop_month, stop_hour, age_from) instead of recomputing
+# str_to_date()/hour()/year() for every row, so the composite indexes apply.
+# age_from is the lower bound of a driver's age band, see ledger_rollups.AGE_FROM_SQL.
+GENERATED_COLUMN_QUERIES = {
+    "Driver age group having high arrest rate": """
+        select case
+                   when age_from between 18 and 25 then '18-25'
+                   when age_from between 26 and 35 then '26-35'
+                   when age_from between 36 and 45 then '36-45'
+                   when age_from between 46 and 60 then '46-60'
+                   else '60+'
+               end as age_group,
+               count(*) as total_stops,
+               count(case when is_arrested=TRUE then 1 end) as arrests,
+               round(count(case when is_arrested=TRUE then 1 end)/count(*)*100.0,2) as arrest_rate
+        from Traffic_Stops.digital_ledger
+        group by age_group
+        order by arrest_rate desc
+        limit 1
+    """,
+
+    "Time of the day having most traffic stop": """
+        select stop_hour as hour_of_the_day,
+               count(*) as stop_count
+        from Traffic_Stops.digital_ledger
+        group by stop_hour
+        order by stop_count DESC
+        limit 1
+    """,
+
+    "Are the stops during the night are more likely to lead to arrests": """
+        select case
+                   when stop_hour>=18 or stop_hour<6
+                   then 'NIGHT'
+                   else 'DAY'
+               end as stop_period,
+               count(*) as total_stops,
+               count(case when is_arrested=TRUE then 1 end) as arrests,
+               round(count(case when is_arrested=TRUE then 1 end)/count(*)*100.0,2) as arrest_rate_percent
+        from Traffic_Stops.digital_ledger
+        group by stop_period
+    """,
+
+    "Number of stops by year,month,hour of the day": """
+        select stop_year as STOP_YEAR,
+               stop_month as STOP_MONTH,
+               stop_hour as STOP_HOUR,
+               count(*) as total_stops
+        from Traffic_Stops.digital_ledger
+        group by stop_year, stop_month, stop_hour
+        order by stop_year, stop_month, stop_hour
+    """,
+
+    # The self-join on driver_age only dropped NULL ages, which the where clause now does
+    "Driver violation trend based on race & age": """
+        select case
+                   when age_from between 16 and 25 then '16-25'
+                   when age_from between 26 and 35 then '26-35'
+                   when age_from between 36 and 50 then '36-50'
+                   when age_from > 50 then '51+'
+                   else 'Unknown'
+               end as age_group,
+               driver_race,
+               count(*) as total_violations
+        from Traffic_Stops.digital_ledger
+        where driver_age is not null
+        group by age_group, driver_race
+        order by age_group, driver_race
+    """,
+
+    "Yearly breakdown of stops and arrests by country": """
+        select stats.stop_year,
+               stats.country_name,
+               stats.total_stops,
+               stats.total_arrests,
+               round(total_arrests/NULLIF(total_stops,0)*100.0, 2) as arrest_rate_percent,
+               sum(total_arrests) over(partition by country_name order by stop_year) as cumulative_arrests
+        from (
+            select stop_year,
+                   country_name,
+                   count(*) as total_stops,
+                   count(if(is_arrested,1,NULL)) as total_arrests
+            from Traffic_Stops.digital_ledger
+            group by stop_year, country_name
+        ) as stats
+        order by stats.country_name, stats.stop_year
+    """,
+
+    "KEY METRICES: stops per month": """
+        select concat(stop_year,'-',lpad(stop_month,2,'0')) as stop_date,
+               count(*) as Counts
+        from Traffic_Stops.digital_ledger
+        where stop_year is not null
+        group by stop_year, stop_month
+        order by stop_year, stop_month
+    """,
+
+    "KEY METRICES: day and hour": """
+        select dayname(stop_date) as stop_day,
+               stop_hour,
+               count(vehicle_number) as stops
+        from Traffic_Stops.digital_ledger
+        where stop_date is not null and stop_hour is not null
+        group by stop_day, stop_hour
+    """,
+}
+
+# Catalog result columns that count stops, so add up across rows (rates, averages and running totals do not)
+COUNT_COLUMNS = {
+    "count", "Count", "Counts", "most_frequent_search_count", "total_stops", "arrests", "warnings",
+    "drug_related", "MALE", "FEMALE", "stop_count", "count_of_the_search", "count_of_the_arrest",
+    "counts_of_driver", "tot_counts", "tot_count", "no_of_counts", "total", "tot_driver", "Male_driver",
+    "Female_driver", "Asian_driver", "Black_driver", "Hispanic_driver", "Other_people", "White_driver",
+    "less_than_thirty", "between_thirty_and_fifty", "greater_than_fifty", "total_searches",
+    "total_arrests", "total_violations", "stops",
+}
+
+
+def insight_catalog(generated_columns=False):
+    """Every dashboard query by name, using the generated-column rewrites if asked."""
+    catalog = {**INSIGHT_QUERIES, **KEY_METRIC_QUERIES}
+    if generated_columns:
+        catalog.update(GENERATED_COLUMN_QUERIES)
+    return catalog
@@ -0,0 +1,221 @@
+"""Run many insights at once: the daily briefing report.
+
+``InsightRun`` executes a catalog of queries concurrently on pooled
+connections and hands back each result as soon as it completes. Every query
+runs under MySQL's ``max_execution_time``, so a slow insight times out on the
+server instead of holding its connection; ``cancel`` drops the queries that
+have not started and ``KILL QUERY``s the ones that have. Results are fetched
+under the same memory ceiling as the dashboard's queries.
+
+    python insight_report.py --output briefing.html
+"""
+import argparse
+import datetime
+import html
+import threading
+import time
+from collections import namedtuple
+from contextlib import nullcontext
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
+
+import pymysql
+
+from insight_queries import insight_catalog
+from ledger_db import get_pool
+from ledger_fetch import FETCH_MEMORY_CEILING, MemoryCeilingExceeded, fetch_frame
+from ledger_schema import GENERATED_COLUMNS_MIGRATION, migration_applied
+
+REPORT_WORKERS = 4              # concurrent insights; keep below the pool size
+QUERY_TIMEOUT_SECONDS = 60      # per insight, enforced by the server
+
+_TIMED_OUT = 3024               # ER_QUERY_TIMEOUT: max_execution_time exceeded
+_INTERRUPTED = 1317             # ER_QUERY_INTERRUPTED: KILL QUERY
+
+InsightResult = namedtuple("InsightResult", "name frame seconds error")
+
+
+class InsightCancelled(Exception):
+    """The report was cancelled before this insight finished."""
+
+
+class InsightRun:
+    """One concurrent execution of ``queries`` (a name -> SQL mapping).
+
+    ``cache`` is an optional ``query_cache.ResultCache``; cached insights are
+    answered without a query and fresh ones are stored for the next run.
+    ``profiler`` is an optional ``ledger_profiling.Profiler`` that records the
+    fetch and result of every insight, as the dashboard does for its own.
+    """
+
+    def __init__(self, queries, pool=None, workers=REPORT_WORKERS,
+                 timeout=QUERY_TIMEOUT_SECONDS, cache=None, profiler=None, max_bytes=FETCH_MEMORY_CEILING):
+        self.queries = dict(queries)
+        self.pool = pool or get_pool()
+        self.workers = max(1, min(workers, len(self.queries) or 1))
+        self.timeout = timeout
+        self.cache = cache
+        self.profiler = profiler
+        self.max_bytes = max_bytes
+        self.started = None
+        self.finished = None
+        self._cancelled = threading.Event()
+        self._running = {}              # insight name -> MySQL connection id
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def _execute(self, name, query):
+        with self.pool.connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("set session max_execution_time = %s", (int(self.timeout * 1000),))
+            with self._lock:
+                self._running[name] = connection.thread_id()
+            try:
+                timer = self.profiler.timer("fetch", name) if self.profiler is not None else nullcontext({})
+                with timer as counts:
+                    frame = fetch_frame(connection, query, max_bytes=self.max_bytes,
+                                        interrupt=self.pool.kill_query)
+                    counts["rows"] = len(frame)
+                return frame
+            finally:
+                with self._lock:
+                    self._running.pop(name, None)
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute("set session max_execution_time = 0")
+                except pymysql.MySQLError:
+                    pass   # a dropped connection is discarded by the pool anyway
+
+    def _run_one(self, name, query):
+        if self._cancelled.is_set():
+            raise InsightCancelled(name)
+        started = time.perf_counter()
+        if self.cache is not None:
+            frame = self.cache.get_or_compute(name, None, lambda: self._execute(name, query))
+        else:
+            frame = self._execute(name, query)
+        seconds = time.perf_counter() - started
+        if self.profiler is not None:
+            self.profiler.record("result", name, seconds, len(frame), int(frame.memory_usage(deep=True).sum()))
+        return frame, seconds
+
+    def results(self):
+        """Yield an ``InsightResult`` per insight, in completion order."""
+        self.started = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="insight")
+        try:
+            self._futures = {executor.submit(self._run_one, name, query): name
+                             for name, query in self.queries.items()}
+            for future in as_completed(self._futures):
+                name = self._futures[future]
+                try:
+                    frame, seconds = future.result()
+                except (CancelledError, InsightCancelled):
+                    yield InsightResult(name, None, 0.0, "cancelled")
+                except MemoryCeilingExceeded as e:
+                    yield InsightResult(name, None, 0.0, f"result too large: {e}")
+                except pymysql.MySQLError as e:
+                    code = e.args[0] if e.args else None
+                    if code == _TIMED_OUT:
+                        error = f"timed out after {self.timeout}s"
+                    elif code == _INTERRUPTED and self._cancelled.is_set():
+                        error = "cancelled"
+                    else:
+                        error = str(e)
+                    yield InsightResult(name, None, 0.0, error)
+                except Exception as e:
+                    yield InsightResult(name, None, 0.0, str(e))
+                else:
+                    yield InsightResult(name, frame, seconds, None)
+        finally:
+            # Also reached when the consumer stops iterating early
+            if not all(future.done() for future in self._futures):
+                self.cancel()
+            executor.shutdown(wait=False)
+            self.finished = time.perf_counter()
+
+    def cancel(self):
+        """Skip every insight not started yet and interrupt the running ones."""
+        self._cancelled.set()
+        for future in self._futures:
+            future.cancel()
+        with self._lock:
+            thread_ids = list(self._running.values())
+        if not thread_ids:
+            return
+        # KILL QUERY has to come from another connection
+        with self.pool.connection() as connection:
+            with connection.cursor() as cursor:
+                for thread_id in thread_ids:
+                    try:
+                        cursor.execute("kill query %s", (thread_id,))
+                    except pymysql.MySQLError:
+                        pass   # the query finished in the meantime
+
+    @property
+    def wall_seconds(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+
+def summarize_run(run, results):
+    """Wall time of the concurrent run against the serial sum of the query times."""
+    serial = sum(result.seconds for result in results)
+    wall = run.wall_seconds
+    return {
+        "insights": len(results),
+        "failed": sum(result.error is not None for result in results),
+        "wall_seconds": round(wall, 3),
+        "serial_seconds": round(serial, 3),
+        "speedup": round(serial / wall, 2) if wall else None,
+    }
+
+
+def format_report(results, summary, title="Daily briefing"):
+    """A self-contained HTML report with one table per insight, in catalog order."""
+    generated = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+    parts = [
+        f"<html><head><meta charset='utf-8'><title>{html.escape(title)}</title></head><body>",
+        f"<h1>{html.escape(title)}</h1>",
+        f"<p>Generated {generated}: {summary['insights']} insights in {summary['wall_seconds']}s "
+        f"(serially {summary['serial_seconds']}s), {summary['failed']} failed.</p>",
+    ]
+    for result in results:
+        parts.append(f"<h2>{html.escape(result.name)}</h2>")
+        if result.error is not None:
+            parts.append(f"<p><em>{html.escape(result.error)}</em></p>")
+        else:
+            parts.append(f"<p>{len(result.frame):,} rows in {result.seconds:.2f}s</p>")
+            parts.append(result.frame.to_html(index=False, na_rep=""))
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run every dashboard insight concurrently and export a report.")
+    parser.add_argument("--output", default="insight_report.html", help="HTML file to write")
+    parser.add_argument("--workers", type=int, default=REPORT_WORKERS)
+    parser.add_argument("--timeout", type=float, default=QUERY_TIMEOUT_SECONDS,
+                        help="seconds each insight may run")
+    args = parser.parse_args(argv)
+
+    with get_pool().connection() as connection:
+        generated_columns = migration_applied(connection, GENERATED_COLUMNS_MIGRATION)
+    queries = {name: query for name, query in insight_catalog(generated_columns).items()
+               if not name.startswith("KEY METRICES")}
+    run = InsightRun(queries, workers=args.workers, timeout=args.timeout)
+    results = []
+    for result in run.results():
+        status = result.error or f"{len(result.frame):,} rows in {result.seconds:.2f}s"
+        print(f"{result.name}: {status}")
+        results.append(result)
+    results.sort(key=lambda result: list(queries).index(result.name))
+    summary = summarize_run(run, results)
+    with open(args.output, "w", encoding="utf-8") as handle:
+        handle.write(format_report(results, summary))
+    print(f"{summary['insights']} insights in {summary['wall_seconds']}s "
+          f"(serial {summary['serial_seconds']}s, {summary['speedup']}x); report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""Optional columnar analytics engine: a Parquet snapshot of the ledger queried with DuckDB.
+
+``refresh_snapshot`` copies new ledger rows (above the last snapshotted ``id``)
+into zstd-compressed Parquet files partitioned by stop month, so each refresh
+appends only the new stops. ``DuckDBEngine`` exposes the snapshot as
+``Traffic_Stops.digital_ledger`` (with the same generated columns as migration
+0004) and runs the dashboard catalog on DuckDB's vectorized engine.
+
+Needs the optional ``duckdb`` and ``pyarrow`` packages::
+
+    python ledger_analytics.py snapshot
+    python ledger_analytics.py compare
+"""
+import argparse
+import json
+import os
+import time
+
+import pandas as pd
+
+from insight_queries import insight_catalog
+from ledger_db import get_pool
+from ledger_rollups import AGE_FROM_SQL
+from ledger_schema import GENERATED_COLUMNS_MIGRATION, LEDGER_COLUMNS, LEDGER_TABLE, migration_applied
+
+try:
+    import duckdb
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:   # the dashboard runs without the analytics engine
+    duckdb = pa = pq = None
+
+# What a failed snapshot or DuckDB query raises, for callers that want to report it
+ANALYTICS_ERRORS = (RuntimeError, OSError) + ((duckdb.Error,) if duckdb is not None else ())
+
+SNAPSHOT_DIR = "ledger_snapshot"
+SNAPSHOT_STATE_FILE = "_snapshot_state.json"
+SNAPSHOT_CHUNK_ROWS = 100_000
+SNAPSHOT_TRAILING_IDS = 100_000   # ids below the watermark re-checked for stops that committed late
+PARTITION_COLUMN = "partition_month"
+
+# DuckDB spellings of the catalog queries whose MySQL SQL does not carry over
+# (MySQL's default collation makes LIKE case-insensitive; DuckDB's lpad wants text)
+DUCKDB_OVERRIDES = {
+    "KEY METRICES: totals": """
+        select count(*) as total_stops,
+               count(case when stop_outcome ilike '%arrest%' then 1 end) as arrests,
+               count(case when stop_outcome ilike '%warning%' then 1 end) as warnings,
+               count(case when drugs_related_stop then 1 end) as drug_related
+        from Traffic_Stops.digital_ledger
+    """,
+    "KEY METRICES: stops per month": """
+        select strftime(stop_date, '%Y-%m') as stop_date,
+               count(*) as Counts
+        from Traffic_Stops.digital_ledger
+        where stop_date is not null
+        group by 1
+        order by 1
+    """,
+}
+
+
+def analytics_available():
+    return duckdb is not None
+
+
+def _require_analytics():
+    if not analytics_available():
+        raise RuntimeError("the analytics engine needs the optional duckdb and pyarrow packages")
+
+
+def duckdb_catalog():
+    """The dashboard catalog in DuckDB-compatible SQL."""
+    catalog = insight_catalog(generated_columns=True)
+    catalog.update(DUCKDB_OVERRIDES)
+    return catalog
+
+
+# -------------------------------
+# Parquet snapshot
+# -------------------------------
+def _read_state(snapshot_dir):
+    path = os.path.join(snapshot_dir, SNAPSHOT_STATE_FILE)
+    if not os.path.exists(path):
+        return {"last_id": 0, "rows": 0}
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def _write_state(snapshot_dir, state):
+    path = os.path.join(snapshot_dir, SNAPSHOT_STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as handle:
+        json.dump(state, handle)
+    os.replace(path + ".tmp", path)
+
+
+def snapshot_schema():
+    # Fixed types, so a chunk whose column happens to be all NULL still matches the others
+    integer_columns = {"driver_age_raw", "driver_age"}
+    flag_columns = {"search_conducted", "is_arrested", "drugs_related_stop"}
+    fields = [pa.field("id", pa.int64())]
+    for column in LEDGER_COLUMNS:
+        if column == "stop_date":
+            fields.append(pa.field(column, pa.date32()))
+        elif column in integer_columns:
+            fields.append(pa.field(column, pa.int16()))
+        elif column in flag_columns:
+            fields.append(pa.field(column, pa.bool_()))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    fields.append(pa.field(PARTITION_COLUMN, pa.string()))
+    return pa.schema(fields)
+
+
+def _chunk_table(rows):
+    frame = pd.DataFrame(rows, columns=["id"] + LEDGER_COLUMNS)
+    # pymysql returns TIME as timedelta; store HH:MM:SS text and cast back in DuckDB
+    seconds = pd.to_timedelta(frame["stop_time"]).dt.total_seconds()
+    frame["stop_time"] = pd.to_datetime(seconds, unit="s").dt.strftime("%H:%M:%S")
+    for column in ("search_conducted", "is_arrested", "drugs_related_stop"):
+        frame[column] = frame[column].astype("boolean")
+    frame[PARTITION_COLUMN] = pd.to_datetime(frame["stop_date"]).dt.strftime("%Y-%m").fillna("unknown")
+    return pa.Table.from_pandas(frame, schema=snapshot_schema(), preserve_index=False)
+
+
+def _snapshot_ids(snapshot_dir, above):
+    if not snapshot_info(snapshot_dir)["bytes_on_disk"]:
+        return set()
+    table = pq.read_table(snapshot_dir, columns=["id"], filters=[("id", ">", above)])
+    return set(table.column("id").to_pylist())
+
+
+def _append_late_rows(connection, snapshot_dir, state, chunk_rows, trailing_ids, log):
+    """Append stops that committed after higher ids were already snapshotted.
+
+    InnoDB assigns auto-increment ids at insert time, so a transaction still
+    open during one refresh commits below its watermark. The ids in the
+    trailing window are compared with the snapshot and the missing rows added.
+    """
+    start = max(state["last_id"] - trailing_ids, 0)
+    with connection.cursor() as cursor:
+        cursor.execute(f"select id from {LEDGER_TABLE} where id > %s and id <= %s", (start, state["last_id"]))
+        committed = {row[0] for row in cursor.fetchall()}
+    connection.commit()
+    missing = sorted(committed - _snapshot_ids(snapshot_dir, start))
+    appended = 0
+    for offset in range(0, len(missing), chunk_rows):
+        ids = missing[offset:offset + chunk_rows]
+        with connection.cursor() as cursor:
+            cursor.execute(f"select id, {', '.join(LEDGER_COLUMNS)} from {LEDGER_TABLE} "
+                           f"where id in ({', '.join(['%s'] * len(ids))}) order by id", ids)
+            rows = cursor.fetchall()
+        connection.commit()
+        if not rows:
+            continue
+        pq.write_to_dataset(_chunk_table(rows), snapshot_dir, partition_cols=[PARTITION_COLUMN],
+                            basename_template=f"late-{rows[0][0]}-{{i}}.parquet",
+                            existing_data_behavior="overwrite_or_ignore", compression="zstd")
+        state["rows"] += len(rows)
+        _write_state(snapshot_dir, state)
+        appended += len(rows)
+        log(f"snapshot: appended {len(rows):,} late rows below id {state['last_id']}")
+    return appended
+
+
+def refresh_snapshot(connection, snapshot_dir=SNAPSHOT_DIR, chunk_rows=SNAPSHOT_CHUNK_ROWS,
+                     trailing_ids=SNAPSHOT_TRAILING_IDS, log=print):
+    """Append ledger rows above the snapshot watermark, plus late commits below it; returns the number appended."""
+    _require_analytics()
+    os.makedirs(snapshot_dir, exist_ok=True)
+    state = _read_state(snapshot_dir)
+    appended = _append_late_rows(connection, snapshot_dir, state, chunk_rows, trailing_ids, log)
+    query = (f"select id, {', '.join(LEDGER_COLUMNS)} from {LEDGER_TABLE} "
+             f"where id > %s order by id limit %s")
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(query, (state["last_id"], chunk_rows))
+            rows = cursor.fetchall()
+        connection.commit()
+        if not rows:
+            break
+        # Named after the chunk's first id: re-running an interrupted chunk overwrites, never duplicates
+        pq.write_to_dataset(_chunk_table(rows), snapshot_dir, partition_cols=[PARTITION_COLUMN],
+                            basename_template=f"part-{rows[0][0]}-{{i}}.parquet",
+                            existing_data_behavior="overwrite_or_ignore", compression="zstd")
+        state = {"last_id": rows[-1][0], "rows": state["rows"] + len(rows)}
+        _write_state(snapshot_dir, state)
+        appended += len(rows)
+        log(f"snapshot: appended {appended:,} rows (last id {state['last_id']})")
+    return appended
+
+
+def snapshot_info(snapshot_dir=SNAPSHOT_DIR):
+    state = _read_state(snapshot_dir)
+    size = 0
+    for root, _, files in os.walk(snapshot_dir):
+        size += sum(os.path.getsize(os.path.join(root, name)) for name in files if name.endswith(".parquet"))
+    state["bytes_on_disk"] = size
+    return state
+
+
+# -------------------------------
+# DuckDB engine
+# -------------------------------
+def ledger_view_sql(source, drop_columns=()):
+    """DuckDB view named like the MySQL ledger over ``source``, with migration 0004's generated columns."""
+    return f"""
+        create or replace view {LEDGER_TABLE} as
+        select * exclude ({', '.join([*drop_columns, 'stop_time'])}),
+               cast(stop_time as time) as stop_time,
+               year(stop_date) as stop_year,
+               month(stop_date) as stop_month,
+               hour(cast(stop_time as time)) as stop_hour,
+               {AGE_FROM_SQL} as age_from
+        from {source}"""
+
+
+class DuckDBEngine:
+    """Runs the insight catalog over the Parquet snapshot with DuckDB."""
+
+    def __init__(self, snapshot_dir=SNAPSHOT_DIR):
+        _require_analytics()
+        self.snapshot_dir = snapshot_dir
+        self._connection = duckdb.connect()
+        self._connection.execute("create schema if not exists Traffic_Stops")
+        self.reload()
+
+    def reload(self):
+        """Re-point the view at the snapshot (picks up newly appended files)."""
+        if not snapshot_info(self.snapshot_dir)["bytes_on_disk"]:
+            raise RuntimeError(f"the snapshot in {self.snapshot_dir} is empty; "
+                               f"run 'python ledger_analytics.py snapshot' first")
+        files = os.path.join(self.snapshot_dir, "**", "*.parquet").replace("\\", "/")
+        self._connection.execute(ledger_view_sql(f"read_parquet('{files}', hive_partitioning = true)",
+                                                 drop_columns=[PARTITION_COLUMN]))
+
+    def run(self, query):
+        # DuckDB connections are not safe to share between threads; cursors are
+        cursor = self._connection.cursor()
+        try:
+            return cursor.execute(query).df()
+        finally:
+            cursor.close()
+
+
+def compare_backends(mysql_run, engine, queries):
+    """Time every query on MySQL (``mysql_run(sql)``) and on DuckDB; one row per query."""
+    timings = []
+    duckdb_queries = duckdb_catalog()
+    for name, query in queries.items():
+        started = time.perf_counter()
+        mysql_rows = len(mysql_run(query))
+        mysql_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        duckdb_rows = len(engine.run(duckdb_queries[name]))
+        duckdb_seconds = time.perf_counter() - started
+        timings.append({
+            "query": name,
+            "mysql_ms": round(mysql_seconds * 1000, 1),
+            "duckdb_ms": round(duckdb_seconds * 1000, 1),
+            "speedup": round(mysql_seconds / duckdb_seconds, 1) if duckdb_seconds else None,
+            "mysql_rows": mysql_rows,
+            "duckdb_rows": duckdb_rows,
+        })
+    return pd.DataFrame(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar Parquet/DuckDB analytics for digital_ledger.")
+    parser.add_argument("command", choices=["snapshot", "compare"],
+                        help="append new stops to the snapshot, or time the catalog on both backends")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    args = parser.parse_args(argv)
+    _require_analytics()
+    with get_pool().connection() as connection:
+        refresh_snapshot(connection, args.snapshot_dir)
+        if args.command == "compare":
+            def mysql_run(query):
+                with connection.cursor() as cursor:
+                    cursor.execute(query)
+                    return cursor.fetchall()
+
+            queries = insight_catalog(generated_columns=migration_applied(connection, GENERATED_COLUMNS_MIGRATION))
+            print(compare_backends(mysql_run, DuckDBEngine(args.snapshot_dir), queries).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""Benchmark the dashboard's queries against a synthetic ledger of any size.
+
+``generate_stops`` produces stop records shaped like Traffic_Stops.csv (same
+columns and value sets, with skewed rather than uniform frequencies and
+vehicle numbers that recur). ``run_benchmark`` loads them into a throwaway
+MySQL server, or into DuckDB as a stand-in, and times:
+
+* the initial bulk load (through ``ledger_ingest``) and its rows/sec;
+* every ADVANCED INSIGHTS and KEY METRICES query (and, on MySQL, the
+  rollup rebuild and the rollup versions of the queries);
+* live ingestion through ``StopLogger`` group commits (MySQL only).
+
+Results are written as JSON, one file per run, for regression tracking::
+
+    python ledger_benchmark.py --rows 1M --target duckdb
+    python ledger_benchmark.py --rows 100k --target mysql --host bench-db --truncate
+
+The MySQL target empties the ledger before loading, so it needs an explicit
+``--host`` and refuses to run when that server is the production one from
+``ledger_db.DB_CONFIG`` (same ``@@server_uuid``, whatever name or address
+reaches it) unless ``--allow-production-host`` is passed.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pymysql
+
+from insight_queries import insight_catalog
+from ledger_analytics import duckdb, duckdb_catalog, ledger_view_sql
+from ledger_db import DB_CONFIG, ConnectionPool, PoolTimeout
+from ledger_ingest import ingest_csv
+from ledger_rollups import ROLLUP_QUERIES, rebuild_rollups
+from ledger_schema import (GENERATED_COLUMNS_MIGRATION, LEDGER_COLUMNS, LEDGER_TABLE,
+                           LEDGER_TABLE_DDL, migrate, migration_applied)
+from stop_logging_api import StopLogger
+
+SCALES = {"100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+GENERATOR_CHUNK_ROWS = 200_000
+QUERY_REPEATS = 3
+RESULTS_DIR = "benchmark_results"
+
+# Value sets of Traffic_Stops.csv with skewed weights
+COUNTRIES = {"USA": 0.45, "India": 0.35, "Canada": 0.20}
+GENDERS = {"M": 0.68, "F": 0.32}
+RACES = {"White": 0.55, "Black": 0.17, "Hispanic": 0.15, "Asian": 0.08, "Other": 0.05}
+VIOLATIONS = {"Speeding": 0.55, "Other": 0.16, "Seatbelt": 0.12, "Signal": 0.10, "DUI": 0.07}
+# violation -> violation_raw spelling
+RAW_VIOLATIONS = {"Speeding": "Speeding", "Other": "Other", "Seatbelt": "Seatbelt",
+                  "Signal": "Signal Violation", "DUI": "Drunk Driving"}
+OUTCOMES = {"Ticket": 0.62, "Warning": 0.30, "Arrest": 0.08}
+DURATIONS = {"0-15 Min": 0.72, "16-30 Min": 0.22, "30+ Min": 0.06}
+SEARCH_TYPES = {"Vehicle Search": 0.6, "Frisk": 0.4}
+VEHICLE_STATES = ["UP", "RJ", "DL", "KA", "WB", "MH", "TN", "GJ"]
+# Share of traffic per hour of day: a morning and an evening peak, quiet nights
+HOURLY_TRAFFIC = [1, 1, 1, 1, 1, 2, 4, 7, 8, 7, 6, 6, 6, 6, 6, 7, 8, 9, 8, 6, 4, 3, 2, 1]
+
+
+def parse_scale(value):
+    return SCALES.get(value) or int(value.replace("_", ""))
+
+
+# -------------------------------
+# Synthetic ledger
+# -------------------------------
+def _choice(rng, weights, size):
+    values = list(weights)
+    probabilities = np.array(list(weights.values()), dtype=float)
+    return np.array(values, dtype=object)[rng.choice(len(values), size=size, p=probabilities / probabilities.sum())]
+
+
+def _vehicle_numbers(rng, size, fleet):
+    # Heavy-tailed reuse: a few vehicles are stopped again and again, most only once or twice
+    index = np.minimum((fleet * rng.random(size) ** 3).astype(np.int64), fleet - 1)
+    states = np.array(VEHICLE_STATES, dtype=object)[index % len(VEHICLE_STATES)]
+    district = (index // len(VEHICLE_STATES)) % 90 + 10
+    letters = (index * 7919) % 676
+    serial = (index * 104_729) % 9000 + 1000
+    return [f"{state}{d}{chr(65 + l // 26)}{chr(65 + l % 26)}{s}"
+            for state, d, l, s in zip(states, district, letters, serial)]
+
+
+def generate_stops(rows, seed=26, start=datetime.date(2020, 1, 1), days=3 * 365,
+                   chunk_rows=GENERATOR_CHUNK_ROWS):
+    """Yield DataFrames with the Traffic_Stops.csv columns, ``rows`` stops in total."""
+    rng = np.random.default_rng(seed)
+    fleet = max(1, int(rows * 0.6))
+    hour_weights = np.array(HOURLY_TRAFFIC, dtype=float) / sum(HOURLY_TRAFFIC)
+    produced = 0
+    while produced < rows:
+        size = min(chunk_rows, rows - produced)
+        searched = rng.random(size) < 0.35
+        outcome = _choice(rng, OUTCOMES, size)
+        violation = _choice(rng, VIOLATIONS, size)
+        age = np.clip(rng.normal(38, 14, size).round(), 16, 88).astype(np.int64)
+        stop_date = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, size), unit="D")
+        hours = rng.choice(24, size=size, p=hour_weights)
+        minutes = rng.integers(0, 60, size)
+        yield pd.DataFrame({
+            "stop_date": stop_date.strftime("%Y-%m-%d"),
+            "stop_time": [f"{h:02d}:{m:02d}:00" for h, m in zip(hours, minutes)],
+            "country_name": _choice(rng, COUNTRIES, size),
+            "driver_gender": _choice(rng, GENDERS, size),
+            # The raw age is occasionally misrecorded, as in the source data
+            "driver_age_raw": np.where(rng.random(size) < 0.05, rng.integers(16, 90, size), age),
+            "driver_age": age,
+            "driver_race": _choice(rng, RACES, size),
+            "violation_raw": [RAW_VIOLATIONS[v] for v in violation],
+            "violation": violation,
+            "search_conducted": searched,
+            "search_type": np.where(searched, _choice(rng, SEARCH_TYPES, size), None),
+            "stop_outcome": outcome,
+            "is_arrested": (outcome == "Arrest") | (rng.random(size) < 0.02),
+            "stop_duration": _choice(rng, DURATIONS, size),
+            "drugs_related_stop": searched & (rng.random(size) < 0.12),
+            "vehicle_number": _vehicle_numbers(rng, size, fleet),
+        }, columns=LEDGER_COLUMNS)
+        produced += size
+
+
+def write_csv(rows, path, seed=26):
+    header = True
+    for chunk in generate_stops(rows, seed):
+        chunk.to_csv(path, mode="w" if header else "a", header=header, index=False)
+        header = False
+    return path
+
+
+# -------------------------------
+# Timing helpers
+# -------------------------------
+def time_queries(run, queries, repeats=QUERY_REPEATS, log=print):
+    """Run every query ``repeats`` times; ``run(query)`` returns the number of rows."""
+    timings = {}
+    for name, query in queries.items():
+        runs, rows = [], None
+        for _ in range(repeats):
+            started = time.perf_counter()
+            rows = run(query)
+            runs.append(round((time.perf_counter() - started) * 1000, 2))
+        timings[name] = {"runs_ms": runs, "median_ms": statistics.median(runs),
+                         "min_ms": min(runs), "rows": rows}
+        log(f"{name}: median {timings[name]['median_ms']} ms")
+    return timings
+
+
+def time_stop_logging(pool, rows=5000, posts=8, batch=25, seed=27):
+    """Concurrent check posts sending micro-batches through StopLogger group commits."""
+    # to_dict hands back plain Python values, which is what check posts send
+    records = [record for chunk in generate_stops(rows, seed) for record in chunk.to_dict("records")]
+    batches = [records[i:i + batch] for i in range(0, len(records), batch)]
+    stop_logger = StopLogger(pool=pool)
+
+    def post(my_batches):
+        for stops in my_batches:
+            stop_logger.log_stops(stops)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=post, args=(batches[i::posts],)) for i in range(posts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    stop_logger.close()
+    metrics = stop_logger.metrics()
+    return {
+        "rows": len(records), "posts": posts, "batch": batch, "seconds": round(seconds, 3),
+        "rows_per_second": round(len(records) / seconds, 1) if seconds else 0.0,
+        "avg_rows_per_commit": metrics["avg_rows_per_commit"],
+        "latency_p50_ms": metrics["latency_p50_ms"],
+        "latency_p99_ms": metrics["latency_p99_ms"],
+    }
+
+
+# -------------------------------
+# Targets
+# -------------------------------
+def server_identity(config):
+    """``@@server_uuid`` of the server ``config`` reaches, or ``@@hostname:@@port`` where it has none."""
+    pool = ConnectionPool({key: value for key, value in config.items() if key != "database"}, size=1)
+    try:
+        with pool.connection() as connection:
+            with connection.cursor() as cursor:
+                try:
+                    cursor.execute("select @@server_uuid")
+                except pymysql.MySQLError:
+                    cursor.execute("select concat(@@hostname, ':', @@port)")
+                return cursor.fetchone()[0]
+    finally:
+        pool.close()
+
+
+def check_mysql_target(config, allow_production_host=False, log=print):
+    """Refuse a MySQL benchmark target that is not spelled out, or that is the production server.
+
+    Servers are compared by identity, so ``localhost``, an IP address or a
+    hostname that reaches the production server are all refused.
+    """
+    if not config.get("host"):
+        raise SystemExit("the mysql target needs an explicit --host")
+    if allow_production_host:
+        return
+    try:
+        production = server_identity(DB_CONFIG)
+    except (pymysql.MySQLError, PoolTimeout) as error:
+        log(f"production server in ledger_db.DB_CONFIG not reachable ({error}); "
+            f"{config['host']} cannot be it")
+        return
+    if server_identity(config) == production:
+        raise SystemExit(f"{config['host']} is the production server in ledger_db.DB_CONFIG and the "
+                         f"benchmark empties its ledger; pass --allow-production-host if that is intended")
+
+
+def benchmark_mysql(rows, config, truncate=False, repeats=QUERY_REPEATS, method="insert", seed=26, log=print):
+    server = {key: value for key, value in config.items() if key != "database"}
+    pool = ConnectionPool({**server, "database": "Traffic_Stops", "local_infile": method == "load-data"})
+    try:
+        setup = ConnectionPool(server, size=1)
+        with setup.connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("create database if not exists Traffic_Stops")
+                cursor.execute(LEDGER_TABLE_DDL)
+                cursor.execute(f"select exists(select 1 from {LEDGER_TABLE})")
+                has_rows = cursor.fetchone()[0]
+            connection.commit()
+        setup.close()
+        with pool.connection() as connection:
+            if has_rows:
+                if not truncate:
+                    raise SystemExit(f"{LEDGER_TABLE} already holds stops; pass --truncate to empty it")
+                with connection.cursor() as cursor:
+                    cursor.execute(f"truncate table {LEDGER_TABLE}")
+            migrate(connection, log=lambda message: None)
+
+            with tempfile.TemporaryDirectory() as workdir:
+                path = write_csv(rows, os.path.join(workdir, "synthetic_stops.csv"), seed)
+                load = ingest_csv(path, method=method, restart=True, connection=connection,
+                                  log=lambda message: None)
+            log(f"loaded {rows:,} rows at {load['rows_per_second']:,.0f} rows/s")
+            started = time.perf_counter()
+            rebuild_rollups(connection)
+            load["rollup_rebuild_seconds"] = round(time.perf_counter() - started, 3)
+
+            def run(query):
+                with connection.cursor() as cursor:
+                    cursor.execute(query)
+                    return len(cursor.fetchall())
+
+            queries = insight_catalog(migration_applied(connection, GENERATED_COLUMNS_MIGRATION))
+            timings = time_queries(run, queries, repeats, log)
+            rollup_timings = time_queries(run, ROLLUP_QUERIES, repeats, log)
+        return {"load": load, "queries": timings, "rollup_queries": rollup_timings,
+                "stop_logging": time_stop_logging(pool)}
+    finally:
+        pool.close()
+
+
+def benchmark_duckdb(rows, repeats=QUERY_REPEATS, seed=26, log=print):
+    if duckdb is None:
+        raise SystemExit("the duckdb target needs the optional duckdb package")
+    connection = duckdb.connect()
+    connection.execute("create schema Traffic_Stops")
+    started = time.perf_counter()
+    for number, chunk in enumerate(generate_stops(rows, seed)):
+        chunk = chunk.assign(stop_date=pd.to_datetime(chunk["stop_date"]).dt.date)
+        connection.register("chunk", chunk)
+        if number == 0:
+            connection.execute("create table Traffic_Stops.ledger_rows as select * from chunk")
+        else:
+            connection.execute("insert into Traffic_Stops.ledger_rows select * from chunk")
+        connection.unregister("chunk")
+    seconds = time.perf_counter() - started
+    connection.execute(ledger_view_sql("Traffic_Stops.ledger_rows"))
+    load = {"rows_loaded": rows, "seconds": round(seconds, 3),
+            "rows_per_second": round(rows / seconds, 1) if seconds else 0.0}
+    log(f"loaded {rows:,} rows at {load['rows_per_second']:,.0f} rows/s (includes generating them)")
+
+    def run(query):
+        return len(connection.execute(query).fetchall())
+
+    return {"load": load, "queries": time_queries(run, duckdb_catalog(), repeats, log)}
+
+
+def run_benchmark(rows, target="duckdb", config=None, truncate=False, repeats=QUERY_REPEATS,
+                  method="insert", seed=26, log=print, allow_production_host=False):
+    if target == "mysql":
+        check_mysql_target(config or {}, allow_production_host, log)
+        results = benchmark_mysql(rows, config, truncate, repeats, method, seed, log)
+    else:
+        results = benchmark_duckdb(rows, repeats, seed, log)
+    return {
+        "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "target": target,
+        "rows": rows,
+        "seed": seed,
+        "repeats": repeats,
+        "load_method": method if target == "mysql" else "duckdb insert",
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "pandas": pd.__version__},
+        **results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard queries on a synthetic ledger.")
+    parser.add_argument("--rows", type=parse_scale, default=SCALES["100k"],
+                        help="stops to generate: 100k, 1M, 10M or any number")
+    parser.add_argument("--target", choices=["mysql", "duckdb"], default="duckdb")
+    parser.add_argument("--host", help="MySQL server to load; required for --target mysql")
+    parser.add_argument("--allow-production-host", action="store_true",
+                        help="run even when --host reaches the production server in ledger_db.DB_CONFIG")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default=DB_CONFIG["user"])
+    parser.add_argument("--password", default=DB_CONFIG["password"])
+    parser.add_argument("--truncate", action="store_true", help="empty an existing ledger before loading")
+    parser.add_argument("--method", choices=["insert", "load-data"], default="insert")
+    parser.add_argument("--repeats", type=int, default=QUERY_REPEATS)
+    parser.add_argument("--seed", type=int, default=26)
+    parser.add_argument("--output", help=f"JSON file (default {RESULTS_DIR}/<target>_<rows>_<time>.json)")
+    args = parser.parse_args(argv)
+
+    if args.target == "mysql" and args.host is None:
+        parser.error("--target mysql requires --host")
+    config = {"host": args.host, "port": args.port, "user": args.user, "password": args.password}
+    results = run_benchmark(args.rows, args.target, config, args.truncate, args.repeats, args.method,
+                            args.seed, allow_production_host=args.allow_production_host)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{args.target}_{args.rows}_{datetime.datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as handle:
+        json.dump(results, handle, indent=2, default=str)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
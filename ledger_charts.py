@@ -0,0 +1,122 @@
+"""Chart-ready series with a bounded number of points.
+
+Plotly ships every point of a figure to the browser as JSON, so a chart built
+straight from a large result grows with the ledger. The helpers here shrink a
+result on the dashboard server before it is charted:
+
+* ``downsample_series`` keeps the shape of a long line with Largest-Triangle-
+  Three-Buckets (LTTB): the first and last points plus, per bucket, the point
+  spanning the largest triangle with its neighbours;
+* ``limit_categories`` keeps the largest bars and folds the rest into one;
+* ``bin_periods`` re-bins year/month counts into quarters or years until a
+  period x hour grid fits the budget.
+"""
+import numpy as np
+import pandas as pd
+
+CHART_POINT_BUDGET = 1500       # points per line chart / cells per heatmap
+CATEGORY_BAR_BUDGET = 40        # bars per bar chart
+
+# Tried in order until the grid fits; years are used even when it still does not
+PERIOD_GRANULARITIES = ["month", "quarter", "year"]
+
+
+# -------------------------------
+# Line charts: LTTB downsampling
+# -------------------------------
+def _numeric_axis(values):
+    """``values`` as floats for the triangle areas; text that is not a date falls back to position."""
+    series = pd.Series(values).reset_index(drop=True)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("float64").to_numpy()
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        parsed = pd.to_datetime(series, errors="coerce")
+        if parsed.isna().any():
+            return np.arange(len(series), dtype="float64")
+        series = parsed
+    return series.astype("int64").astype("float64").to_numpy()
+
+
+def lttb_indices(x, y, threshold):
+    """Positions of the ``threshold`` points LTTB keeps out of ``x``/``y``."""
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+    x = np.asarray(x, dtype="float64")
+    y = np.nan_to_num(np.asarray(y, dtype="float64"))
+    # threshold - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, length - 1, threshold - 1).astype(int)
+    kept = np.empty(threshold, dtype=int)
+    kept[0] = 0
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+            next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    kept[-1] = length - 1
+    return kept
+
+
+def downsample_series(frame, x, y, budget=CHART_POINT_BUDGET):
+    """``frame`` sorted along ``x``, cut down to ``budget`` rows by LTTB on ``y``."""
+    if len(frame) <= budget:
+        return frame
+    ordered = frame.sort_values(x, kind="stable").reset_index(drop=True)
+    return ordered.iloc[lttb_indices(_numeric_axis(ordered[x]), ordered[y], budget)].reset_index(drop=True)
+
+
+# -------------------------------
+# Bar charts: largest categories
+# -------------------------------
+def limit_categories(frame, label, value, budget=CATEGORY_BAR_BUDGET, other=False):
+    """The ``budget`` rows with the largest ``value``, in their original order.
+
+    With ``other`` the remaining rows are summed into one trailing bar; only
+    pass it for counts, as rates and averages do not add up.
+    """
+    if len(frame) <= budget:
+        return frame
+    keep = budget - 1 if other else budget
+    largest = frame.loc[frame[value].nlargest(keep).index].sort_index()
+    if not other:
+        return largest.reset_index(drop=True)
+    rest = frame.drop(index=largest.index)
+    folded = pd.DataFrame({label: [f"Other ({len(rest):,} more)"], value: [rest[value].sum()]})
+    return pd.concat([largest[[label, value]], folded], ignore_index=True)
+
+
+# -------------------------------
+# Heatmaps: period x hour grids
+# -------------------------------
+def bin_periods(frame, year, month, hour, value, budget=CHART_POINT_BUDGET):
+    """Sum ``value`` per (period, ``hour``) with the finest period whose grid fits ``budget``.
+
+    Returns the binned frame, with a ``period`` label column, and the
+    granularity used. Rows without a year are dropped; a missing month or
+    hour becomes its own bin.
+    """
+    dated = frame[frame[year].notna()]
+    years = dated[year].astype(int)
+    months = dated[month].fillna(0).astype(int)
+    # Zero-padded labels sort in hour order, with "Unknown" last
+    hours = dated[hour].map(lambda h: "Unknown" if pd.isna(h) else f"{int(h):02d}")
+    hour_bins = max(hours.nunique(), 1)
+    for granularity in PERIOD_GRANULARITIES:
+        if granularity == "year":
+            periods = years.astype(str)
+        elif granularity == "quarter":
+            periods = years.astype(str) + "-" + months.map(lambda m: f"Q{(m - 1) // 3 + 1}" if m else "?")
+        else:
+            periods = years.astype(str) + "-" + months.map(lambda m: f"{m:02d}" if m else "?")
+        if periods.nunique() * hour_bins <= budget:
+            break
+    binned = (pd.DataFrame({"period": periods, hour: hours, value: dated[value]})
+              .groupby(["period", hour], sort=True, as_index=False)[value].sum())
+    return binned, granularity
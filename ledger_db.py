@@ -0,0 +1,227 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pymysql
+
+# -------------------------------
+# Database settings
+# -------------------------------
+DB_CONFIG = {
+    "host": "127.0.0.1",
+    "user": "root",
+    "password": "Mirthi@26",   # ⚠️ move to secrets.toml for safety
+    "database": "Traffic_Stops",
+}
+
+POOL_SIZE = 8            # most connections open at the same time
+POOL_TIMEOUT = 10.0      # seconds a caller waits for a free connection
+POOL_IDLE_SECONDS = 300  # idle connections older than this are closed
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became free within the pool timeout."""
+
+
+# -------------------------------
+# Connection pool
+# -------------------------------
+class ConnectionPool:
+    """Bounded pool of pymysql connections shared by the whole process.
+
+    Connections are pinged on checkout (and reopened if the server dropped
+    them) and closed once they sit idle longer than ``idle_seconds``.
+    """
+
+    def __init__(self, config=None, size=POOL_SIZE, timeout=POOL_TIMEOUT,
+                 idle_seconds=POOL_IDLE_SECONDS, connect=pymysql.connect):
+        self.config = dict(config or DB_CONFIG)
+        self.size = size
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self._connect = connect
+        self._idle = []          # (connection, returned_at), newest last
+        self._open = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "connects": 0,
+            "reconnects": 0,
+            "evictions": 0,
+            "timeouts": 0,
+            "wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    def _evict_idle(self, now):
+        # Caller holds the lock; the oldest connections sit at the front. Returns
+        # the evicted connections for the caller to close once it lets go of the lock.
+        evicted = []
+        while self._idle and now - self._idle[0][1] > self.idle_seconds:
+            connection, _ = self._idle.pop(0)
+            self._open -= 1
+            self._stats["evictions"] += 1
+            evicted.append(connection)
+        return evicted
+
+    def acquire(self):
+        # Network I/O (connect, ping, close) happens outside the lock, which
+        # guards only the pool's bookkeeping
+        started = time.monotonic()
+        deadline = started + self.timeout
+        evicted = []
+        try:
+            with self._cond:
+                while True:
+                    evicted += self._evict_idle(time.monotonic())
+                    if self._idle:
+                        connection, _ = self._idle.pop()
+                        break
+                    if self._open < self.size:
+                        connection = None
+                        self._open += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"no database connection free after {self.timeout:.1f}s "
+                            f"({self.size} in use)")
+                    self._cond.wait(remaining)
+        finally:
+            for stale in evicted:
+                _close_quietly(stale)
+
+        try:
+            if connection is None:
+                connection = self._connect(**self.config)
+                self._count("connects")
+            else:
+                try:
+                    connection.ping(reconnect=True)
+                except pymysql.MySQLError:
+                    _close_quietly(connection)
+                    connection = self._connect(**self.config)
+                    self._count("reconnects")
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self._stats["checkouts"] += 1
+            self._stats["wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+        return connection
+
+    def release(self, connection, broken=False):
+        if not broken:
+            try:
+                connection.rollback()   # never hand an open transaction to the next caller
+            except pymysql.MySQLError:
+                broken = True
+        if broken:
+            _close_quietly(connection)
+        with self._cond:
+            if broken:
+                self._open -= 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        broken = False
+        try:
+            yield connection
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.release(connection, broken=broken)
+
+    def kill_query(self, thread_id):
+        """Interrupt the statement running on the connection with ``thread_id``.
+
+        ``KILL QUERY`` has to come from a second connection.
+        """
+        with self.connection() as connection:
+            with connection.cursor() as cursor:
+                try:
+                    cursor.execute("kill query %s", (thread_id,))
+                except pymysql.MySQLError:
+                    pass   # the statement finished in the meantime
+
+    def close(self):
+        with self._cond:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._open -= len(idle)
+        for connection in idle:
+            _close_quietly(connection)
+
+    def _count(self, name):
+        with self._cond:
+            self._stats[name] += 1
+
+    def metrics(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["open"] = self._open
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._open - len(self._idle)
+            stats["size"] = self.size
+        checkouts = stats["checkouts"]
+        stats["avg_wait_ms"] = round(stats["wait_seconds"] / checkouts * 1000, 3) if checkouts else 0.0
+        stats["max_wait_ms"] = round(stats.pop("max_wait_seconds") * 1000, 3)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        return stats
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+# -------------------------------
+# Ledger version
+# -------------------------------
+LEDGER_VERSION_QUERY = """
+    select AUTO_INCREMENT, UPDATE_TIME
+    from information_schema.tables
+    where table_schema = 'Traffic_Stops' and table_name = 'digital_ledger'
+"""
+
+
+def ledger_version(connection):
+    """Cheap fingerprint of digital_ledger that changes whenever stops are inserted.
+
+    Reads table metadata only, so it costs the same regardless of ledger size.
+    """
+    with connection.cursor() as cursor:
+        try:
+            # MySQL 8 caches table statistics for a day unless told otherwise
+            cursor.execute("set session information_schema_stats_expiry = 0")
+        except pymysql.MySQLError:
+            pass
+        cursor.execute(LEDGER_VERSION_QUERY)
+        row = cursor.fetchone()
+    return tuple(str(value) for value in row) if row else None
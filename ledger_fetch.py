@@ -0,0 +1,244 @@
+"""Streaming, typed query results.
+
+A buffered cursor holds the whole result as tuples and ``pd.DataFrame`` then
+copies it again. ``stream_query`` reads through an unbuffered server-side
+cursor (``SSCursor``) instead and turns every chunk of ``chunk_rows`` rows
+straight into typed columns, so only one chunk of tuples is ever alive:
+
+* integers become nullable ``Int64`` and ``tinyint(1)`` flags ``boolean``;
+* decimals and floats become ``float64``;
+* dates and datetimes are parsed once per chunk into ``datetime64``, TIME into ``timedelta64``;
+* text columns whose first chunk repeats values become ``category``.
+
+``fetch_frame`` collects the chunks into one DataFrame and stops with
+``MemoryCeilingExceeded`` once the typed result grows past ``max_bytes``.
+``load_ledger`` goes one step further for raw ledger rows and returns the
+compact representation from ``compact_ledger_frame``.
+"""
+import pandas as pd
+import pymysql.cursors
+from pandas.api.types import union_categoricals
+from pymysql.constants import FIELD_TYPE
+
+from ledger_schema import LEDGER_COLUMNS, LEDGER_TABLE
+
+STREAM_CHUNK_ROWS = 50_000
+FETCH_MEMORY_CEILING = 512 * 1024 ** 2   # bytes a streamed result may take in memory
+CATEGORY_MAX_RATIO = 0.5      # text columns with fewer distinct values than this share become categoricals
+
+_INTEGER_TYPES = {FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.INT24,
+                  FIELD_TYPE.LONG, FIELD_TYPE.LONGLONG, FIELD_TYPE.YEAR}
+_FLOAT_TYPES = {FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL, FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE}
+_DATETIME_TYPES = {FIELD_TYPE.DATE, FIELD_TYPE.NEWDATE, FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP}
+
+
+class MemoryCeilingExceeded(Exception):
+    """Raised when a fetched result grows past the caller's memory ceiling."""
+
+
+# -------------------------------
+# Column typing
+# -------------------------------
+def _column_kind(description):
+    _, type_code, _, internal_size = description[:4]
+    if type_code == FIELD_TYPE.TINY and internal_size == 1:
+        return "boolean"          # MySQL spells BOOLEAN as tinyint(1)
+    if type_code in _INTEGER_TYPES:
+        return "integer"
+    if type_code in _FLOAT_TYPES:
+        return "float"
+    if type_code in _DATETIME_TYPES:
+        return "datetime"
+    if type_code == FIELD_TYPE.TIME:
+        return "time"
+    return "text"
+
+
+def _typed_column(values, kind, categorical):
+    if kind == "boolean":
+        return pd.array(values, dtype="Int64").astype("boolean")
+    if kind == "integer":
+        return pd.array(values, dtype="Int64")
+    if kind == "float":
+        return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy("float64")
+    if kind == "datetime":
+        return pd.to_datetime(pd.Series(values, dtype=object), errors="coerce").to_numpy()
+    if kind == "time":
+        return pd.to_timedelta(pd.Series(values, dtype=object), errors="coerce").to_numpy()
+    if categorical:
+        return pd.Categorical(values)
+    return pd.array(values, dtype="string")
+
+
+class _ChunkTyper:
+    """Turns row chunks into typed frames; the text-vs-category choice is made on the first chunk."""
+
+    def __init__(self, description):
+        self.columns = [column[0] for column in description]
+        self.kinds = [_column_kind(column) for column in description]
+        self.categorical = None
+
+    def frame(self, rows):
+        values_by_column = list(zip(*rows)) if rows else [()] * len(self.columns)
+        if self.categorical is None:
+            self.categorical = [kind == "text" and len(set(values)) <= CATEGORY_MAX_RATIO * max(len(values), 1)
+                                for kind, values in zip(self.kinds, values_by_column)]
+        return pd.DataFrame({
+            name: _typed_column(values, kind, categorical)
+            for name, kind, categorical, values in zip(self.columns, self.kinds, self.categorical, values_by_column)
+        }, columns=self.columns)
+
+
+# -------------------------------
+# Streaming API
+# -------------------------------
+def stream_query(connection, query, params=None, chunk_rows=STREAM_CHUNK_ROWS):
+    """Yield the result of ``query`` as typed DataFrames of at most ``chunk_rows`` rows.
+
+    An empty result still yields one empty frame, so callers always see the
+    columns. The connection is busy until the generator is exhausted or
+    closed; closing it early drains the rows the server still has to send.
+    """
+    with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(query, params)
+        typer = _ChunkTyper(cursor.description)
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            yield typer.frame(rows)
+        while rows:
+            chunk = typer.frame(rows)
+            del rows
+            yield chunk
+            rows = cursor.fetchmany(chunk_rows)
+
+
+def concat_chunks(chunks):
+    """One frame from typed chunks, keeping categoricals categorical across chunks."""
+    if len(chunks) == 1:
+        return chunks[0]
+    combined = {}
+    for name in chunks[0].columns:
+        parts = [chunk[name] for chunk in chunks]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            # pd.concat would fall back to object when the chunks saw different categories
+            combined[name] = pd.Series(union_categoricals(parts, ignore_order=True))
+        else:
+            combined[name] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(combined)
+
+
+def _abandon(connection, stream, interrupt):
+    """Stop reading ``stream`` early without receiving the rest of the result.
+
+    An unbuffered result cannot simply be dropped: closing its cursor reads
+    every remaining row off the wire. With ``interrupt`` the server is told
+    to stop first, the cursor then only reads up to the "interrupted" error,
+    and the connection, whose result was cut short, is closed; the pool
+    replaces it. Without ``interrupt`` the rest of the result is drained.
+    """
+    try:
+        interrupt(connection.thread_id())
+    except Exception:
+        stream.close()   # could not interrupt (e.g. no connection free): drain instead
+        return
+    try:
+        stream.close()
+    except pymysql.MySQLError:
+        pass   # ER_QUERY_INTERRUPTED, raised while the cursor finishes the result
+    try:
+        connection.close()
+    except pymysql.MySQLError:
+        pass
+
+
+def fetch_frame(connection, query, params=None, chunk_rows=STREAM_CHUNK_ROWS, max_bytes=None, interrupt=None):
+    """The whole result of ``query`` as one typed DataFrame, built chunk by chunk.
+
+    ``interrupt(thread_id)`` should ``KILL QUERY`` the given connection from
+    another one (``ledger_db.ConnectionPool.kill_query``); it is used to stop
+    the server once the result passes ``max_bytes``.
+    """
+    chunks = []
+    size = 0
+    rows = 0
+    stream = stream_query(connection, query, params, chunk_rows)
+    for chunk in stream:
+        size += int(chunk.memory_usage(deep=True).sum())
+        rows += len(chunk)
+        if max_bytes is not None and size > max_bytes:
+            if interrupt is not None:
+                _abandon(connection, stream, interrupt)
+            raise MemoryCeilingExceeded(
+                f"result passed {max_bytes / 1024 ** 2:.0f} MB after {rows:,} rows; "
+                f"narrow the query or stream it")
+        chunks.append(chunk)
+    return concat_chunks(chunks)
+
+
+# -------------------------------
+# Compact ledger frames
+# -------------------------------
+# Low-cardinality text: a handful of distinct values repeated on every row
+LEDGER_CATEGORY_COLUMNS = ["country_name", "driver_gender", "driver_race", "violation_raw",
+                           "violation", "search_type", "stop_outcome", "stop_duration"]
+LEDGER_FLAG_COLUMNS = ["search_conducted", "is_arrested", "drugs_related_stop"]
+LEDGER_AGE_COLUMNS = ["driver_age_raw", "driver_age"]
+
+
+def _compact_ages(values):
+    """``values`` in the smallest nullable integer type that holds every one of them.
+
+    A column with text, fractions or numbers past Int16 is returned as is:
+    compacting is for memory only and must not change what is displayed.
+    """
+    ages = pd.to_numeric(values, errors="coerce")
+    present = ages.dropna()
+    if ages.isna().sum() != values.isna().sum() or (present % 1 != 0).any():
+        return values
+    for dtype, low, high in (("UInt8", 0, 255), ("Int16", -32768, 32767)):
+        if present.between(low, high).all():
+            return ages.astype(dtype)
+    return values
+
+
+def compact_ledger_frame(frame):
+    """Shrink ledger rows: categoricals, boolean flags, small-integer ages and one ``stop_datetime``.
+
+    ``stop_date`` and ``stop_time`` are combined with two vectorized parses
+    and dropped. Columns the frame does not have are left alone.
+    """
+    compact = frame.copy()
+    for column in LEDGER_CATEGORY_COLUMNS:
+        if column in compact.columns:
+            compact[column] = compact[column].astype("category")
+    for column in LEDGER_FLAG_COLUMNS:
+        if column in compact.columns:
+            flags = pd.to_numeric(compact[column], errors="coerce")
+            compact[column] = flags.astype(bool) if not flags.isna().any() else flags.astype("boolean")
+    for column in LEDGER_AGE_COLUMNS:
+        if column in compact.columns:
+            compact[column] = _compact_ages(compact[column])
+    if "stop_date" in compact.columns:
+        stop_datetime = pd.to_datetime(compact["stop_date"], errors="coerce")
+        if "stop_time" in compact.columns:
+            # pymysql hands TIME back as timedelta, which adds straight onto the date
+            stop_datetime = stop_datetime + pd.to_timedelta(compact["stop_time"], errors="coerce")
+            compact = compact.drop(columns="stop_time")
+        position = compact.columns.get_loc("stop_date")
+        compact = compact.drop(columns="stop_date")
+        compact.insert(position, "stop_datetime", stop_datetime)
+    return compact
+
+
+def memory_per_row(frame):
+    """Bytes per row, counting the strings behind object columns."""
+    if frame.empty:
+        return 0.0
+    return float(frame.memory_usage(deep=True, index=False).sum()) / len(frame)
+
+
+def load_ledger(connection, where="", params=None, chunk_rows=STREAM_CHUNK_ROWS):
+    """Stream ledger rows (optionally filtered by ``where``) into one compact frame."""
+    query = f"select id, {', '.join(LEDGER_COLUMNS)} from {LEDGER_TABLE} {where}"
+    return concat_chunks([compact_ledger_frame(chunk)
+                          for chunk in stream_query(connection, query, params, chunk_rows)])
@@ -0,0 +1,199 @@
+"""Bulk-load a Traffic_Stops CSV into digital_ledger.
+
+The CSV is streamed in chunks, each chunk is cleaned with vectorized pandas
+operations and loaded in its own transaction together with a checkpoint row,
+so an interrupted load resumes where it stopped instead of starting over::
+
+    python ledger_ingest.py Traffic_Stops.csv --batch-size 20000
+    python ledger_ingest.py Traffic_Stops.csv --method load-data
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from ledger_db import DB_CONFIG, ConnectionPool, get_pool
+from ledger_rollups import refresh_rollups, rollups_ready
+from ledger_schema import INSERT_QUERY, LEDGER_COLUMNS, LEDGER_TABLE
+
+CHECKPOINT_TABLE = "Traffic_Stops.ledger_ingest_checkpoints"
+DEFAULT_BATCH_SIZE = 20_000
+
+BOOLEAN_COLUMNS = ["search_conducted", "is_arrested", "drugs_related_stop"]
+INTEGER_COLUMNS = ["driver_age_raw", "driver_age"]
+_BOOLEAN_TEXT = {"true": 1, "1": 1, "yes": 1, "false": 0, "0": 0, "no": 0}
+
+
+# -------------------------------
+# Cleaning
+# -------------------------------
+def parse_stop_time(values):
+    """Vectorized HH:MM:SS parsing that also accepts HH:MM; bad values become NaT."""
+    text = values.astype("string").str.strip()
+    parsed = pd.to_datetime(text, format="%H:%M:%S", errors="coerce")
+    missing = parsed.isna() & text.notna()
+    if missing.any():
+        parsed[missing] = pd.to_datetime(text[missing], format="%H:%M", errors="coerce")
+    return parsed
+
+
+def parse_boolean(values):
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+        return values.astype("Int8")
+    return values.astype("string").str.strip().str.lower().map(_BOOLEAN_TEXT).astype("Int8")
+
+
+def clean_chunk(chunk):
+    """Apply the notebook's cleaning to one chunk, column-at-a-time."""
+    chunk = chunk.reindex(columns=LEDGER_COLUMNS)
+    chunk["search_type"] = chunk["search_type"].fillna("Not Searched")
+    chunk["stop_date"] = pd.to_datetime(chunk["stop_date"], format="%Y-%m-%d", errors="coerce").dt.strftime("%Y-%m-%d")
+    chunk["stop_time"] = parse_stop_time(chunk["stop_time"]).dt.strftime("%H:%M:%S")
+    for column in BOOLEAN_COLUMNS:
+        chunk[column] = parse_boolean(chunk[column])
+    for column in INTEGER_COLUMNS:
+        chunk[column] = pd.to_numeric(chunk[column], errors="coerce").round().astype("Int64")
+    return chunk
+
+
+def chunk_rows(chunk):
+    """DB-API rows with SQL NULL (None) in place of pandas' missing markers."""
+    return [tuple(None if pd.isna(value) else value for value in row)
+            for row in chunk.astype(object).itertuples(index=False, name=None)]
+
+
+# -------------------------------
+# Loading
+# -------------------------------
+def insert_chunk(cursor, chunk):
+    # pymysql rewrites executemany of an INSERT ... VALUES into multi-row statements
+    cursor.executemany(INSERT_QUERY, chunk_rows(chunk))
+
+
+def load_data_chunk(cursor, chunk):
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, newline="", encoding="utf-8") as handle:
+        # Backslashes are data, not escapes; without an escape character NULL is the bare word
+        chunk.to_csv(handle, index=False, header=False, na_rep="NULL", quoting=csv.QUOTE_MINIMAL)
+        path = handle.name
+    try:
+        cursor.execute(
+            f"""load data local infile %s into table {LEDGER_TABLE}
+                character set utf8mb4
+                fields terminated by ',' optionally enclosed by '"' escaped by ''
+                lines terminated by '\\n'
+                ({', '.join(LEDGER_COLUMNS)})""",
+            (path,))
+    finally:
+        os.remove(path)
+
+
+LOADERS = {"insert": insert_chunk, "load-data": load_data_chunk}
+
+
+def ensure_checkpoint_table(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f"""create table if not exists {CHECKPOINT_TABLE} (
+            source varchar(255) primary key,
+            rows_loaded bigint unsigned not null default 0,
+            updated_at timestamp not null default current_timestamp on update current_timestamp)""")
+    connection.commit()
+
+
+def read_checkpoint(connection, source):
+    with connection.cursor() as cursor:
+        cursor.execute(f"select rows_loaded from {CHECKPOINT_TABLE} where source=%s", (source,))
+        row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def ingest_csv(path, batch_size=DEFAULT_BATCH_SIZE, method="insert", restart=False,
+               connection=None, log=print):
+    """Load ``path`` into digital_ledger and return load statistics.
+
+    Each batch is committed together with its checkpoint, so a rerun after a
+    failure skips exactly the rows already loaded.
+    """
+    if connection is not None:
+        return _ingest(connection, path, batch_size, method, restart, log)
+    if method == "load-data":
+        # LOAD DATA LOCAL must be allowed when the connection is opened
+        pool = ConnectionPool({**DB_CONFIG, "local_infile": True}, size=1)
+        try:
+            with pool.connection() as connection:
+                return _ingest(connection, path, batch_size, method, restart, log)
+        finally:
+            pool.close()
+    with get_pool().connection() as connection:
+        return _ingest(connection, path, batch_size, method, restart, log)
+
+
+def _ingest(connection, path, batch_size, method, restart, log):
+    loader = LOADERS[method]
+    source = os.path.abspath(path)
+    ensure_checkpoint_table(connection)
+    if restart:
+        with connection.cursor() as cursor:
+            cursor.execute(f"delete from {CHECKPOINT_TABLE} where source=%s", (source,))
+        connection.commit()
+    already_loaded = read_checkpoint(connection, source)
+    if already_loaded:
+        log(f"resuming {path} after {already_loaded:,} rows already loaded")
+
+    started = time.perf_counter()
+    loaded = 0
+    # A callable, as pandas turns a range of skipped lines into a set of every line number
+    reader = pd.read_csv(path, chunksize=batch_size, dtype=str,
+                         skiprows=(lambda line: 0 < line <= already_loaded) if already_loaded else None)
+    for chunk in reader:
+        batch_started = time.perf_counter()
+        cleaned = clean_chunk(chunk)
+        try:
+            with connection.cursor() as cursor:
+                loader(cursor, cleaned)
+                cursor.execute(
+                    f"""insert into {CHECKPOINT_TABLE} (source, rows_loaded) values (%s, %s)
+                        on duplicate key update rows_loaded = values(rows_loaded)""",
+                    (source, already_loaded + loaded + len(cleaned)))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        loaded += len(cleaned)
+        batch_seconds = time.perf_counter() - batch_started
+        log(f"loaded {already_loaded + loaded:,} rows "
+            f"({len(cleaned) / batch_seconds if batch_seconds else 0:,.0f} rows/s this batch)")
+    seconds = time.perf_counter() - started
+
+    if rollups_ready(connection):
+        refresh_rollups(connection)
+
+    stats = {
+        "source": source,
+        "method": method,
+        "batch_size": batch_size,
+        "rows_loaded": loaded,
+        "rows_skipped": already_loaded,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(loaded / seconds, 1) if seconds else 0.0,
+    }
+    log(f"done: {loaded:,} rows in {stats['seconds']}s ({stats['rows_per_second']:,.0f} rows/s)")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-load a Traffic_Stops CSV into digital_ledger.")
+    parser.add_argument("csv_path", help="CSV with the Traffic_Stops.csv columns")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"rows per chunk and transaction (default {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--method", choices=sorted(LOADERS), default="insert",
+                        help="batched multi-row INSERT or LOAD DATA LOCAL INFILE")
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint and load from the first row")
+    args = parser.parse_args(argv)
+    ingest_csv(args.csv_path, batch_size=args.batch_size, method=args.method, restart=args.restart)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""Live KEY METRICES: seed once, then fold in only the stops added since.
+
+``LedgerDeltaPoller`` remembers the ledger ``id`` below which every stop has
+been seen and on each poll reads just the rows above that watermark, handing
+them to its subscribers. ``LiveKeyMetrics`` is one such subscriber: it keeps the KEY
+METRICES summaries as in-memory counters, so a refresh costs time proportional
+to the new stops rather than to the whole ledger.
+"""
+import bisect
+import datetime
+import threading
+import time
+from collections import Counter
+
+import pandas as pd
+
+from ledger_rollups import ROLLUP_STATE
+from ledger_schema import LEDGER_TABLE
+
+DELTA_BATCH_ROWS = 5000        # rows read per query; a poll reads batches until it catches up
+POLL_TIME_BUDGET = 2.0         # seconds one poll may spend draining a backlog
+MIN_POLL_SECONDS = 1.0         # polls closer together than this are skipped
+GAP_TIMEOUT_SECONDS = 60.0     # an id still missing after this long was rolled back, not delayed
+SEED_TRAILING_IDS = 50_000     # ids below the seed watermark that may still be uncommitted
+GAP_SCAN_LIMIT = 200           # open id gaps re-checked per poll, lowest first
+
+DELTA_COLUMNS = [
+    "id", "stop_date", "stop_time", "country_name", "driver_gender", "violation",
+    "search_conducted", "stop_outcome", "is_arrested", "drugs_related_stop", "vehicle_number",
+]
+DELTA_QUERY = (f"select {', '.join(DELTA_COLUMNS)} from {LEDGER_TABLE} "
+               f"where id > %s order by id limit %s")
+WINDOW_IDS_QUERY = f"select id from {LEDGER_TABLE} where id > %s and id <= %s"
+GAP_ROWS_QUERY = f"select {', '.join(DELTA_COLUMNS)} from {LEDGER_TABLE} where {{}}"
+
+# Where seeding starts the watermark: the live ledger, or the rollups' last fold
+LEDGER_WATERMARK_QUERY = f"select coalesce(max(id), 0) from {LEDGER_TABLE}"
+ROLLUP_WATERMARK_QUERY = f"select last_id from {ROLLUP_STATE} where name='ledger'"
+
+
+def _stop_hour(value):
+    # pymysql returns TIME columns as timedelta
+    if isinstance(value, datetime.timedelta):
+        return int(value.total_seconds()) // 3600
+    if isinstance(value, datetime.time):
+        return value.hour
+    return None
+
+
+class LedgerDeltaPoller:
+    """Reads ledger rows newer than a watermark and passes them to subscribers.
+
+    InnoDB hands out auto-increment ids when a row is inserted, not when it
+    commits, so a stop with a lower id can become visible after a higher one.
+    The watermark therefore only moves past ids that were seen: everything
+    above it that was folded is remembered, and each run of missing ids
+    between the watermark and the highest one seen is a gap. Each poll
+    re-reads the lowest ``gap_scan_limit`` gaps by id range, and a gap that
+    stays empty for ``gap_timeout`` seconds on its own clock (a rolled-back
+    insert, a deleted row, an archived partition) is skipped.
+
+    ``seed`` runs every subscriber's seeding queries inside one consistent
+    snapshot together with the watermark query. When they read the ledger
+    itself, the ids visible in the ``trailing_ids`` below the watermark count
+    as seen and the rest of that window stays open for late commits; seeding
+    from the rollups passes ``trailing_ids=0``, as the rollups only cover
+    stops up to their own watermark.
+    """
+
+    def __init__(self, batch_rows=DELTA_BATCH_ROWS, min_poll_seconds=MIN_POLL_SECONDS,
+                 time_budget=POLL_TIME_BUDGET, gap_timeout=GAP_TIMEOUT_SECONDS, gap_scan_limit=GAP_SCAN_LIMIT):
+        self.batch_rows = batch_rows
+        self.min_poll_seconds = min_poll_seconds
+        self.time_budget = time_budget
+        self.gap_timeout = gap_timeout
+        self.gap_scan_limit = gap_scan_limit
+        self.watermark = None          # every stop at or below this id has been folded
+        self.last_poll = None
+        self.rows_polled = 0
+        self._seen = set()             # folded ids above the watermark
+        self._highest = None           # highest folded id
+        self._gaps = {}                # first id of each open gap -> (last id, when first missed)
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, subscriber):
+        """``subscriber`` needs ``seed(cursor, watermark)`` and ``fold(rows)`` methods.
+
+        ``seed`` gets the highest id of the seeding snapshot and must count
+        only stops up to it; later ones are passed to ``fold``.
+        """
+        self._subscribers.append(subscriber)
+
+    @property
+    def seeded(self):
+        return self.watermark is not None
+
+    def seed(self, connection, watermark_query=LEDGER_WATERMARK_QUERY, trailing_ids=SEED_TRAILING_IDS):
+        with self._lock:
+            with connection.cursor() as cursor:
+                cursor.execute("start transaction with consistent snapshot")
+                try:
+                    cursor.execute(watermark_query)
+                    row = cursor.fetchone()
+                    highest = int(row[0] or 0) if row else 0
+                    for subscriber in self._subscribers:
+                        subscriber.seed(cursor, highest)
+                    watermark = max(highest - trailing_ids, 0)
+                    seen = set()
+                    if highest > watermark:
+                        cursor.execute(WINDOW_IDS_QUERY, (watermark, highest))
+                        seen = {row[0] for row in cursor.fetchall()}
+                finally:
+                    connection.commit()
+            self.watermark, self._highest, self._seen = watermark, highest, seen
+            self._gaps = {}
+            self._settle()
+            self.last_poll = time.monotonic()
+
+    def _fold(self, cursor):
+        rows = [dict(zip(DELTA_COLUMNS, row)) for row in cursor.fetchall()]
+        if rows:
+            for subscriber in self._subscribers:
+                subscriber.fold(rows)
+            self._seen.update(row["id"] for row in rows)
+            self._highest = max(self._highest, max(row["id"] for row in rows))
+        return len(rows)
+
+    def _open_gaps(self, now):
+        # Gaps still waiting for late commits, lowest first; older ones are taken as rolled back
+        return [(start, end) for start, (end, since) in sorted(self._gaps.items())
+                if now - since < self.gap_timeout]
+
+    def _settle(self):
+        """Move the watermark up to the lowest gap that has not timed out.
+
+        Every gap keeps the time it was first missed, also when late rows
+        split it, so all gaps time out together rather than one after another.
+        """
+        now = time.monotonic()
+        starts = sorted(self._gaps)
+        gaps = {}
+        previous = self.watermark
+        for seen_id in sorted(self._seen):
+            if seen_id > previous + 1:
+                start = previous + 1
+                since = now
+                index = bisect.bisect_right(starts, start) - 1
+                if index >= 0 and start <= self._gaps[starts[index]][0]:
+                    since = self._gaps[starts[index]][1]
+                gaps[start] = (seen_id - 1, since)
+            previous = seen_id
+        self._gaps = gaps
+        waiting = self._open_gaps(now)
+        self.watermark = waiting[0][0] - 1 if waiting else self._highest
+        self._gaps = {start: gap for start, gap in gaps.items() if start > self.watermark}
+        self._seen = {seen_id for seen_id in self._seen if seen_id > self.watermark}
+
+    def poll(self, connection, force=False):
+        """Fold any new stops into the subscribers; returns how many were read."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self.last_poll is not None and now - self.last_poll < self.min_poll_seconds:
+                return 0
+            self.last_poll = now
+            read = 0
+            with connection.cursor() as cursor:
+                # Stops that committed late, into the lowest open gaps
+                ranges = self._open_gaps(now)[:self.gap_scan_limit]
+                if ranges:
+                    cursor.execute(GAP_ROWS_QUERY.format(" or ".join(["id between %s and %s"] * len(ranges))),
+                                   [bound for gap in ranges for bound in gap])
+                    read += self._fold(cursor)
+                # New stops, batch after batch until caught up or out of time
+                while True:
+                    cursor.execute(DELTA_QUERY, (self._highest, self.batch_rows))
+                    batch = self._fold(cursor)
+                    read += batch
+                    if batch < self.batch_rows or time.monotonic() - now >= self.time_budget:
+                        break
+            connection.commit()   # end the read so the next poll sees newer commits
+            self._settle()
+            self.rows_polled += read
+            return read
+
+
+class LiveKeyMetrics:
+    """In-memory KEY METRICES summaries, seeded from SQL and kept current by folding deltas.
+
+    ``queries`` maps the KEY METRICES query names to the SQL used for seeding
+    (ledger or rollup versions; both return the same columns).
+    """
+
+    def __init__(self, queries):
+        self.queries = queries
+        self.totals = Counter()
+        self.outcomes = Counter()
+        self.genders = Counter()
+        self.months = Counter()
+        self.day_hours = Counter()
+        self._lock = threading.Lock()
+
+    def seed(self, cursor, watermark):
+        # The seeding queries run in the poller's snapshot, which already bounds them
+        frames = {}
+        for name, query in self.queries.items():
+            cursor.execute(query)
+            columns = [desc[0] for desc in cursor.description]
+            frames[name] = pd.DataFrame(cursor.fetchall(), columns=columns)
+        with self._lock:
+            totals = frames["KEY METRICES: totals"]
+            if not totals.empty:
+                self.totals = Counter({key: int(value or 0) for key, value in totals.iloc[0].items()})
+            self.outcomes = Counter(dict(zip(frames["KEY METRICES: outcomes"]["stop_outcome"],
+                                             frames["KEY METRICES: outcomes"]["count"].astype(int))))
+            self.genders = Counter(dict(zip(frames["KEY METRICES: genders"]["Gender"],
+                                            frames["KEY METRICES: genders"]["Count"].astype(int))))
+            self.months = Counter(dict(zip(frames["KEY METRICES: stops per month"]["stop_date"],
+                                           frames["KEY METRICES: stops per month"]["Counts"].astype(int))))
+            day_hour = frames["KEY METRICES: day and hour"]
+            self.day_hours = Counter({(day, int(hour)): int(stops) for day, hour, stops in
+                                      zip(day_hour["stop_day"], day_hour["stop_hour"], day_hour["stops"])})
+
+    def fold(self, rows):
+        # Mirrors the KEY METRICES SQL row by row, for the new stops only
+        with self._lock:
+            for row in rows:
+                outcome = row["stop_outcome"]
+                self.totals["total_stops"] += 1
+                if outcome is not None:
+                    self.outcomes[outcome] += 1
+                    self.totals["arrests"] += "arrest" in outcome.lower()
+                    self.totals["warnings"] += "warning" in outcome.lower()
+                self.totals["drug_related"] += row["drugs_related_stop"] == 1
+                if row["driver_gender"] is not None:
+                    self.genders[row["driver_gender"]] += 1
+                stop_date = row["stop_date"]
+                if stop_date is not None:
+                    self.months[stop_date.strftime("%Y-%m")] += 1
+                    hour = _stop_hour(row["stop_time"])
+                    if hour is not None and row["vehicle_number"] is not None:
+                        self.day_hours[(stop_date.strftime("%A"), hour)] += 1
+
+    def frames(self):
+        """The summaries shaped like the KEY METRICES query results."""
+        with self._lock:
+            totals = pd.DataFrame([{key: self.totals[key] for key in
+                                    ("total_stops", "arrests", "warnings", "drug_related")}])
+            outcomes = pd.DataFrame(list(self.outcomes.items()), columns=["stop_outcome", "count"])
+            genders = pd.DataFrame(self.genders.most_common(), columns=["Gender", "Count"])
+            months = pd.DataFrame(sorted(self.months.items()), columns=["stop_date", "Counts"])
+            day_hours = pd.DataFrame([(day, hour, stops) for (day, hour), stops in self.day_hours.items()],
+                                     columns=["stop_day", "stop_hour", "stops"])
+        return {
+            "KEY METRICES: totals": totals,
+            "KEY METRICES: outcomes": outcomes,
+            "KEY METRICES: genders": genders,
+            "KEY METRICES: stops per month": months,
+            "KEY METRICES: day and hour": day_hours,
+        }
@@ -0,0 +1,103 @@
+"""Keyset (seek) pagination over digital_ledger for the FULL TABLE page.
+
+Instead of ``limit/offset`` (which reads and throws away every skipped row),
+each page continues from the ``(sort value, id)`` of the last row already shown,
+so fetching page 1 or page 10,000 costs the same index seek.
+"""
+
+LEDGER_TABLE = "Traffic_Stops.digital_ledger"
+
+# Only indexed columns are offered, otherwise every page would need a filesort
+SORTABLE_COLUMNS = {
+    "Ingest order": "id",
+    "Stop date": "stop_date",
+    "Vehicle number": "vehicle_number",
+}
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def build_filters(filters, pruning=False):
+    """Turn the FULL TABLE filter widgets into a where clause and parameters.
+
+    Supported keys: ``date_from``, ``date_to``, ``country_name``, ``violation``,
+    ``stop_outcome`` (lists of allowed values) and ``vehicle_number`` (prefix).
+    With ``pruning`` (migration 0006) the date range is repeated on
+    ``partition_date``, the partitioning column, so MySQL skips the
+    partitions outside it; the two conditions select the same rows.
+    """
+    clauses, params = [], []
+    date_columns = ["stop_date", "partition_date"] if pruning else ["stop_date"]
+    if filters.get("date_from") is not None:
+        clauses.extend(f"{column} >= %s" for column in date_columns)
+        params.extend([filters["date_from"]] * len(date_columns))
+    if filters.get("date_to") is not None:
+        clauses.extend(f"{column} <= %s" for column in date_columns)
+        params.extend([filters["date_to"]] * len(date_columns))
+    for column in ("country_name", "violation", "stop_outcome"):
+        values = filters.get(column)
+        if values:
+            clauses.append(f"{column} in ({', '.join(['%s'] * len(values))})")
+            params.extend(values)
+    vehicle = (filters.get("vehicle_number") or "").strip()
+    if vehicle:
+        escaped = vehicle.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        clauses.append("vehicle_number like %s")
+        params.append(escaped + "%")
+    return clauses, params
+
+
+def _seek_clause(sort_column, descending, after):
+    """Where clause for rows strictly after ``after = (sort value, id)``.
+
+    MySQL sorts NULLs first ascending and last descending, which the NULL
+    branches below mirror so that no row is skipped or repeated.
+    """
+    last_value, last_id = after
+    if sort_column == "id":
+        return ("id < %s" if descending else "id > %s"), [last_id]
+    if descending:
+        if last_value is None:
+            return f"({sort_column} is null and id < %s)", [last_id]
+        return (f"({sort_column} < %s or ({sort_column} = %s and id < %s) or {sort_column} is null)",
+                [last_value, last_value, last_id])
+    if last_value is None:
+        return f"(({sort_column} is null and id > %s) or {sort_column} is not null)", [last_id]
+    return (f"({sort_column} > %s or ({sort_column} = %s and id > %s))",
+            [last_value, last_value, last_id])
+
+
+def build_page_query(filters, sort_column="id", descending=False, after=None, page_size=50, pruning=False):
+    """SQL and parameters for one page; one extra row is fetched to detect a next page."""
+    if sort_column not in SORTABLE_COLUMNS.values():
+        raise ValueError(f"cannot sort the full table by {sort_column!r}")
+    clauses, params = build_filters(filters, pruning)
+    if after is not None:
+        seek, seek_params = _seek_clause(sort_column, descending, after)
+        clauses.append(seek)
+        params.extend(seek_params)
+    where = f"where {' and '.join(clauses)}" if clauses else ""
+    direction = "desc" if descending else "asc"
+    order = f"id {direction}" if sort_column == "id" else f"{sort_column} {direction}, id {direction}"
+    query = f"select * from {LEDGER_TABLE} {where} order by {order} limit %s"
+    params.append(int(page_size) + 1)
+    return query, params
+
+
+def build_count_query(filters, pruning=False):
+    clauses, params = build_filters(filters, pruning)
+    where = f"where {' and '.join(clauses)}" if clauses else ""
+    return f"select count(*) as matching_stops from {LEDGER_TABLE} {where}", params
+
+
+def page_cursor(page, sort_column):
+    """The ``after`` value that continues past the last row of ``page``."""
+    last = page.iloc[-1]
+    return (None if sort_column == "id" else _plain(last[sort_column]), int(last["id"]))
+
+
+def _plain(value):
+    # pandas hands back NaN/NaT for SQL NULLs and numpy scalars for numbers
+    if value is None or value != value:
+        return None
+    return value.item() if hasattr(value, "item") else value
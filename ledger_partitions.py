@@ -0,0 +1,295 @@
+"""Partition maintenance for the date-partitioned digital_ledger (migration 0006).
+
+The ledger is range-partitioned on ``partition_date`` (``stop_date``, with
+undated stops on the rollups' UNKNOWN_DATE): ``p_unknown`` holds undated
+stops, one partition per month or year follows, and ``p_future`` catches
+everything past the last bound. Queries filtered on a date range read only
+the partitions the range overlaps.
+
+``maintain`` splits ``p_future`` so that partitions exist from the earliest
+stop up to ``--ahead`` periods past today; run it from cron before a period
+starts, while ``p_future`` is still empty and the split is a metadata change.
+``--archive-before`` moves every partition that ends on or before a date into
+a staging table, exports that to a gzip-compressed CSV and drops both. The
+rollup tables keep their counts of the archived stops, so rollup-backed
+insights still cover the full history, and an archive loads back with
+``python ledger_ingest.py <file>`` (under new ids)::
+
+    python ledger_partitions.py status
+    python ledger_partitions.py maintain --granularity month --ahead 3
+    python ledger_partitions.py maintain --archive-before 2015-01-01 --archive-dir ledger_archive
+"""
+import argparse
+import csv
+import datetime
+import gzip
+import os
+
+import pymysql.cursors
+
+from ledger_db import get_pool
+from ledger_schema import (LEDGER_COLUMNS, LEDGER_TABLE, PARTITIONS_MIGRATION, explain_query,
+                           migration_applied)
+
+UNKNOWN_PARTITION = "p_unknown"
+CATCH_ALL_PARTITION = "p_future"
+GRANULARITIES = ["month", "year"]
+PARTITIONS_AHEAD = 3            # periods created past the current one
+ARCHIVE_DIR = "ledger_archive"
+ARCHIVE_CHUNK_ROWS = 50_000
+
+PARTITIONS_QUERY = """
+    select partition_name, partition_description, table_rows, data_length, index_length
+    from information_schema.partitions
+    where table_schema = 'Traffic_Stops' and table_name = 'digital_ledger'
+    order by partition_ordinal_position
+"""
+
+
+# -------------------------------
+# Partition layout
+# -------------------------------
+def ledger_partitions(connection):
+    """One dict per partition in bound order: name, exclusive upper bound (None for MAXVALUE), rows, bytes."""
+    with connection.cursor() as cursor:
+        try:
+            # MySQL 8 caches table statistics for a day unless told otherwise
+            cursor.execute("set session information_schema_stats_expiry = 0")
+        except pymysql.MySQLError:
+            pass   # MySQL 5.7 has no statistics cache
+        cursor.execute(PARTITIONS_QUERY)
+        rows = cursor.fetchall()
+    connection.commit()
+    partitions = []
+    for name, description, table_rows, data_length, index_length in rows:
+        if name is None:
+            return []   # information_schema lists an unpartitioned table as one nameless row
+        bound = None
+        if description and description.upper() != "MAXVALUE":
+            bound = datetime.date.fromisoformat(description.strip("'"))
+        partitions.append({"partition": name, "less_than": bound, "rows": int(table_rows or 0),
+                           "bytes": int(data_length or 0) + int(index_length or 0)})
+    return partitions
+
+
+def _period_start(day, granularity):
+    return day.replace(month=1, day=1) if granularity == "year" else day.replace(day=1)
+
+
+def _next_period(start, granularity):
+    if granularity == "year":
+        return start.replace(year=start.year + 1)
+    return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+
+
+def partition_name(start, granularity):
+    return f"p{start:%Y}" if granularity == "year" else f"p{start:%Y%m}"
+
+
+def plan_partitions(partitions, first_stop, today, granularity="month", ahead=PARTITIONS_AHEAD):
+    """``(name, exclusive upper bound)`` of the partitions to split off ``p_future``.
+
+    New partitions start at the highest existing bound, or at the period of
+    the first dated stop on a freshly migrated table, and run ``ahead``
+    periods past the one containing ``today``.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    bounds = [p["less_than"] for p in partitions if p["partition"] != UNKNOWN_PARTITION and p["less_than"]]
+    start = max(bounds) if bounds else _period_start(first_stop or today, granularity)
+    end = _period_start(today, granularity)
+    for _ in range(ahead + 1):
+        end = _next_period(end, granularity)
+    planned = []
+    while start < end:
+        following = _next_period(_period_start(start, granularity), granularity)
+        planned.append((partition_name(start, granularity), following))
+        start = following
+    return planned
+
+
+def split_catch_all(connection, planned):
+    """Carve the planned partitions out of ``p_future``; costs a rewrite of the rows it already holds."""
+    if not planned:
+        return
+    definitions = [f"partition {name} values less than ('{bound.isoformat()}')" for name, bound in planned]
+    definitions.append(f"partition {CATCH_ALL_PARTITION} values less than (maxvalue)")
+    with connection.cursor() as cursor:
+        cursor.execute(f"alter table {LEDGER_TABLE} reorganize partition {CATCH_ALL_PARTITION} "
+                       f"into ({', '.join(definitions)})")
+
+
+def first_dated_stop(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f"select min(stop_date) from {LEDGER_TABLE} where stop_date is not null")
+        first = cursor.fetchone()[0]
+    connection.commit()
+    return first
+
+
+# -------------------------------
+# Archival
+# -------------------------------
+STAGING_EXISTS_QUERY = """
+    select count(*) from information_schema.tables
+    where table_schema = 'Traffic_Stops' and table_name = %s
+"""
+
+
+def staging_table(name):
+    return f"{LEDGER_TABLE}_archive_{name}"
+
+
+def stage_partition(connection, name):
+    """Move the rows of partition ``name`` into its own staging table; returns the table.
+
+    ``exchange partition`` swaps the partition with an empty, unpartitioned
+    copy of the ledger in one metadata operation, so stops committed during
+    the export land in the (now empty) partition instead of being lost. A
+    staging table left with rows by an interrupted run is returned as is.
+    """
+    staging = staging_table(name)
+    with connection.cursor() as cursor:
+        cursor.execute(STAGING_EXISTS_QUERY, (staging.split(".")[-1],))
+        if cursor.fetchone()[0]:
+            cursor.execute(f"select exists(select 1 from {staging})")
+            if cursor.fetchone()[0]:
+                return staging
+            cursor.execute(f"drop table {staging}")
+        cursor.execute(f"create table {staging} like {LEDGER_TABLE}")
+        cursor.execute(f"alter table {staging} remove partitioning")
+        cursor.execute(f"alter table {LEDGER_TABLE} exchange partition {name} with table {staging}")
+    return staging
+
+
+def _count_rows(connection, source):
+    with connection.cursor() as cursor:
+        cursor.execute(f"select count(*) from {source}")
+        count = cursor.fetchone()[0]
+    connection.commit()
+    return count
+
+
+def export_partition(connection, name, directory=ARCHIVE_DIR, chunk_rows=ARCHIVE_CHUNK_ROWS):
+    """Stream the staged rows of partition ``name`` to a gzip CSV; returns (path, rows).
+
+    The file is ``<directory>/digital_ledger_<name>.csv.gz``, numbered
+    ``-1``, ``-2`` ... when late stops of the same partition are archived on
+    a later run. It has the ingest column order plus ``id`` and is written
+    under a temporary name first, so a half-written archive is never
+    mistaken for a finished one.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"digital_ledger_{name}.csv.gz")
+    part = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"digital_ledger_{name}-{part}.csv.gz")
+        part += 1
+    columns = ["id", *LEDGER_COLUMNS]
+    exported = 0
+    with gzip.open(path + ".tmp", "wt", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(columns)
+        with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute(f"select {', '.join(columns)} from {staging_table(name)} order by id")
+            rows = cursor.fetchmany(chunk_rows)
+            while rows:
+                writer.writerows(rows)
+                exported += len(rows)
+                rows = cursor.fetchmany(chunk_rows)
+    connection.commit()
+    os.replace(path + ".tmp", path)
+    return path, exported
+
+
+def drop_empty_partition(connection, name):
+    """Drop partition ``name`` if it is empty; the write lock keeps a stop from arriving in between."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"lock tables {LEDGER_TABLE} write")
+        try:
+            cursor.execute(f"select exists(select 1 from {LEDGER_TABLE} partition ({name}))")
+            empty = not cursor.fetchone()[0]
+            if empty:
+                cursor.execute(f"alter table {LEDGER_TABLE} drop partition {name}")
+        finally:
+            cursor.execute("unlock tables")
+    return empty
+
+
+def archive_partitions(connection, before, directory=ARCHIVE_DIR, dry_run=False, log=print):
+    """Export and drop every dated partition whose range ends on or before ``before``.
+
+    Each partition is first exchanged into a staging table (``stage_partition``),
+    which is exported, counted against the export and only then dropped. The
+    emptied partition is dropped too, unless stops arrived in it since the
+    exchange; those are archived by the next run.
+    """
+    archived = []
+    for partition in ledger_partitions(connection):
+        name, bound = partition["partition"], partition["less_than"]
+        if name in (UNKNOWN_PARTITION, CATCH_ALL_PARTITION) or bound is None or bound > before:
+            continue
+        if dry_run:
+            log(f"would archive {name} (~{partition['rows']:,} rows)")
+            continue
+        staging = stage_partition(connection, name)
+        path, exported = export_partition(connection, name, directory)
+        if _count_rows(connection, staging) != exported:
+            log(f"{name}: export of {staging} is incomplete; table kept, archive it again later")
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(f"drop table {staging}")
+        log(f"archived {name}: {exported:,} rows to {path}")
+        if not drop_empty_partition(connection, name):
+            log(f"{name} received stops after it was staged; kept, archive it again later")
+            continue
+        archived.append(name)
+    return archived
+
+
+# -------------------------------
+# Scan sizes
+# -------------------------------
+def scan_size(connection, query, params=None):
+    """Partitions and estimated rows EXPLAIN expects ``query`` to read from the ledger."""
+    partitions, rows = set(), 0
+    for row in explain_query(connection, query, params):
+        if row.get("partitions"):
+            partitions.update(row["partitions"].split(","))
+        rows += int(row.get("rows") or 0)
+    return {"partitions": sorted(partitions), "rows": rows}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create and archive digital_ledger date partitions.")
+    parser.add_argument("command", choices=["status", "maintain"],
+                        help="list the partitions, or create upcoming ones (and archive old ones)")
+    parser.add_argument("--granularity", choices=GRANULARITIES, default="month",
+                        help="period of the partitions created now; existing ones are kept")
+    parser.add_argument("--ahead", type=int, default=PARTITIONS_AHEAD,
+                        help="periods to create past the current one")
+    parser.add_argument("--archive-before", type=datetime.date.fromisoformat, metavar="YYYY-MM-DD",
+                        help="export and drop the partitions ending on or before this date")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="print what would change only")
+    args = parser.parse_args(argv)
+
+    with get_pool().connection() as connection:
+        if not migration_applied(connection, PARTITIONS_MIGRATION):
+            parser.exit(1, "digital_ledger is not partitioned yet; run python ledger_schema.py first\n")
+        if args.command == "maintain":
+            planned = plan_partitions(ledger_partitions(connection), first_dated_stop(connection),
+                                      datetime.date.today(), args.granularity, args.ahead)
+            for name, bound in planned:
+                print(f"{'would create' if args.dry_run else 'creating'} {name} (before {bound})")
+            if not args.dry_run:
+                split_catch_all(connection, planned)
+            if args.archive_before is not None:
+                archive_partitions(connection, args.archive_before, args.archive_dir, args.dry_run)
+        for partition in ledger_partitions(connection):
+            print(f"{partition['partition']:>10}  < {partition['less_than'] or 'MAXVALUE'!s:<10}  "
+                  f"~{partition['rows']:>12,} rows  {partition['bytes'] / 1024 ** 2:>9.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
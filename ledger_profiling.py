@@ -0,0 +1,129 @@
+"""Latency, row and byte accounting for the dashboard's database and chart work.
+
+Every measurement is a ``(stage, name)`` pair: the stage is what was timed
+(``connection``, ``query``, ``fetch``, ``dataframe``, ``render``) and the name
+the insight or page it was done for. ``Profiler`` keeps a fixed-bucket
+latency histogram plus a window of recent samples for percentiles per pair,
+and an optional slow query log with the EXPLAIN plan of each slow query.
+"""
+import datetime
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from contextlib import contextmanager
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float("inf")]
+PERCENTILE_SAMPLES = 1000       # recent samples kept per (stage, name) for p50/p95/p99
+SLOW_QUERY_SECONDS = 1.0
+SLOW_QUERY_LOG_SIZE = 100
+
+SlowQuery = namedtuple("SlowQuery", "logged_at name seconds rows query params plan")
+
+
+class _Series:
+    def __init__(self):
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.buckets = [0] * len(HISTOGRAM_BUCKETS_MS)
+        self.samples = deque(maxlen=PERCENTILE_SAMPLES)
+
+    def add(self, seconds, rows, size):
+        self.calls += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.rows += rows or 0
+        self.bytes += size or 0
+        milliseconds = seconds * 1000
+        for position, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if milliseconds <= bound:
+                self.buckets[position] += 1
+                break
+        self.samples.append(seconds)
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Profiler:
+    """Thread-safe collector of per-stage timings and the slow query log."""
+
+    def __init__(self, slow_query_seconds=SLOW_QUERY_SECONDS):
+        self.slow_query_seconds = slow_query_seconds   # None turns the slow query log off
+        self._series = defaultdict(_Series)
+        self._slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+        self._lock = threading.Lock()
+
+    def record(self, stage, name, seconds, rows=None, size=None):
+        with self._lock:
+            self._series[(stage, name)].add(seconds, rows, size)
+
+    @contextmanager
+    def timer(self, stage, name):
+        """Time the block; set ``rows``/``bytes`` on the yielded dict to record them too."""
+        counts = {}
+        started = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            self.record(stage, name, time.perf_counter() - started, counts.get("rows"), counts.get("bytes"))
+
+    def is_slow(self, seconds):
+        return self.slow_query_seconds is not None and seconds >= self.slow_query_seconds
+
+    def log_slow_query(self, name, seconds, rows, query, params=None, explain=None):
+        """Keep a slow query, with the plan from ``explain()`` when one is given."""
+        plan = None
+        if explain is not None:
+            try:
+                plan = explain()
+            except Exception as e:   # a plan is nice to have, never worth failing the page
+                plan = [{"error": str(e)}]
+        with self._lock:
+            self._slow_queries.appendleft(SlowQuery(datetime.datetime.now(), name, seconds, rows,
+                                                    " ".join(query.split()), params, plan))
+
+    def slow_queries(self):
+        with self._lock:
+            return list(self._slow_queries)
+
+    def summary(self):
+        """One row per (stage, name) with call counts, percentiles and volume."""
+        with self._lock:
+            series = {key: (value.calls, value.total_seconds, value.max_seconds, value.rows,
+                            value.bytes, sorted(value.samples))
+                      for key, value in self._series.items()}
+        rows = []
+        for (stage, name), (calls, total, longest, row_count, size, ordered) in sorted(series.items()):
+            rows.append({
+                "stage": stage,
+                "name": name,
+                "calls": calls,
+                "p50_ms": round(_percentile(ordered, 0.50) * 1000, 2),
+                "p95_ms": round(_percentile(ordered, 0.95) * 1000, 2),
+                "p99_ms": round(_percentile(ordered, 0.99) * 1000, 2),
+                "max_ms": round(longest * 1000, 2),
+                "avg_ms": round(total / calls * 1000, 2) if calls else 0.0,
+                "rows": row_count,
+                "bytes": size,
+            })
+        return rows
+
+    def histogram(self, stage, name):
+        """``(bucket label, count)`` pairs of one series' latency histogram."""
+        with self._lock:
+            buckets = list(self._series[(stage, name)].buckets) if (stage, name) in self._series else []
+        labels = [f"≤{bound:g} ms" if bound != float("inf") else f">{HISTOGRAM_BUCKETS_MS[-2]:g} ms"
+                  for bound in HISTOGRAM_BUCKETS_MS]
+        return list(zip(labels, buckets))
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._slow_queries.clear()
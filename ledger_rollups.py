@@ -0,0 +1,470 @@
+"""Pre-aggregated rollups of digital_ledger, maintained incrementally.
+
+Two summary tables hold stop/search/arrest/drug counters:
+
+* ``ledger_rollup_demographics`` - month x country x violation x gender x race x age band
+* ``ledger_rollup_hourly``       - day x hour x stop outcome
+
+``refresh_rollups`` folds only the ledger rows added since the last refresh
+(tracked by the ``id`` watermark), so its cost scales with new stops, not with
+the size of the ledger. ``ROLLUP_QUERIES`` answers the dashboard insights from
+these tables instead of scanning the ledger.
+
+Run ``python ledger_rollups.py`` to catch the rollups up, or ``--rebuild`` to
+recompute them from scratch.
+"""
+import argparse
+import time
+
+from ledger_db import get_pool
+
+LEDGER_TABLE = "Traffic_Stops.digital_ledger"
+DEMOGRAPHIC_ROLLUP = "Traffic_Stops.ledger_rollup_demographics"
+HOURLY_ROLLUP = "Traffic_Stops.ledger_rollup_hourly"
+ROLLUP_STATE = "Traffic_Stops.ledger_rollup_state"
+
+REFRESH_BATCH_IDS = 500_000   # ledger ids folded per transaction
+
+# NOT NULL key columns store these in place of SQL NULL
+UNKNOWN_DATE = "1000-01-01"
+UNKNOWN_HOUR = -1
+UNKNOWN_AGE = -1
+
+# Lower bound of the age band a driver falls in. The cut points are the union
+# of every age grouping used by the insight queries, so each of them can be
+# answered exactly by ranges over age_from (e.g. "between 26 and 35" is
+# "age_from between 26 and 35"). Under-16s get 0 and unknown ages -1.
+AGE_FROM_SQL = f"""case
+        when driver_age is null then {UNKNOWN_AGE}
+        when driver_age < 16 then 0
+        when driver_age < 18 then 16
+        when driver_age < 25 then 18
+        when driver_age < 26 then 25
+        when driver_age < 30 then 26
+        when driver_age < 36 then 30
+        when driver_age < 46 then 36
+        when driver_age < 51 then 46
+        when driver_age < 61 then 51
+        else 61
+    end"""
+
+ROLLUP_TABLES_DDL = [
+    f"""create table if not exists {DEMOGRAPHIC_ROLLUP} (
+        stop_year smallint not null,
+        stop_month tinyint not null,
+        country_name varchar(50) not null,
+        violation varchar(50) not null,
+        driver_gender char(1) not null,
+        driver_race varchar(50) not null,
+        age_from smallint not null,
+        stops int unsigned not null default 0,
+        searches int unsigned not null default 0,
+        arrests int unsigned not null default 0,
+        drug_stops int unsigned not null default 0,
+        duration_minutes decimal(18,1) not null default 0,
+        duration_stops int unsigned not null default 0,
+        primary key (stop_year, stop_month, country_name, violation, driver_gender, driver_race, age_from))""",
+    f"""create table if not exists {HOURLY_ROLLUP} (
+        stop_date date not null,
+        stop_hour tinyint not null,
+        stop_outcome varchar(50) not null,
+        stops int unsigned not null default 0,
+        vehicle_stops int unsigned not null default 0,
+        arrests int unsigned not null default 0,
+        drug_stops int unsigned not null default 0,
+        primary key (stop_date, stop_hour, stop_outcome))""",
+    f"""create table if not exists {ROLLUP_STATE} (
+        name varchar(50) primary key,
+        last_id bigint unsigned not null default 0,
+        refreshed_at timestamp null)""",
+    f"insert ignore into {ROLLUP_STATE} (name, last_id) values ('ledger', 0)",
+]
+
+_FOLD_DEMOGRAPHICS = f"""
+    insert into {DEMOGRAPHIC_ROLLUP}
+        (stop_year, stop_month, country_name, violation, driver_gender, driver_race, age_from,
+         stops, searches, arrests, drug_stops, duration_minutes, duration_stops)
+    select coalesce(year(stop_date), 0),
+           coalesce(month(stop_date), 0),
+           coalesce(country_name, ''),
+           coalesce(violation, ''),
+           coalesce(driver_gender, ''),
+           coalesce(driver_race, ''),
+           {AGE_FROM_SQL},
+           count(*),
+           count(case when search_conducted=TRUE then 1 end),
+           count(case when is_arrested=TRUE then 1 end),
+           count(case when drugs_related_stop=TRUE then 1 end),
+           coalesce(sum(case
+                            when stop_duration='0-15 Min' then 7.5
+                            when stop_duration='16-30 Min' then 23
+                            when stop_duration='30+ Min' then 35
+                        end), 0),
+           count(case when stop_duration in ('0-15 Min', '16-30 Min', '30+ Min') then 1 end)
+    from {LEDGER_TABLE}
+    where id > %s and id <= %s
+    group by 1, 2, 3, 4, 5, 6, 7
+    on duplicate key update
+        stops = stops + values(stops),
+        searches = searches + values(searches),
+        arrests = arrests + values(arrests),
+        drug_stops = drug_stops + values(drug_stops),
+        duration_minutes = duration_minutes + values(duration_minutes),
+        duration_stops = duration_stops + values(duration_stops)
+"""
+
+_FOLD_HOURLY = f"""
+    insert into {HOURLY_ROLLUP}
+        (stop_date, stop_hour, stop_outcome, stops, vehicle_stops, arrests, drug_stops)
+    select coalesce(stop_date, '{UNKNOWN_DATE}'),
+           coalesce(hour(stop_time), {UNKNOWN_HOUR}),
+           coalesce(stop_outcome, ''),
+           count(*),
+           count(vehicle_number),
+           count(case when is_arrested=TRUE then 1 end),
+           count(case when drugs_related_stop=TRUE then 1 end)
+    from {LEDGER_TABLE}
+    where id > %s and id <= %s
+    group by 1, 2, 3
+    on duplicate key update
+        stops = stops + values(stops),
+        vehicle_stops = vehicle_stops + values(vehicle_stops),
+        arrests = arrests + values(arrests),
+        drug_stops = drug_stops + values(drug_stops)
+"""
+
+
+def refresh_rollups(connection, batch_ids=REFRESH_BATCH_IDS):
+    """Fold ledger rows added since the last refresh into the rollups.
+
+    The watermark row is locked for the duration of each batch, so concurrent
+    refreshers (dashboard sessions, ingestion jobs) never fold a row twice.
+    Returns the number of ledger ids folded.
+    """
+    folded = 0
+    while True:
+        connection.begin()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"select last_id from {ROLLUP_STATE} where name='ledger' for update")
+                last_id = cursor.fetchone()[0]
+                cursor.execute(f"select max(id) from {LEDGER_TABLE}")
+                max_id = cursor.fetchone()[0] or 0
+                if max_id <= last_id:
+                    connection.rollback()
+                    return folded
+                upto = min(max_id, last_id + batch_ids)
+                cursor.execute(_FOLD_DEMOGRAPHICS, (last_id, upto))
+                cursor.execute(_FOLD_HOURLY, (last_id, upto))
+                cursor.execute(f"update {ROLLUP_STATE} set last_id=%s, refreshed_at=now() where name='ledger'",
+                               (upto,))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        folded += upto - last_id
+
+
+def rebuild_rollups(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f"truncate table {DEMOGRAPHIC_ROLLUP}")
+        cursor.execute(f"truncate table {HOURLY_ROLLUP}")
+        cursor.execute(f"update {ROLLUP_STATE} set last_id=0, refreshed_at=null where name='ledger'")
+    connection.commit()
+    return refresh_rollups(connection)
+
+
+def rollups_ready(connection):
+    """True once the rollup tables exist and hold at least one refresh."""
+    with connection.cursor() as cursor:
+        cursor.execute("""select count(*) from information_schema.tables
+                          where table_schema='Traffic_Stops' and table_name='ledger_rollup_state'""")
+        if not cursor.fetchone()[0]:
+            return False
+        cursor.execute(f"select last_id from {ROLLUP_STATE} where name='ledger'")
+        row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+# -------------------------------
+# Insight queries answered from the rollups
+# -------------------------------
+# Same names and result columns as the dashboard's ledger queries. The two
+# vehicle_number insights are not here: they need per-vehicle detail.
+_NIGHT_HOURS = "stop_hour >= 18 or stop_hour between 0 and 5"
+
+ROLLUP_QUERIES = {
+    "Driver age group having high arrest rate": f"""
+        select case
+                   when age_from between 18 and 25 then '18-25'
+                   when age_from between 26 and 35 then '26-35'
+                   when age_from between 36 and 45 then '36-45'
+                   when age_from between 46 and 60 then '46-60'
+                   else '60+'
+               end as age_group,
+               sum(stops) as total_stops,
+               sum(arrests) as arrests,
+               round(sum(arrests)/sum(stops)*100.0,2) as arrest_rate
+        from {DEMOGRAPHIC_ROLLUP}
+        group by age_group
+        order by arrest_rate desc
+        limit 1
+    """,
+
+    "Gender distribution of driver stopped in each country": f"""
+        select nullif(country_name,'') as country_name,
+               sum(case when driver_gender='M' then stops else 0 end) as MALE,
+               sum(case when driver_gender='F' then stops else 0 end) as FEMALE
+        from {DEMOGRAPHIC_ROLLUP}
+        group by country_name
+    """,
+
+    "Gender and race combination having highest arrest rate": f"""
+        select nullif(driver_race,'') as driver_race,
+               nullif(driver_gender,'') as driver_gender,
+               round(sum(searches)/sum(stops)*100.0, 2) as search_rate
+        from {DEMOGRAPHIC_ROLLUP}
+        group by driver_race, driver_gender
+        order by search_rate DESC
+        limit 1
+    """,
+
+    "Time of the day having most traffic stop": f"""
+        select nullif(stop_hour,{UNKNOWN_HOUR}) as hour_of_the_day,
+               sum(stops) as stop_count
+        from {HOURLY_ROLLUP}
+        group by stop_hour
+        order by stop_count DESC
+        limit 1
+    """,
+
+    "Average stop duration for different violation": f"""
+        select nullif(violation,'') as violation,
+               sum(duration_minutes)/nullif(sum(duration_stops),0) as average_stop_duration
+        from {DEMOGRAPHIC_ROLLUP}
+        group by violation
+    """,
+
+    "Are the stops during the night are more likely to lead to arrests": f"""
+        select case when {_NIGHT_HOURS} then 'NIGHT' else 'DAY' end as stop_period,
+               sum(stops) as total_stops,
+               sum(arrests) as arrests,
+               round(sum(arrests)/sum(stops)*100.0,2) as arrest_rate_percent
+        from {HOURLY_ROLLUP}
+        group by stop_period
+    """,
+
+    "Violation most associated with search or arrest": f"""
+        select nullif(violation,'') as violation,
+               sum(searches) as count_of_the_search,
+               sum(arrests) as count_of_the_arrest,
+               round(sum(searches)/sum(stops)*100.0,2) as search_rate,
+               round(sum(arrests)/sum(stops)*100.0,2) as arrest_rate,
+               greatest(
+                   round(sum(searches)/sum(stops)*100.0,2),
+                   round(sum(arrests)/sum(stops)*100.0,2)
+               ) as maximum_arrest_or_search_rate
+        from {DEMOGRAPHIC_ROLLUP}
+        group by violation
+        order by maximum_arrest_or_search_rate desc
+        limit 1
+    """,
+
+    "Violation most common among young driver (i.e) less than 25": f"""
+        select nullif(violation,'') as violation,
+               sum(stops) as counts_of_driver
+        from {DEMOGRAPHIC_ROLLUP}
+        where age_from between 0 and 24
+        group by violation
+        order by counts_of_driver desc
+        limit 1
+    """,
+
+    "Violation that rarely result in search or arrest": f"""
+        select nullif(violation,'') as violation,
+               sum(searches) as count_of_the_search,
+               sum(arrests) as count_of_the_arrest,
+               round(sum(searches)/sum(stops)*100.0,2) as search_rate,
+               round(sum(arrests)/sum(stops)*100.0,2) as arrest_rate,
+               least(
+                   round(sum(searches)/sum(stops)*100.0,2),
+                   round(sum(arrests)/sum(stops)*100.0,2)
+               ) as rarely_arrest_or_search_rate
+        from {DEMOGRAPHIC_ROLLUP}
+        group by violation
+        order by rarely_arrest_or_search_rate asc
+        limit 1
+    """,
+
+    "Country reporting the highest rate of drug related stops": f"""
+        select nullif(country_name,'') as country_name,
+               sum(stops) as tot_counts,
+               round(sum(drug_stops)/sum(stops)*100.0,2) as drugs_related_stop_rates
+        from {DEMOGRAPHIC_ROLLUP}
+        group by country_name
+        order by drugs_related_stop_rates desc
+        limit 1
+    """,
+
+    "Arrest rate by country and violation": f"""
+        select nullif(country_name,'') as country_name,
+               nullif(violation,'') as violation,
+               sum(stops) as tot_count,
+               round(sum(arrests)/sum(stops)*100.0,2) as arrest_rate
+        from {DEMOGRAPHIC_ROLLUP}
+        group by country_name, violation
+    """,
+
+    "Country having most stop with search conducted": f"""
+        select nullif(country_name,'') as country_name,
+               sum(searches) as no_of_counts
+        from {DEMOGRAPHIC_ROLLUP}
+        group by country_name
+        order by no_of_counts desc
+        limit 1
+    """,
+
+    "Top 5 violation with highest arrest rate": f"""
+        select nullif(violation,'') as violation,
+               sum(stops) as total,
+               round(sum(arrests)/sum(stops)*100,2) as arrest_rate
+        from {DEMOGRAPHIC_ROLLUP}
+        group by violation
+        order by arrest_rate desc
+        limit 5
+    """,
+
+    "Driver demographic[Age,Gender,Race] by country": f"""
+        select nullif(country_name,'') as country_name,
+               sum(stops) as tot_driver,
+               sum(case when driver_gender='M' then stops else 0 end) as Male_driver,
+               sum(case when driver_gender='F' then stops else 0 end) as Female_driver,
+               sum(case when driver_race='Asian' then stops else 0 end) as Asian_driver,
+               sum(case when driver_race='Black' then stops else 0 end) as Black_driver,
+               sum(case when driver_race='Hispanic' then stops else 0 end) as Hispanic_driver,
+               sum(case when driver_race='Other' then stops else 0 end) as Other_people,
+               sum(case when driver_race='White' then stops else 0 end) as White_driver,
+               sum(case when age_from between 0 and 29 then stops else 0 end) as less_than_thirty,
+               sum(case when age_from between 30 and 50 then stops else 0 end) as between_thirty_and_fifty,
+               sum(case when age_from > 50 then stops else 0 end) as greater_than_fifty
+        from {DEMOGRAPHIC_ROLLUP}
+        group by country_name
+    """,
+
+    "Violation with high search and arrest rate": f"""
+        select *
+        from (
+            select nullif(violation,'') as violation,
+                   sum(stops) as total_stops,
+                   sum(searches) as total_searches,
+                   sum(arrests) as total_arrests,
+                   round(sum(searches)/sum(stops)*100,2) as search_rate_percent,
+                   round(sum(arrests)/sum(stops)*100,2) as arrest_rate_percent
+            from {DEMOGRAPHIC_ROLLUP}
+            group by violation
+        ) as sub
+        where search_rate_percent>20 or arrest_rate_percent>20
+        order by search_rate_percent desc, arrest_rate_percent desc
+    """,
+
+    "Number of stops by year,month,hour of the day": f"""
+        select year(nullif(stop_date,'{UNKNOWN_DATE}')) as STOP_YEAR,
+               month(nullif(stop_date,'{UNKNOWN_DATE}')) as STOP_MONTH,
+               nullif(stop_hour,{UNKNOWN_HOUR}) as STOP_HOUR,
+               sum(stops) as total_stops
+        from {HOURLY_ROLLUP}
+        group by STOP_YEAR, STOP_MONTH, STOP_HOUR
+        order by STOP_YEAR, STOP_MONTH, STOP_HOUR
+    """,
+
+    "Driver violation trend based on race & age": f"""
+        select case
+                   when age_from between 16 and 25 then '16-25'
+                   when age_from between 26 and 35 then '26-35'
+                   when age_from between 36 and 50 then '36-50'
+                   when age_from > 50 then '51+'
+                   else 'Unknown'
+               end as age_group,
+               nullif(driver_race,'') as driver_race,
+               sum(stops) as total_violations
+        from {DEMOGRAPHIC_ROLLUP}
+        where age_from <> {UNKNOWN_AGE}
+        group by age_group, driver_race
+        order by age_group, driver_race
+    """,
+
+    "Yearly breakdown of stops and arrests by country": f"""
+        select stats.stop_year,
+               stats.country_name,
+               stats.total_stops,
+               stats.total_arrests,
+               round(total_arrests/NULLIF(total_stops,0)*100.0, 2) as arrest_rate_percent,
+               sum(total_arrests) over(partition by country_name order by stop_year) as cumulative_arrests
+        from (
+            select nullif(stop_year,0) as stop_year,
+                   nullif(country_name,'') as country_name,
+                   sum(stops) as total_stops,
+                   sum(arrests) as total_arrests
+            from {DEMOGRAPHIC_ROLLUP}
+            group by {DEMOGRAPHIC_ROLLUP}.stop_year, {DEMOGRAPHIC_ROLLUP}.country_name
+        ) as stats
+        order by stats.country_name, stats.stop_year
+    """,
+
+    "KEY METRICES: totals": f"""
+        select sum(stops) as total_stops,
+               sum(case when stop_outcome like '%arrest%' then stops else 0 end) as arrests,
+               sum(case when stop_outcome like '%warning%' then stops else 0 end) as warnings,
+               sum(drug_stops) as drug_related
+        from {HOURLY_ROLLUP}
+    """,
+
+    "KEY METRICES: outcomes": f"""
+        select stop_outcome,
+               sum(stops) as count
+        from {HOURLY_ROLLUP}
+        where stop_outcome <> ''
+        group by stop_outcome
+    """,
+
+    "KEY METRICES: genders": f"""
+        select driver_gender as Gender,
+               sum(stops) as Count
+        from {DEMOGRAPHIC_ROLLUP}
+        where driver_gender <> ''
+        group by driver_gender
+        order by Count desc
+    """,
+
+    "KEY METRICES: stops per month": f"""
+        select concat(stop_year,'-',lpad(stop_month,2,'0')) as stop_date,
+               sum(stops) as Counts
+        from {DEMOGRAPHIC_ROLLUP}
+        where stop_year <> 0
+        group by {DEMOGRAPHIC_ROLLUP}.stop_year, {DEMOGRAPHIC_ROLLUP}.stop_month
+        order by 1
+    """,
+
+    "KEY METRICES: day and hour": f"""
+        select dayname(stop_date) as stop_day,
+               stop_hour,
+               sum(vehicle_stops) as stops
+        from {HOURLY_ROLLUP}
+        where stop_date <> '{UNKNOWN_DATE}' and stop_hour <> {UNKNOWN_HOUR}
+        group by stop_day, stop_hour
+    """,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the digital_ledger rollup tables.")
+    parser.add_argument("--rebuild", action="store_true", help="recompute the rollups from scratch")
+    args = parser.parse_args(argv)
+    started = time.perf_counter()
+    with get_pool().connection() as connection:
+        folded = rebuild_rollups(connection) if args.rebuild else refresh_rollups(connection)
+    print(f"folded {folded:,} ledger ids into the rollups in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
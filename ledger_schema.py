@@ -0,0 +1,212 @@
+"""Schema migrations for Traffic_Stops.digital_ledger.
+
+Run ``python ledger_schema.py`` to apply pending migrations, or
+``python ledger_schema.py --dry-run`` to list them without touching the table.
+``--explain-report report.md`` also EXPLAINs every dashboard query before and
+after migrating and writes the comparison to ``report.md``.
+"""
+import argparse
+
+from insight_queries import insight_catalog
+from ledger_db import get_pool
+from ledger_rollups import AGE_FROM_SQL, ROLLUP_TABLES_DDL, UNKNOWN_DATE
+
+LEDGER_TABLE = "Traffic_Stops.digital_ledger"
+MIGRATIONS_TABLE = "Traffic_Stops.schema_migrations"
+
+# Columns written by ingestion with their types, in the order of Traffic_Stops.csv and the
+# original create table
+LEDGER_COLUMN_TYPES = [
+    ("stop_date", "date"),
+    ("stop_time", "time"),
+    ("country_name", "varchar(50)"),
+    ("driver_gender", "char(1)"),
+    ("driver_age_raw", "int"),
+    ("driver_age", "int"),
+    ("driver_race", "varchar(50)"),
+    ("violation_raw", "varchar(50)"),
+    ("violation", "varchar(50)"),
+    ("search_conducted", "boolean"),
+    ("search_type", "varchar(50)"),
+    ("stop_outcome", "varchar(50)"),
+    ("is_arrested", "boolean"),
+    ("stop_duration", "varchar(20)"),
+    ("drugs_related_stop", "boolean"),
+    ("vehicle_number", "varchar(15)"),
+]
+LEDGER_COLUMNS = [column for column, _ in LEDGER_COLUMN_TYPES]
+
+# Widest value each text column takes, for validating records before they are inserted
+LEDGER_TEXT_WIDTHS = {column: int(sql_type[sql_type.index("(") + 1:-1])
+                      for column, sql_type in LEDGER_COLUMN_TYPES if sql_type.startswith(("varchar", "char"))}
+
+# The table as the project notebook created it; the migrations below build on it
+LEDGER_TABLE_DDL = (f"create table if not exists {LEDGER_TABLE} (\n    "
+                    + ",\n    ".join(f"{column} {sql_type}" for column, sql_type in LEDGER_COLUMN_TYPES)
+                    + ")")
+
+# Shared by bulk ingestion and real-time stop logging
+INSERT_QUERY = (f"insert into {LEDGER_TABLE} ({', '.join(LEDGER_COLUMNS)}) "
+                f"values ({', '.join(['%s'] * len(LEDGER_COLUMNS))})")
+
+# (name, statements) applied in order; never edit a migration once it has shipped
+MIGRATIONS = [
+    ("0001_add_id_primary_key", [
+        # Unique, ever-increasing row key: keyset pagination tie-breaker and ingest watermark
+        f"alter table {LEDGER_TABLE} add column id bigint unsigned not null auto_increment primary key first",
+    ]),
+    ("0002_full_table_sort_indexes", [
+        # InnoDB appends the primary key to secondary indexes, so these serve (column, id) seeks
+        f"create index idx_ledger_stop_date on {LEDGER_TABLE} (stop_date)",
+        f"create index idx_ledger_vehicle_number on {LEDGER_TABLE} (vehicle_number)",
+    ]),
+    ("0003_rollup_tables", ROLLUP_TABLES_DDL),
+    ("0004_generated_columns", [
+        # Stored, so they are computed once on insert and can be indexed
+        f"""alter table {LEDGER_TABLE}
+            add column stop_year smallint as (year(stop_date)) stored,
+            add column stop_month tinyint as (month(stop_date)) stored,
+            add column stop_hour tinyint as (hour(stop_time)) stored,
+            add column age_from smallint as ({AGE_FROM_SQL}) stored""",
+    ]),
+    ("0005_insight_indexes", [
+        # Leading equality/grouping columns first, trailing flags make the indexes covering
+        f"create index idx_ledger_drugs_vehicle on {LEDGER_TABLE} (drugs_related_stop, vehicle_number)",
+        f"create index idx_ledger_search_vehicle on {LEDGER_TABLE} (search_conducted, vehicle_number)",
+        f"""create index idx_ledger_country_violation on {LEDGER_TABLE}
+            (country_name, violation, is_arrested, search_conducted, drugs_related_stop)""",
+        f"create index idx_ledger_violation_flags on {LEDGER_TABLE} (violation, search_conducted, is_arrested)",
+        f"create index idx_ledger_year_month_hour on {LEDGER_TABLE} (stop_year, stop_month, stop_hour)",
+        f"create index idx_ledger_hour_arrest on {LEDGER_TABLE} (stop_hour, is_arrested)",
+        f"create index idx_ledger_country_year on {LEDGER_TABLE} (country_name, stop_year, is_arrested)",
+        f"create index idx_ledger_age_race on {LEDGER_TABLE} (age_from, driver_race, is_arrested)",
+        f"create index idx_ledger_race_gender on {LEDGER_TABLE} (driver_race, driver_gender, search_conducted)",
+        f"create index idx_ledger_age_violation on {LEDGER_TABLE} (driver_age, violation)",
+    ]),
+    ("0006_partition_by_stop_date", [
+        # Every unique key of a partitioned table must contain the partitioning column, and
+        # primary key columns cannot be NULL: stops without a date get the rollups' UNKNOWN_DATE
+        f"""alter table {LEDGER_TABLE}
+            add column partition_date date as (coalesce(stop_date, '{UNKNOWN_DATE}')) stored not null,
+            drop primary key,
+            add primary key (id, partition_date)""",
+        # Undated stops plus a catch-all to start with; ledger_partitions.py splits the
+        # catch-all into months or years (range columns bounds must be literals: UNKNOWN_DATE + 1 day)
+        f"""alter table {LEDGER_TABLE} partition by range columns (partition_date) (
+            partition p_unknown values less than ('1000-01-02'),
+            partition p_future values less than (maxvalue))""",
+    ]),
+]
+
+GENERATED_COLUMNS_MIGRATION = "0004_generated_columns"
+PARTITIONS_MIGRATION = "0006_partition_by_stop_date"
+
+
+def applied_migrations(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f"""create table if not exists {MIGRATIONS_TABLE} (
+            name varchar(100) primary key,
+            applied_at timestamp not null default current_timestamp)""")
+        cursor.execute(f"select name from {MIGRATIONS_TABLE}")
+        return {row[0] for row in cursor.fetchall()}
+
+
+def migration_applied(connection, name):
+    with connection.cursor() as cursor:
+        cursor.execute("""select count(*) from information_schema.tables
+                          where table_schema='Traffic_Stops' and table_name='schema_migrations'""")
+        if not cursor.fetchone()[0]:
+            return False
+        cursor.execute(f"select count(*) from {MIGRATIONS_TABLE} where name=%s", (name,))
+        return bool(cursor.fetchone()[0])
+
+
+def pending_migrations(connection):
+    done = applied_migrations(connection)
+    return [(name, statements) for name, statements in MIGRATIONS if name not in done]
+
+
+def migrate(connection, dry_run=False, log=print):
+    """Apply every pending migration in order and return their names."""
+    pending = pending_migrations(connection)
+    for name, statements in pending:
+        log(f"{'would apply' if dry_run else 'applying'} {name}")
+        if dry_run:
+            for statement in statements:
+                log(f"    {statement};")
+            continue
+        with connection.cursor() as cursor:
+            # DDL commits implicitly, so record each migration right after it succeeds
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute(f"insert into {MIGRATIONS_TABLE} (name) values (%s)", (name,))
+        connection.commit()
+    if not pending:
+        log("digital_ledger schema is up to date")
+    return [name for name, _ in pending]
+
+
+# -------------------------------
+# EXPLAIN report
+# -------------------------------
+def explain_query(connection, query, params=None):
+    """The EXPLAIN rows for ``query`` as dicts keyed by EXPLAIN column name."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"explain {query}", params)
+        columns = [desc[0] for desc in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def summarize_plan(plan):
+    """One line per plan: access type and index per table, plus estimated rows read."""
+    steps = [f"{row.get('table')}: {row.get('type') or '-'}/{row.get('key') or 'no index'}" for row in plan]
+    rows = sum(int(row.get("rows") or 0) for row in plan)
+    return "; ".join(steps), rows
+
+
+def explain_catalog(connection, queries):
+    report = {}
+    for name, query in queries.items():
+        try:
+            report[name] = summarize_plan(explain_query(connection, query))
+        except Exception as e:
+            report[name] = (f"error: {e}", None)
+    return report
+
+
+def format_explain_report(before, after):
+    lines = [
+        "# digital_ledger EXPLAIN report",
+        "",
+        "| Query | Rows examined before | Rows examined after | Plan before | Plan after |",
+        "|---|---:|---:|---|---|",
+    ]
+    for name in before:
+        plan_before, rows_before = before[name]
+        plan_after, rows_after = after.get(name, ("-", None))
+        lines.append(f"| {name} | {rows_before if rows_before is not None else '-'} | "
+                     f"{rows_after if rows_after is not None else '-'} | {plan_before} | {plan_after} |")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="list pending migrations only")
+    parser.add_argument("--explain-report", metavar="PATH",
+                        help="write a before/after EXPLAIN comparison of the dashboard queries to PATH")
+    args = parser.parse_args(argv)
+    with get_pool().connection() as connection:
+        if args.explain_report:
+            before = explain_catalog(connection, insight_catalog(
+                generated_columns=migration_applied(connection, GENERATED_COLUMNS_MIGRATION)))
+        migrate(connection, dry_run=args.dry_run)
+        if args.explain_report:
+            after = explain_catalog(connection, insight_catalog(
+                generated_columns=migration_applied(connection, GENERATED_COLUMNS_MIGRATION)))
+            with open(args.explain_report, "w", encoding="utf-8") as report:
+                report.write(format_explain_report(before, after))
+            print(f"EXPLAIN report written to {args.explain_report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Suspect vehicle watchlist and alert rules, checked against every new stop.
+
+``WatchlistEngine`` subscribes to ``ledger_live.LedgerDeltaPoller``, so each
+newly ingested stop is checked once, in constant time, instead of re-running
+the GROUP BY vehicle_number insights over the whole ledger:
+
+* stops of a flagged vehicle raise a ``watchlist`` alert;
+* ``RepeatRule`` raises an alert when a vehicle collects N matching stops
+  (e.g. searches) within a rolling window of days.
+
+Flagged vehicles are seeded from the "Top 10 vehicle number related to drug
+related stop" and "Frequently searched vehicle" insights and can be added by hand.
+"""
+import bisect
+import datetime
+import hashlib
+import math
+import threading
+from collections import defaultdict, deque, namedtuple
+
+from insight_queries import INSIGHT_QUERIES
+from ledger_schema import LEDGER_TABLE
+
+MAX_ALERTS = 500                 # most recent alerts kept in memory
+EXPECTED_WATCHLIST_SIZE = 100_000
+BLOOM_FALSE_POSITIVE_RATE = 0.001
+SEED_QUERIES = {
+    "Top drug-related stop vehicle": INSIGHT_QUERIES["Top 10 vehicle number related to drug related stop"],
+    "Frequently searched vehicle": INSIGHT_QUERIES["Frequently searched vehicle"],
+}
+
+Alert = namedtuple("Alert", "raised_at rule vehicle_number stop_id stop_date detail")
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (no false negatives)."""
+
+    def __init__(self, capacity=EXPECTED_WATCHLIST_SIZE, error_rate=BLOOM_FALSE_POSITIVE_RATE):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RepeatRule:
+    """Alert when a vehicle has ``threshold`` matching stops within ``window_days``."""
+
+    def __init__(self, name, column, threshold, window_days):
+        self.name = name
+        self.column = column          # stop flag the rule counts, e.g. search_conducted
+        self.threshold = threshold
+        self.window_days = window_days
+        self._dates = defaultdict(list)    # vehicle_number -> sorted stop dates inside the window
+        self._newest = None                # newest stop date recorded, which the window trails
+
+    def _record(self, vehicle_number, stop_date):
+        # Stops can arrive back-dated (late posts, CSV ingestion), so dates are kept sorted
+        if self._newest is None or stop_date > self._newest:
+            self._newest = stop_date
+            self._prune()
+        cutoff = self._newest - datetime.timedelta(days=self.window_days)
+        if stop_date <= cutoff:
+            return 0   # older than the window: the stops around it were already forgotten
+        dates = self._dates[vehicle_number]
+        bisect.insort(dates, stop_date)
+        del dates[:bisect.bisect_right(dates, cutoff)]
+        return self._count_around(dates, stop_date)
+
+    def _count_around(self, dates, stop_date):
+        # Most dates in one window of window_days that contains stop_date
+        window = datetime.timedelta(days=self.window_days)
+        first = bisect.bisect_right(dates, stop_date - window)
+        best = 0
+        for start in range(first, bisect.bisect_right(dates, stop_date)):
+            best = max(best, bisect.bisect_left(dates, dates[start] + window) - start)
+        return best
+
+    def _prune(self):
+        # Once per new newest stop day: forget vehicles with no stop left inside the window
+        cutoff = self._newest - datetime.timedelta(days=self.window_days)
+        for vehicle_number in [v for v, dates in self._dates.items() if not dates or dates[-1] <= cutoff]:
+            del self._dates[vehicle_number]
+
+    def seed(self, vehicle_number, stop_date):
+        self._record(vehicle_number, stop_date)
+
+    def check(self, stop):
+        if stop[self.column] != 1 or stop["vehicle_number"] is None or stop["stop_date"] is None:
+            return None
+        count = self._record(stop["vehicle_number"], stop["stop_date"])
+        if count >= self.threshold:
+            return f"{count} {self.name} in {self.window_days} days"
+        return None
+
+
+class WatchlistEngine:
+    """Flagged-vehicle set plus repeat rules, fed by the ledger delta poller."""
+
+    def __init__(self, rules=None, capacity=EXPECTED_WATCHLIST_SIZE):
+        self.rules = rules if rules is not None else [
+            RepeatRule("searches", "search_conducted", threshold=3, window_days=30),
+            RepeatRule("drug-related stops", "drugs_related_stop", threshold=2, window_days=30),
+        ]
+        self._bloom = BloomFilter(capacity)
+        self._flagged = {}            # vehicle_number -> reason it was flagged
+        self.alerts = deque(maxlen=MAX_ALERTS)
+        self.stops_checked = 0
+        self._lock = threading.Lock()
+
+    def flag(self, vehicle_number, reason="manual entry"):
+        vehicle_number = vehicle_number.strip()
+        if not vehicle_number:
+            return
+        with self._lock:
+            self._bloom.add(vehicle_number)
+            self._flagged.setdefault(vehicle_number, reason)
+
+    def unflag(self, vehicle_number):
+        # A Bloom filter cannot forget, so the exact set alone decides membership
+        with self._lock:
+            self._flagged.pop(vehicle_number, None)
+
+    def is_flagged(self, vehicle_number):
+        # The Bloom filter rejects almost every clean vehicle without touching the dict
+        return vehicle_number in self._bloom and vehicle_number in self._flagged
+
+    def flagged(self):
+        with self._lock:
+            return dict(self._flagged)
+
+    def seed(self, cursor, watermark):
+        # Only stops up to the poller's watermark: the ones above it arrive through fold()
+        for reason, query in SEED_QUERIES.items():
+            cursor.execute(query)
+            for row in cursor.fetchall():
+                if row[0]:
+                    self.flag(row[0], reason)
+        # Rebuild the rule windows from recent stops only (an index range on stop_date)
+        window = max((rule.window_days for rule in self.rules), default=0)
+        cursor.execute(f"select max(stop_date) from {LEDGER_TABLE} where id <= %s", (watermark,))
+        latest = cursor.fetchone()[0]
+        if latest is None or not window:
+            return
+        columns = sorted({rule.column for rule in self.rules})
+        cursor.execute(
+            f"""select vehicle_number, stop_date, {', '.join(columns)} from {LEDGER_TABLE}
+                where stop_date > %s and id <= %s and vehicle_number is not null
+                order by stop_date""",
+            (latest - datetime.timedelta(days=window), watermark))
+        for row in cursor.fetchall():
+            flags = dict(zip(columns, row[2:]))
+            for rule in self.rules:
+                if flags[rule.column] == 1:
+                    rule.seed(row[0], row[1])
+
+    def fold(self, rows):
+        raised = datetime.datetime.now()
+        with self._lock:
+            for stop in rows:
+                self.stops_checked += 1
+                vehicle_number = stop["vehicle_number"]
+                if vehicle_number is not None and self.is_flagged(vehicle_number):
+                    self.alerts.appendleft(Alert(raised, "watchlist", vehicle_number, stop["id"],
+                                                 stop["stop_date"], self._flagged[vehicle_number]))
+                for rule in self.rules:
+                    detail = rule.check(stop)
+                    if detail:
+                        self.alerts.appendleft(Alert(raised, rule.name, vehicle_number, stop["id"],
+                                                     stop["stop_date"], detail))
+
+    def recent_alerts(self, limit=100):
+        with self._lock:
+            return list(self.alerts)[:limit]
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+
+RESULT_CACHE_TTL = 600          # seconds a cached result stays valid
+RESULT_CACHE_MAX_ENTRIES = 64   # least recently used results are dropped past this
+VERSION_CHECK_SECONDS = 5       # how often the ledger version is re-read
+
+
+class ResultCache:
+    """TTL + LRU cache of query results, invalidated when the ledger changes.
+
+    Entries are keyed by query name and parameters. ``version_probe`` is a
+    zero-argument callable returning a fingerprint of ``digital_ledger``; when
+    the fingerprint changes every cached result is dropped.
+    """
+
+    def __init__(self, version_probe=None, ttl=RESULT_CACHE_TTL,
+                 max_entries=RESULT_CACHE_MAX_ENTRIES,
+                 version_check_seconds=VERSION_CHECK_SECONDS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_check_seconds = version_check_seconds
+        self._version_probe = version_probe
+        self._version = None
+        self._version_checked_at = None
+        self._entries = OrderedDict()   # key -> (result, stored_at, compute_seconds)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0,
+                       "invalidations": 0, "seconds_saved": 0.0}
+
+    @staticmethod
+    def make_key(name, params=None):
+        if params is None:
+            return (name, None)
+        if isinstance(params, dict):
+            return (name, tuple(sorted(params.items())))
+        return (name, tuple(params))
+
+    def _check_version(self, now):
+        if self._version_probe is None:
+            return
+        if (self._version_checked_at is not None
+                and now - self._version_checked_at < self.version_check_seconds):
+            return
+        version = self._version_probe()
+        self._version_checked_at = now
+        if version != self._version:
+            with self._lock:
+                if self._version is not None and self._entries:
+                    self._stats["invalidations"] += 1
+                self._entries.clear()
+                self._version = version
+
+    def get_or_compute(self, name, params, compute):
+        """Return the cached result for ``(name, params)`` or run ``compute()``."""
+        key = self.make_key(name, params)
+        now = time.monotonic()
+        self._check_version(now)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["seconds_saved"] += entry[2]
+                return entry[0]
+            self._stats["misses"] += 1
+
+        started = time.monotonic()
+        result = compute()
+        elapsed = time.monotonic() - started
+
+        with self._lock:
+            self._entries[key] = (result, time.monotonic(), elapsed)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return result
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats["invalidations"] += 1
+        self._version_checked_at = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups * 100, 2) if lookups else 0.0
+        stats["seconds_saved"] = round(stats["seconds_saved"], 3)
+        return stats
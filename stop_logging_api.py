@@ -0,0 +1,352 @@
+"""Real-time stop logging for check posts.
+
+Check posts send single stops or small batches; ``StopLogger`` validates them
+against the digital_ledger schema, buffers them and group-commits everything
+that arrived within a short window in one multi-row insert, so many posts
+writing at once share a transaction instead of each paying for its own.
+
+Run the HTTP endpoint with ``python stop_logging_api.py --port 8502``::
+
+    POST /stops     one stop (JSON object) or a micro-batch (JSON list)
+    GET  /metrics   ingestion latency and throughput
+    GET  /health
+"""
+import argparse
+import datetime
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ledger_db import get_pool
+from ledger_schema import INSERT_QUERY, LEDGER_COLUMNS, LEDGER_TEXT_WIDTHS
+
+GROUP_COMMIT_ROWS = 500       # flush as soon as this many stops are buffered
+GROUP_COMMIT_SECONDS = 0.05   # ...or when the oldest buffered stop waited this long
+MAX_BATCH_REQUEST = 1000      # stops accepted in one call
+LATENCY_SAMPLES = 2000        # recent commit latencies kept for percentiles
+
+# Free-text columns and their widths; driver_gender is normalized to M/F separately
+TEXT_LIMITS = {column: width for column, width in LEDGER_TEXT_WIDTHS.items() if column != "driver_gender"}
+REQUIRED_FIELDS = ["stop_date", "stop_time", "violation", "stop_outcome", "vehicle_number"]
+_GENDERS = {"m": "M", "male": "M", "f": "F", "female": "F"}
+_BOOLEANS = {True: 1, False: 0, 1: 1, 0: 0, "1": 1, "0": 0,
+             "true": 1, "false": 0, "yes": 1, "no": 0}
+
+
+class InvalidStop(ValueError):
+    """A stop record that does not fit the digital_ledger schema."""
+
+
+# -------------------------------
+# Validation
+# -------------------------------
+def _parse_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(str(value).strip())
+    except ValueError:
+        raise InvalidStop(f"stop_date {value!r} is not YYYY-MM-DD") from None
+
+
+def _parse_time(value):
+    if isinstance(value, datetime.time):
+        return value.replace(microsecond=0)
+    text = str(value).strip()
+    for fmt in ("%H:%M:%S", "%H:%M"):
+        try:
+            return datetime.datetime.strptime(text, fmt).time()
+        except ValueError:
+            pass
+    raise InvalidStop(f"stop_time {value!r} is not HH:MM:SS")
+
+
+def _parse_flag(record, field):
+    value = record.get(field, 0)
+    key = value.strip().lower() if isinstance(value, str) else value
+    if not isinstance(key, (str, int)) or key not in _BOOLEANS:
+        raise InvalidStop(f"{field} must be true/false or 1/0, got {value!r}")
+    return _BOOLEANS[key]
+
+
+def _parse_age(record, field):
+    value = record.get(field)
+    if value in (None, ""):
+        return None
+    try:
+        age = int(value)
+    except (TypeError, ValueError):
+        raise InvalidStop(f"{field} {value!r} is not a whole number") from None
+    if not 0 <= age <= 120:
+        raise InvalidStop(f"{field} {age} is out of range")
+    return age
+
+
+def validate_stop(record):
+    """Check one stop record and return it as a row in LEDGER_COLUMNS order."""
+    if not isinstance(record, dict):
+        raise InvalidStop("each stop must be a JSON object")
+    missing = [field for field in REQUIRED_FIELDS if record.get(field) in (None, "")]
+    if missing:
+        raise InvalidStop(f"missing required field(s): {', '.join(missing)}")
+    unknown = set(record) - set(LEDGER_COLUMNS)
+    if unknown:
+        raise InvalidStop(f"unknown field(s): {', '.join(sorted(unknown))}")
+
+    stop = {}
+    for field, limit in TEXT_LIMITS.items():
+        value = record.get(field)
+        value = None if value is None else str(value).strip() or None
+        if value is not None and len(value) > limit:
+            raise InvalidStop(f"{field} is longer than {limit} characters")
+        stop[field] = value
+
+    gender = record.get("driver_gender")
+    if gender in (None, ""):
+        stop["driver_gender"] = None
+    elif str(gender).strip().lower() in _GENDERS:
+        stop["driver_gender"] = _GENDERS[str(gender).strip().lower()]
+    else:
+        raise InvalidStop(f"driver_gender must be M or F, got {gender!r}")
+
+    stop["stop_date"] = _parse_date(record["stop_date"])
+    stop["stop_time"] = _parse_time(record["stop_time"])
+    stop["driver_age"] = _parse_age(record, "driver_age")
+    stop["driver_age_raw"] = _parse_age(record, "driver_age_raw")
+    if stop["driver_age_raw"] is None:
+        stop["driver_age_raw"] = stop["driver_age"]
+    stop["search_conducted"] = _parse_flag(record, "search_conducted")
+    stop["drugs_related_stop"] = _parse_flag(record, "drugs_related_stop")
+    if "is_arrested" in record:
+        stop["is_arrested"] = _parse_flag(record, "is_arrested")
+    else:
+        stop["is_arrested"] = int("arrest" in stop["stop_outcome"].lower())
+    stop["violation_raw"] = stop["violation_raw"] or stop["violation"]
+    stop["search_type"] = stop["search_type"] or "Not Searched"
+    return tuple(stop[column] for column in LEDGER_COLUMNS)
+
+
+# -------------------------------
+# Group commit
+# -------------------------------
+class _Submission:
+    def __init__(self, rows):
+        self.rows = rows
+        self.enqueued = time.monotonic()
+        self.done = threading.Event()
+        self.error = None
+
+
+class StopLogger:
+    """Buffers validated stops and writes them to MySQL in group commits.
+
+    ``log_stops`` blocks until the caller's stops are committed (or the commit
+    failed), so a post gets an acknowledgement only for durable records. A
+    ``TimeoutError`` means the stops were withdrawn unwritten, so the post
+    can safely be retried.
+    """
+
+    def __init__(self, pool=None, commit_rows=GROUP_COMMIT_ROWS, commit_seconds=GROUP_COMMIT_SECONDS):
+        self.pool = pool or get_pool()
+        self.commit_rows = commit_rows
+        self.commit_seconds = commit_seconds
+        self._pending = []
+        self._pending_rows = 0
+        self._cond = threading.Condition()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._stats = {"accepted": 0, "rejected": 0, "committed": 0, "failed": 0, "timed_out": 0,
+                       "commits": 0, "retried_groups": 0}
+        self._started = time.monotonic()
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name="stop-logger", daemon=True)
+        self._writer.start()
+
+    def log_stops(self, records, timeout=30):
+        """Validate, buffer and commit ``records``; returns the number committed."""
+        if isinstance(records, dict):
+            records = [records]
+        if len(records) > MAX_BATCH_REQUEST:
+            raise InvalidStop(f"at most {MAX_BATCH_REQUEST} stops per request")
+        try:
+            rows = [validate_stop(record) for record in records]
+        except InvalidStop:
+            with self._cond:
+                self._stats["rejected"] += len(records)
+            raise
+        if not rows:
+            return 0
+        submission = _Submission(rows)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("stop logger is closed")
+            self._pending.append(submission)
+            self._pending_rows += len(rows)
+            self._stats["accepted"] += len(rows)
+            self._cond.notify()
+        if not submission.done.wait(timeout):
+            with self._cond:
+                if submission in self._pending:
+                    self._pending.remove(submission)
+                    self._pending_rows -= len(rows)
+                    self._stats["timed_out"] += len(rows)
+                    raise TimeoutError(f"stops not committed within {timeout}s")
+            # Already handed to the writer: its outcome is decided, so report it instead of
+            # a timeout that would make the check post send the same stops again
+            submission.done.wait()
+        if submission.error is not None:
+            raise submission.error
+        return len(rows)
+
+    def _next_group(self):
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return None
+            # Give concurrent posts a moment to join this commit
+            deadline = self._pending[0].enqueued + self.commit_seconds
+            while self._pending_rows < self.commit_rows and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            group, self._pending, self._pending_rows = self._pending, [], 0
+            return group
+
+    def _write(self, rows):
+        """Insert ``rows`` in one transaction; returns the error instead of raising it."""
+        try:
+            with self.pool.connection() as connection:
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.executemany(INSERT_QUERY, rows)
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+        except Exception as e:
+            return e
+        return None
+
+    def _run(self):
+        while True:
+            group = self._next_group()
+            if group is None:
+                return
+            error = self._write([row for submission in group for row in submission.rows])
+            retried = error is not None and len(group) > 1
+            if retried:
+                # One bad post must not reject everyone else's stops: retry each on its own
+                errors = [self._write(submission.rows) for submission in group]
+            else:
+                errors = [error] * len(group)
+            finished = time.monotonic()
+            with self._cond:
+                for submission, submission_error in zip(group, errors):
+                    self._stats["committed" if submission_error is None else "failed"] += len(submission.rows)
+                    self._latencies.append(finished - submission.enqueued)
+                self._stats["commits"] += errors.count(None) if retried else int(error is None)
+                self._stats["retried_groups"] += int(retried)
+            for submission, submission_error in zip(group, errors):
+                submission.error = submission_error
+                submission.done.set()
+
+    def close(self):
+        """Flush whatever is buffered and stop the writer thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+
+    def metrics(self):
+        with self._cond:
+            stats = dict(self._stats)
+            latencies = sorted(self._latencies)
+            stats["buffered"] = self._pending_rows
+        elapsed = time.monotonic() - self._started
+        stats["rows_per_second"] = round(stats["committed"] / elapsed, 2) if elapsed else 0.0
+        stats["avg_rows_per_commit"] = round(stats["committed"] / stats["commits"], 2) if stats["commits"] else 0.0
+        for label, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+            value = latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] if latencies else 0.0
+            stats[f"latency_{label}_ms"] = round(value * 1000, 2)
+        return stats
+
+
+# -------------------------------
+# HTTP endpoint
+# -------------------------------
+class StopLoggingHandler(BaseHTTPRequestHandler):
+    stop_logger = None   # set by serve()
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self._reply(200, self.stop_logger.metrics())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/stops":
+            self._reply(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            records = json.loads(self.rfile.read(length) or b"null")
+        except (ValueError, UnicodeDecodeError):
+            self._reply(400, {"error": "body must be JSON"})
+            return
+        if not isinstance(records, (dict, list)):
+            self._reply(400, {"error": "send a stop object or a list of stops"})
+            return
+        try:
+            committed = self.stop_logger.log_stops(records)
+        except InvalidStop as e:
+            self._reply(422, {"error": str(e)})
+        except TimeoutError as e:
+            self._reply(503, {"error": str(e)})
+        except Exception as e:
+            self._reply(500, {"error": f"could not store stops: {e}"})
+        else:
+            self._reply(201, {"committed": committed})
+
+    def log_message(self, format, *args):
+        pass   # one line per request would drown the console under load
+
+
+def serve(host="127.0.0.1", port=8502):
+    stop_logger = StopLogger()
+    StopLoggingHandler.stop_logger = stop_logger
+    server = ThreadingHTTPServer((host, port), StopLoggingHandler)
+    print(f"stop logging API listening on http://{host}:{port}/stops")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stop_logger.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP endpoint for real-time check post stop logging.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args(argv)
+    serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()